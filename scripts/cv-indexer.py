@@ -2,6 +2,10 @@
 CV Indexer Script
 Uploads and indexes the CV document to Azure Search with permanent status.
 Run this after deployment to pre-populate the index with your CV.
+
+Re-runs are incremental: /api/embed only re-embeds chunks whose text changed
+and removes chunks that no longer exist. Pass --full to delete every permanent
+document first and rebuild from scratch.
 """
 
 import requests
@@ -36,7 +40,7 @@ def cleanup_permanent_documents(backend_url):
     
     print()
 
-def index_cv(backend_url, cv_file_path):
+def index_cv(backend_url, cv_file_path, full_rebuild=False):
     """Upload and index the CV document"""
     
     print("=== CV Indexer ===")
@@ -48,8 +52,9 @@ def index_cv(backend_url, cv_file_path):
         print(f"ERROR: CV file not found: {cv_file_path}")
         return False
     
-    # Step 0: Clean up old CV documents
-    cleanup_permanent_documents(backend_url)
+    # Step 0: Clean up old CV documents (only for a full rebuild; normal runs update in place)
+    if full_rebuild:
+        cleanup_permanent_documents(backend_url)
     
     # Step 1: Upload CV to blob storage
     print("Step 1: Uploading CV to blob storage...")
@@ -75,7 +80,8 @@ def index_cv(backend_url, cv_file_path):
     embed_payload = {
         "fileName": filename,
         "sessionId": "global",
-        "documentType": "permanent"
+        "documentType": "permanent",
+        "incremental": not full_rebuild
     }
     
     embed_response = requests.post(
@@ -96,6 +102,10 @@ def index_cv(backend_url, cv_file_path):
     result = embed_response.json()
     print(f"✓ CV embedded successfully!")
     print(f"  Chunks created: {result.get('chunks', 'unknown')}")
+    print(f"  Re-embedded: {result.get('embedded', 'unknown')}, "
+          f"reused: {result.get('reused', 'unknown')}, "
+          f"unchanged: {result.get('unchanged', 'unknown')}, "
+          f"removed: {result.get('deleted', 'unknown')}")
     print()
     
     # Step 3: Verify by testing a query
@@ -134,10 +144,12 @@ if __name__ == "__main__":
     CV_FILE = "2025_CV (4).pdf"  # Update this to match your CV filename
     
     # Allow command line overrides
-    if len(sys.argv) > 1:
-        BACKEND_URL = sys.argv[1]
-    if len(sys.argv) > 2:
-        CV_FILE = sys.argv[2]
+    args = [arg for arg in sys.argv[1:] if arg != "--full"]
+    full_rebuild = "--full" in sys.argv[1:]
+    if len(args) > 0:
+        BACKEND_URL = args[0]
+    if len(args) > 1:
+        CV_FILE = args[1]
     
     # Find CV file (check current dir and parent dir)
     cv_path = CV_FILE
@@ -148,5 +160,5 @@ if __name__ == "__main__":
         print("Please update the CV_FILE variable in this script or pass it as an argument")
         sys.exit(1)
     
-    success = index_cv(BACKEND_URL, cv_path)
+    success = index_cv(BACKEND_URL, cv_path, full_rebuild=full_rebuild)
     sys.exit(0 if success else 1)
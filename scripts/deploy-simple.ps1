@@ -55,12 +55,14 @@ az group create --name $ResourceGroup --location $Location
 Write-Host ""
 Write-Host "=== STEP 2: Deploy Infrastructure ===" -ForegroundColor Green
 
-# Check if Function App already exists
+# Check if the Function Apps already exist
 $functionAppName = "$AppName-func-$Environment"
-$existingApp = az functionapp list --resource-group $ResourceGroup --query "[?name=='$functionAppName'].name" -o tsv
+$streamFunctionAppName = "$AppName-stream-$Environment"
+$existingApps = az functionapp list --resource-group $ResourceGroup --query "[?name=='$functionAppName' || name=='$streamFunctionAppName'].name" -o tsv
 
-if ($existingApp) {
-    Write-Host "Function App '$functionAppName' already exists. Skipping infrastructure deployment." -ForegroundColor Yellow
+# Deployments from before the streaming app was split out still need the infrastructure step
+if (@($existingApps).Count -eq 2) {
+    Write-Host "Function Apps '$functionAppName' and '$streamFunctionAppName' already exist. Skipping infrastructure deployment." -ForegroundColor Yellow
     Write-Host "Using existing resources..." -ForegroundColor Yellow
     
     # Get existing storage account name - select first match only
@@ -88,6 +90,7 @@ if ($existingApp) {
     }
 
     $functionAppName = $infraDeployment.properties.outputs.functionAppName.value
+    $streamFunctionAppName = $infraDeployment.properties.outputs.streamFunctionAppName.value
     $frontendStorageName = $infraDeployment.properties.outputs.frontendStorageName.value
     $frontendUrl = $infraDeployment.properties.outputs.frontendUrl.value
 }
@@ -95,6 +98,7 @@ if ($existingApp) {
 Write-Host ""
 Write-Host "Infrastructure Deployed:" -ForegroundColor Green
 Write-Host "  Function App: $functionAppName"
+Write-Host "  Streaming Function App: $streamFunctionAppName"
 Write-Host "  Frontend Storage: $frontendStorageName"
 Write-Host "  Frontend URL: $frontendUrl"
 
@@ -105,15 +109,17 @@ Write-Host "=== STEP 3: Configure Environment Variables ===" -ForegroundColor Gr
 # Get storage connection string
 $storageConnStr = az storage account show-connection-string --name stzaralmpersonal --resource-group $ResourceGroup --query connectionString --output tsv
 
-az functionapp config appsettings set `
-    --name $functionAppName `
-    --resource-group $ResourceGroup `
-    --settings `
-        "AZURE_OPENAI_ENDPOINT=$aiEndpoint" `
-        "AZURE_OPENAI_API_KEY=$aiKey" `
-        "AZURE_SEARCH_ENDPOINT=$searchEndpoint" `
-        "AZURE_SEARCH_KEY=$searchKey" `
-        "AZURE_STORAGE_CONNECTION_STRING=$storageConnStr"
+foreach ($app in @($functionAppName, $streamFunctionAppName)) {
+    az functionapp config appsettings set `
+        --name $app `
+        --resource-group $ResourceGroup `
+        --settings `
+            "AZURE_OPENAI_ENDPOINT=$aiEndpoint" `
+            "AZURE_OPENAI_API_KEY=$aiKey" `
+            "AZURE_SEARCH_ENDPOINT=$searchEndpoint" `
+            "AZURE_SEARCH_KEY=$searchKey" `
+            "AZURE_STORAGE_CONNECTION_STRING=$storageConnStr"
+}
 
 Write-Host "Environment variables configured successfully!" -ForegroundColor Green
 
@@ -125,6 +131,8 @@ Start-Sleep -Seconds 45
 
 Push-Location "../src/backend"
 func azure functionapp publish $functionAppName --python
+# Same package; the streaming app starts from stream_app.py (PYTHON_SCRIPT_FILE_NAME)
+func azure functionapp publish $streamFunctionAppName --python
 Pop-Location
 
 # Deploy Frontend
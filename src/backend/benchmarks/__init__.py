@@ -0,0 +1 @@
+# Offline benchmarks - not deployed (see .funcignore)
@@ -0,0 +1,108 @@
+"""Chunking throughput: the built-in chunker vs langchain's RecursiveCharacterTextSplitter.
+
+Run from src/backend:
+
+    python -m benchmarks.chunker_throughput
+    python -m benchmarks.chunker_throughput --sizes 64,1024,8192 --output chunking.json
+
+Both chunkers get the same synthetic documents as a stream of page-sized
+pieces. The splitter is driven the way ingest used to drive it (8000-character
+windows, 1000/100 character chunks); it is skipped when
+langchain-text-splitters is not installed, since the backend no longer
+depends on it. The cost of importing each chunker in a fresh interpreter is
+reported too, as that lands on every cold start that ingests a document.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.import_budget import import_profile
+from benchmarks.run import synthetic_document
+
+PAGE_CHARS = 3000
+
+def pages_of(text):
+    return [text[i:i + PAGE_CHARS] for i in range(0, len(text), PAGE_CHARS)]
+
+def windowed_split(pieces, split_text, window_chars=8000):
+    """How ingest fed the splitter: buffer pieces into windows, carry the last chunk over"""
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece + "\n")
+        buffered += len(piece) + 1
+        if buffered >= window_chars:
+            chunks = split_text("".join(buffer))
+            yield from chunks[:-1]
+            carry = chunks[-1] + "\n" if chunks else ""
+            buffer = [carry]
+            buffered = len(carry)
+    if buffered:
+        yield from split_text("".join(buffer))
+
+MODULES = {"builtin": "chunker", "langchain": "langchain_text_splitters"}
+
+def chunkers():
+    from chunker import iter_token_chunks
+
+    available = {"builtin": lambda pieces: iter_token_chunks(pieces, max_tokens=250, overlap_tokens=25)}
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        print("langchain-text-splitters is not installed; timing the built-in chunker only")
+        return available
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+    available["langchain"] = lambda pieces: windowed_split(pieces, splitter.split_text)
+    return available
+
+def measure(chunk, pieces, runs):
+    """Median seconds over runs, plus the chunk count and token sizes of the last run"""
+    from tokens import estimate_tokens
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        chunks = list(chunk(iter(pieces)))
+        timings.append(time.perf_counter() - start)
+    tokens = [estimate_tokens(c) for c in chunks] or [0]
+    return statistics.median(timings), len(chunks), tokens
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunking throughput benchmark")
+    parser.add_argument("--sizes", default="16,256,4096", help="Comma-separated document sizes in KB")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per size to take the median of")
+    parser.add_argument("--output", help="Write results as JSON here")
+    args = parser.parse_args(argv)
+
+    results = []
+    available = chunkers()
+    import_ms = {name: round(import_profile(f"import {MODULES[name]}")[0], 1) for name in available}
+    for name, ms in import_ms.items():
+        print(f"{name:>10} import {ms} ms")
+    for size_kb in [int(s) for s in args.sizes.split(",")]:
+        pieces = pages_of(synthetic_document(size_kb * 1024, seed=size_kb))
+        for name, chunk in available.items():
+            seconds, count, tokens = measure(chunk, pieces, args.runs)
+            result = {
+                "chunker": name,
+                "importMs": import_ms[name],
+                "docSizeKb": size_kb,
+                "mbPerSecond": round(size_kb / 1024 / seconds, 2) if seconds else None,
+                "ms": round(seconds * 1000, 2),
+                "chunks": count,
+                "meanTokens": round(statistics.mean(tokens), 1),
+                "maxTokens": max(tokens)
+            }
+            results.append(result)
+            print(f"{name:>10} {size_kb:>6} KB  {result['mbPerSecond']:>8} MB/s  {count:>6} chunks  "
+                  f"mean {result['meanTokens']} / max {result['maxTokens']} est. tokens")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+import hashlib
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+
+# In-process stand-ins for Azure OpenAI, AI Search, Blob Storage and queue
+# output bindings. They only implement the calls the backend makes, return
+# deterministic data, and sleep for a configurable latency per call so
+# network-bound stages behave (and overlap under concurrency) roughly like the
+# real services.
+
+class Latency:
+    """Simulated service latencies, in milliseconds"""
+
+    def __init__(self, embedding_ms=40.0, embedding_per_item_ms=0.5, chat_ms=400.0,
+                 search_ms=30.0, blob_ms=10.0):
+        self.embedding_ms = embedding_ms
+        self.embedding_per_item_ms = embedding_per_item_ms
+        self.chat_ms = chat_ms
+        self.search_ms = search_ms
+        self.blob_ms = blob_ms
+
+    @classmethod
+    def zero(cls):
+        return cls(0, 0, 0, 0, 0)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+def _sleep(ms):
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+def deterministic_vector(text, dimensions=1536):
+    """Unit vector seeded from the text, so equal texts always embed identically"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+# --- Azure OpenAI ---
+
+class FakeEmbeddings:
+    def __init__(self, latency, dimensions):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.calls = 0
+
+    def create(self, input, model, **kwargs):
+        items = input if isinstance(input, list) else [input]
+        self.calls += 1
+        _sleep(self.latency.embedding_ms + self.latency.embedding_per_item_ms * len(items))
+        dimensions = kwargs.get("dimensions") or self.dimensions
+        data = [SimpleNamespace(index=i, embedding=deterministic_vector(text, dimensions)) for i, text in enumerate(items)]
+        return SimpleNamespace(data=data, usage=SimpleNamespace(total_tokens=sum(len(t) // 4 for t in items)))
+
+class FakeChatCompletions:
+    ANSWER = "Samrudh has hands-on experience with exactly that. Be sure to hire Sam!"
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def create(self, model, messages, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self._stream()
+        _sleep(self.latency.chat_ms)
+        message = SimpleNamespace(content=self.ANSWER)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _stream(self):
+        words = self.ANSWER.split(" ")
+        for word in words:
+            _sleep(self.latency.chat_ms / len(words))
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+class FakeOpenAI:
+    def __init__(self, latency, dimensions=1536):
+        self.embeddings = FakeEmbeddings(latency, dimensions)
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(latency))
+        self.models = SimpleNamespace(list=lambda: [SimpleNamespace(id="chat"), SimpleNamespace(id="embedding")])
+
+# --- Azure AI Search ---
+
+_COMPARISON = re.compile(r"^\(?\s*(\w+) (eq|ne|lt|le|gt|ge) '((?:[^']|'')*)'\s*\)?$")
+
+def _matches(document, filter_query):
+    """Evaluate the flat and/or OData comparisons the backend builds"""
+    def comparison(term):
+        match = _COMPARISON.match(term.strip())
+        if not match:
+            raise ValueError(f"Unsupported filter term: {term}")
+        field, op, literal = match.groups()
+        value = document.get(field) or ""
+        literal = literal.replace("''", "'")
+        return {
+            "eq": value == literal, "ne": value != literal,
+            "lt": value < literal, "le": value <= literal,
+            "gt": value > literal, "ge": value >= literal
+        }[op]
+    return any(
+        all(comparison(term) for term in clause.split(" and "))
+        for clause in filter_query.split(" or ")
+    )
+
+class _Results(list):
+    def __init__(self, documents, count):
+        super().__init__(documents)
+        self._count = count
+
+    def by_page(self, continuation_token=None):
+        return iter([self])
+
+    def get_count(self):
+        """Every match, not just this page (as with include_total_count)"""
+        return self._count
+
+class FakeSearchClient:
+    def __init__(self, latency):
+        self.latency = latency
+        self.documents = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        self.calls += 1
+        _sleep(self.latency.search_ms)
+
+    def search(self, search_text=None, filter=None, select=None, top=50, skip=0, vector_queries=None, order_by=None, **kwargs):
+        self._call()
+        with self._lock:
+            documents = list(self.documents.values())
+        if filter:
+            documents = [d for d in documents if _matches(d, filter)]
+        if order_by:
+            field, _, direction = order_by[0].partition(" ")
+            documents.sort(key=lambda d: d.get(field) or "", reverse=direction == "desc")
+        if vector_queries:
+            query = np.asarray(vector_queries[0].vector, dtype=np.float32)
+            documents.sort(key=lambda d: -float(np.dot(query, d["contentVector"])))
+        count = len(documents)
+        documents = documents[skip or 0:(skip or 0) + (50 if top is None else top)]
+        return _Results(
+            ({**{k: d.get(k) for k in (select or d.keys())}, "@search.score": 1.0} for d in documents),
+            count
+        )
+
+    def get_document(self, key, selected_fields=None):
+        from azure.core.exceptions import ResourceNotFoundError
+        self._call()
+        with self._lock:
+            document = self.documents.get(key)
+        if document is None:
+            raise ResourceNotFoundError(f"Document {key} not found")
+        return {k: document.get(k) for k in (selected_fields or document.keys())}
+
+    def _write(self, documents, apply):
+        self._call()
+        results = []
+        with self._lock:
+            for document in documents:
+                succeeded = apply(document)
+                results.append(SimpleNamespace(key=document["id"], succeeded=succeeded, status_code=200 if succeeded else 404))
+        return results
+
+    def upload_documents(self, documents):
+        def upload(d):
+            self.documents[d["id"]] = dict(d)
+            return True
+        return self._write(documents, upload)
+
+    def merge_documents(self, documents):
+        def merge(d):
+            if d["id"] not in self.documents:
+                return False
+            self.documents[d["id"]].update(d)
+            return True
+        return self._write(documents, merge)
+
+    def delete_documents(self, documents):
+        # Deleting a missing key succeeds, as in the real service
+        def delete(d):
+            self.documents.pop(d["id"], None)
+            return True
+        return self._write(documents, delete)
+
+    def get_document_count(self):
+        return len(self.documents)
+
+class FakeSearchIndexClient:
+    def __init__(self, latency):
+        self.latency = latency
+        self.indexes = {}
+
+    def get_index(self, name):
+        from azure.core.exceptions import ResourceNotFoundError
+        _sleep(self.latency.search_ms)
+        if name not in self.indexes:
+            raise ResourceNotFoundError(f"Index {name} not found")
+        return self.indexes[name]
+
+    def create_index(self, index):
+        _sleep(self.latency.search_ms)
+        self.indexes[index.name] = index
+        return index
+
+    create_or_update_index = create_index
+
+# --- Blob Storage ---
+
+class _Downloader:
+    def __init__(self, blob, chunk_size=4 * 1024 * 1024):
+        self._data = blob["data"]
+        self._chunk_size = chunk_size
+        self.size = len(self._data)
+        self.properties = SimpleNamespace(etag=blob["etag"], size=self.size, metadata=blob["metadata"])
+
+    def readall(self):
+        return self._data
+
+    def chunks(self):
+        for start in range(0, len(self._data), self._chunk_size):
+            yield self._data[start:start + self._chunk_size]
+
+class _Pages:
+    def __init__(self, items, page_size, start):
+        self._items = items
+        self._page_size = page_size
+        self._start = start
+        self._done = False
+        self.continuation_token = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        end = self._start + self._page_size
+        page = self._items[self._start:end]
+        self._done = end >= len(self._items)
+        self.continuation_token = None if self._done else str(end)
+        self._start = end
+        return iter(page)
+
+class _Listing(list):
+    def __init__(self, items, page_size):
+        super().__init__(items)
+        self._page_size = page_size or 5000
+
+    def by_page(self, continuation_token=None):
+        return _Pages(list(self), self._page_size, int(continuation_token or 0))
+
+class FakeBlobClient:
+    def __init__(self, service, container, name):
+        self._service = service
+        self.container_name = container
+        self.blob_name = name
+        self._staged = {}
+
+    def _blobs(self):
+        from azure.core.exceptions import ResourceNotFoundError
+        _sleep(self._service.latency.blob_ms)
+        blobs = self._service.containers.get(self.container_name)
+        if blobs is None:
+            raise ResourceNotFoundError(f"Container {self.container_name} not found")
+        return blobs
+
+    def exists(self):
+        return self.blob_name in self._blobs()
+
+    def download_blob(self, **kwargs):
+        from azure.core.exceptions import ResourceNotFoundError
+        blob = self._blobs().get(self.blob_name)
+        if blob is None:
+            raise ResourceNotFoundError(f"Blob {self.blob_name} not found")
+        return _Downloader(blob)
+
+    def upload_blob(self, data, overwrite=False, etag=None, match_condition=None, metadata=None, **kwargs):
+        from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+        if hasattr(data, "read"):
+            data = data.read()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with self._service.lock:
+            blobs = self._blobs()
+            current = blobs.get(self.blob_name)
+            if current is not None and not overwrite:
+                raise ResourceExistsError(f"Blob {self.blob_name} already exists")
+            if etag is not None and (current is None or current["etag"] != etag):
+                raise ResourceModifiedError(f"Blob {self.blob_name} was modified")
+            blobs[self.blob_name] = {
+                "data": bytes(data),
+                "etag": uuid.uuid4().hex,
+                "metadata": metadata or {},
+                "last_modified": datetime.now(timezone.utc)
+            }
+
+    def stage_block(self, block_id, data, **kwargs):
+        _sleep(self._service.latency.blob_ms)
+        self._staged[block_id] = bytes(data)
+
+    def commit_block_list(self, block_list, metadata=None, **kwargs):
+        data = b"".join(self._staged.pop(block.id) for block in block_list)
+        self.upload_blob(data, overwrite=True, metadata=metadata)
+
+    def delete_blob(self, **kwargs):
+        from azure.core.exceptions import ResourceNotFoundError
+        with self._service.lock:
+            if self._blobs().pop(self.blob_name, None) is None:
+                raise ResourceNotFoundError(f"Blob {self.blob_name} not found")
+
+class FakeContainerClient:
+    def __init__(self, service, name):
+        self._service = service
+        self.container_name = name
+
+    def exists(self):
+        _sleep(self._service.latency.blob_ms)
+        return self.container_name in self._service.containers
+
+    def create_container(self, **kwargs):
+        from azure.core.exceptions import ResourceExistsError
+        _sleep(self._service.latency.blob_ms)
+        with self._service.lock:
+            if self.container_name in self._service.containers:
+                raise ResourceExistsError(f"Container {self.container_name} already exists")
+            self._service.containers[self.container_name] = {}
+        return self
+
+    def get_blob_client(self, blob):
+        return FakeBlobClient(self._service, self.container_name, blob)
+
+    def upload_blob(self, name, data, overwrite=False, **kwargs):
+        blob_client = self.get_blob_client(name)
+        blob_client.upload_blob(data, overwrite=overwrite, **kwargs)
+        return blob_client
+
+    def delete_blob(self, blob, **kwargs):
+        self.get_blob_client(blob).delete_blob()
+
+    def list_blobs(self, name_starts_with=None, results_per_page=None, **kwargs):
+        from azure.core.exceptions import ResourceNotFoundError
+        _sleep(self._service.latency.blob_ms)
+        blobs = self._service.containers.get(self.container_name)
+        if blobs is None:
+            raise ResourceNotFoundError(f"Container {self.container_name} not found")
+        names = sorted(n for n in list(blobs) if not name_starts_with or n.startswith(name_starts_with))
+        return _Listing(
+            [SimpleNamespace(name=n, size=len(blobs[n]["data"]), last_modified=blobs[n]["last_modified"]) for n in names if n in blobs],
+            results_per_page
+        )
+
+class FakeBlobServiceClient:
+    def __init__(self, latency):
+        self.latency = latency
+        self.containers = {}
+        self.lock = threading.RLock()
+
+    def get_container_client(self, container):
+        return FakeContainerClient(self, container)
+
+    def get_blob_client(self, container, blob):
+        return FakeBlobClient(self, container, blob)
+
+    def create_container(self, name, **kwargs):
+        return self.get_container_client(name).create_container()
+
+# --- Azure Functions bindings ---
+
+class FakeQueueOutput:
+    """Stand-in for a func.Out[str] queue output binding; keeps what was set"""
+
+    def __init__(self):
+        self.messages = []
+
+    def set(self, value):
+        self.messages.append(value)
+
+    def get(self):
+        return self.messages[-1] if self.messages else None
+
+class FakeServices:
+    """One set of stand-ins, installed into the backend's client registry"""
+
+    def __init__(self, latency, dimensions=1536):
+        self.openai = FakeOpenAI(latency, dimensions)
+        self.search = FakeSearchClient(latency)
+        self.search_index = FakeSearchIndexClient(latency)
+        self.blob = FakeBlobServiceClient(latency)
+
+    def install(self):
+        from clients import install_clients
+        install_clients({
+            "openai": self.openai,
+            "blob": self.blob,
+            "search-index": self.search_index,
+            "search:documents": self.search
+        })
+        return self
@@ -0,0 +1,120 @@
+"""Measure what importing function_app costs a cold worker, and enforce a budget.
+
+Run from src/backend:
+
+    python -m benchmarks.import_budget                 # report, exit 1 if over budget
+    python -m benchmarks.import_budget --budget-ms 250 --output imports.json
+
+Each measurement runs in a fresh interpreter with `-X importtime`, so nothing
+is cached between runs. Besides the total, the check fails if any module in
+warmup.HEAVY_MODULES is imported at startup - those must stay deferred to the
+handlers that use them.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_profile(statement, importtime=False):
+    """Run an import statement in a fresh interpreter.
+
+    Returns (elapsed ms, modules loaded afterwards, {module: cumulative µs}); the
+    per-module breakdown is only collected with importtime=True, since
+    -X importtime itself slows imports down.
+    """
+    probe = (
+        "import time; start = time.perf_counter(); "
+        f"{statement}; "
+        "elapsed = (time.perf_counter() - start) * 1000; "
+        "import sys, json; print(json.dumps({'ms': elapsed, 'modules': sorted(sys.modules)}))"
+    )
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", probe]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    cumulative = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: <self µs> | <cumulative µs> | <name, indented by nesting depth>"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name[1:].rstrip()] = int(cumulative_us)
+    return result["ms"], result["modules"], cumulative
+
+def direct_imports(cumulative, module):
+    """Cumulative µs of each module that `module` imported directly.
+
+    -X importtime lists a module after everything it imported, so the direct
+    imports are the depth-1 entries between it and the previous top-level entry.
+    """
+    children = {}
+    for name, us in cumulative.items():
+        if not name.startswith(" "):
+            if name == module:
+                return children
+            children = {}
+        elif not name.startswith("   "):
+            children[name.strip()] = us
+    return {}
+
+def median(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time budget for the function app")
+    # azure.functions alone is most of it (~170 ms); the rest of the startup path should stay in the noise
+    parser.add_argument("--budget-ms", type=float, default=300.0, help="Maximum median import time of function_app")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh-interpreter runs to take the median of")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to list")
+    parser.add_argument("--deferred", action="store_true", help="Also time each deferred (heavy) module on its own")
+    parser.add_argument("--output", help="Write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    from warmup import HEAVY_MODULES
+
+    samples = [import_profile("import function_app")[0] for _ in range(args.runs)]
+    total_ms = median(samples)
+    _, loaded, profile = import_profile("import function_app", importtime=True)
+    slowest = sorted(direct_imports(profile, "function_app").items(), key=lambda item: -item[1])[:args.top]
+    eager = [module for module in HEAVY_MODULES if module in loaded]
+
+    report = {
+        "importMs": round(total_ms, 1),
+        "budgetMs": args.budget_ms,
+        "slowestMs": {name: round(us / 1000.0, 1) for name, us in slowest},
+        "eagerHeavyModules": eager
+    }
+    if args.deferred:
+        report["deferredMs"] = {}
+        for module in HEAVY_MODULES:
+            try:
+                elapsed, _, _ = import_profile(f"import {module}")
+            except subprocess.CalledProcessError:
+                continue
+            report["deferredMs"][module] = round(elapsed, 1)
+
+    print(f"function_app import: {report['importMs']} ms (median of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    for name, ms in report["slowestMs"].items():
+        print(f"  {ms:>8.1f} ms  {name} (with -X importtime)")
+    for module, ms in report.get("deferredMs", {}).items():
+        print(f"  deferred {module}: {ms} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if eager:
+        print(f"FAIL: deferred modules imported at startup: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: import time {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
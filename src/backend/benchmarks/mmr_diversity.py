@@ -0,0 +1,100 @@
+"""Retrieval diversity: plain top-k vs MMR re-ranking of over-fetched candidates.
+
+Run from src/backend:
+
+    python -m benchmarks.mmr_diversity
+    python -m benchmarks.mmr_diversity --lambdas 0.5,0.7,0.9 --candidates 30 --k 5
+
+Embeddings of real chunks are not needed to see the effect, so the corpus is
+synthetic: a number of themes, each repeated by several near-duplicate chunks
+(as overlapping chunks and a CV that restates its strengths produce). Queries
+sit between a few themes. For each selection the benchmark reports mean
+relevance (cosine to the query), redundancy (mean pairwise cosine of the
+selected chunks), how many distinct themes made it into the k results, and
+the time mmr_select takes per query.
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import numpy as np
+
+def synthetic_corpus(rng, themes, copies, dimensions, noise):
+    """(unit vectors, theme of each vector): copies near-duplicates around each theme centroid"""
+    centroids = rng.standard_normal((themes, dimensions)).astype(np.float32)
+    vectors = np.repeat(centroids, copies, axis=0) + noise * rng.standard_normal((themes * copies, dimensions)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, np.repeat(np.arange(themes), copies), centroids
+
+def synthetic_query(rng, centroids, mix):
+    """A query related to `mix` random themes, with decreasing weight"""
+    chosen = rng.choice(len(centroids), size=mix, replace=False)
+    weights = np.linspace(1.0, 0.5, mix, dtype=np.float32)[:, None]
+    query = (centroids[chosen] * weights).sum(axis=0)
+    return query / np.linalg.norm(query)
+
+def describe(selection, vectors, labels, query):
+    chosen = vectors[selection]
+    pairwise = chosen @ chosen.T
+    upper = pairwise[np.triu_indices(len(selection), k=1)]
+    return {
+        "relevance": float((chosen @ query).mean()),
+        "redundancy": float(upper.mean()) if len(upper) else 0.0,
+        "themes": len(set(labels[selection].tolist()))
+    }
+
+def main(argv=None):
+    from mmr import mmr_select
+
+    parser = argparse.ArgumentParser(description="MMR diversity benchmark")
+    parser.add_argument("--lambdas", default="0.5,0.7,0.9", help="Comma-separated MMR lambdas")
+    parser.add_argument("--candidates", type=int, default=30, help="Candidates fetched per query")
+    parser.add_argument("--k", type=int, default=5, help="Results kept per query")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to average over")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Vector size")
+    parser.add_argument("--output", help="Write results as JSON here")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    vectors, labels, centroids = synthetic_corpus(rng, themes=40, copies=6, dimensions=args.dimensions, noise=0.35)
+    modes = [("top-k", None)] + [(f"mmr-{value}", float(value)) for value in args.lambdas.split(",")]
+    samples = {name: [] for name, _ in modes}
+    timings = {name: [] for name, _ in modes}
+
+    for _ in range(args.queries):
+        query = synthetic_query(rng, centroids, mix=3)
+        scores = vectors @ query
+        candidates = np.argsort(-scores)[:args.candidates]
+        for name, lambda_mult in modes:
+            start = time.perf_counter()
+            if lambda_mult is None:
+                selection = candidates[:args.k]
+            else:
+                selection = candidates[mmr_select(query, vectors[candidates], args.k, lambda_mult)]
+            timings[name].append(time.perf_counter() - start)
+            samples[name].append(describe(selection, vectors, labels, query))
+
+    results = []
+    for name, _ in modes:
+        result = {
+            "mode": name,
+            "candidates": args.candidates,
+            "k": args.k,
+            "relevance": round(statistics.mean(s["relevance"] for s in samples[name]), 4),
+            "redundancy": round(statistics.mean(s["redundancy"] for s in samples[name]), 4),
+            "themes": round(statistics.mean(s["themes"] for s in samples[name]), 2),
+            "usPerQuery": round(statistics.median(timings[name]) * 1e6, 1)
+        }
+        results.append(result)
+        print(f"{name:>8}  relevance {result['relevance']:.3f}  redundancy {result['redundancy']:.3f}  "
+              f"themes {result['themes']:.2f}/{args.k}  {result['usPerQuery']} µs")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""Offline benchmark of the backend's hot paths against in-process service stand-ins.
+
+Run from src/backend:
+
+    python -m benchmarks.run --output benchmark.json
+    python -m benchmarks.run --sizes 4,256 --concurrency 1,8 --compare benchmark.json
+
+Each handler is driven through real func.HttpRequest objects; the Azure
+clients are replaced by the fakes in benchmarks/fakes.py.
+"""
+import argparse
+import inspect
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+WORDS = (
+    "azure python retrieval latency vector search index embedding pipeline cloud "
+    "react typescript deployment storage function kubernetes monitoring analytics "
+    "architecture reliability throughput scaling caching streaming security data"
+).split()
+
+def synthetic_document(size_bytes, seed):
+    """Deterministic prose of roughly size_bytes, in paragraphs of sentences"""
+    rng = random.Random(seed)
+    paragraphs = []
+    size = 0
+    while size < size_bytes:
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+            for _ in range(rng.randint(3, 7))
+        ]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:size_bytes]
+
+def configure_environment(snapshot_dir):
+    """Settings for an offline run; must happen before any backend module reads config"""
+    os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://offline.invalid")
+    os.environ.setdefault("AZURE_SEARCH_ENDPOINT", "https://offline.invalid")
+    os.environ.setdefault("AZURE_STORAGE_CONNECTION_STRING", "offline")
+    os.environ["INGEST_PIPELINE"] = "sync"
+    # The fakes have no quota; set these to benchmark under Azure OpenAI rate limits
+    for setting in ("OPENAI_CHAT_REQUESTS_PER_MINUTE", "OPENAI_CHAT_TOKENS_PER_MINUTE",
+                    "OPENAI_EMBEDDING_REQUESTS_PER_MINUTE", "OPENAI_EMBEDDING_TOKENS_PER_MINUTE"):
+        os.environ.setdefault(setting, "0")
+    os.environ["LOCAL_VECTOR_SNAPSHOT_DIR"] = snapshot_dir
+
+def handler(name):
+    import function_app
+    return getattr(function_app, name).build().get_user_function()
+
+def post(name, route, body):
+    import azure.functions as func
+    from benchmarks.fakes import FakeQueueOutput
+    request = func.HttpRequest(
+        method="POST",
+        url=f"/api/{route}",
+        headers={"Content-Type": "application/json"},
+        body=json.dumps(body).encode("utf-8")
+    )
+    function = handler(name)
+    # Output bindings (e.g. /embed's job queue) get a stand-in
+    outputs = {arg: FakeQueueOutput() for arg in inspect.signature(function).parameters if arg != "req"}
+    return function(request, **outputs)
+
+def parse_server_timing(value):
+    """{stage: ms} from a Server-Timing header value"""
+    stages = {}
+    for entry in (value or "").split(","):
+        name, _, duration = entry.strip().partition(";dur=")
+        if name and duration:
+            stages[name] = float(duration)
+    return stages
+
+def summarize_stages(stage_timings):
+    """p50/p95 per handler stage, across the requests that ran it"""
+    names = []
+    for timings in stage_timings:
+        names.extend(name for name in timings if name not in names and name != "total")
+    summary = {}
+    for name in names:
+        values = [timings[name] for timings in stage_timings if name in timings]
+        p50, p95 = np.percentile(values, [50, 95])
+        summary[name] = {"p50Ms": round(float(p50), 2), "p95Ms": round(float(p95), 2)}
+    return summary
+
+def summarize(stage, latencies_ms, errors, wall_seconds, stage_timings=(), **labels):
+    latencies = np.asarray(latencies_ms) if latencies_ms else np.zeros(1)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "stage": stage,
+        **labels,
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "throughputRps": round(len(latencies_ms) / wall_seconds, 2) if wall_seconds else None,
+        "meanMs": round(float(latencies.mean()), 2),
+        "p50Ms": round(float(p50), 2),
+        "p95Ms": round(float(p95), 2),
+        "p99Ms": round(float(p99), 2),
+        "stages": summarize_stages(stage_timings)
+    }
+
+def run_concurrently(stage, calls, concurrency, **labels):
+    """Run zero-argument calls on a pool of `concurrency` threads; each returns a func.HttpResponse"""
+    def timed(call):
+        start = time.perf_counter()
+        timings = {}
+        try:
+            response = call()
+            failed = response.status_code >= 400
+            timings = parse_server_timing(response.headers.get("Server-Timing"))
+        except Exception as e:
+            logging.error(f"{stage} raised: {e}")
+            failed = True
+        return (time.perf_counter() - start) * 1000, failed, timings
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, calls))
+    wall = time.perf_counter() - start
+    return summarize(
+        stage,
+        [ms for ms, _, _ in outcomes],
+        sum(1 for _, failed, _ in outcomes if failed),
+        wall,
+        stage_timings=[timings for _, _, timings in outcomes],
+        concurrency=concurrency,
+        **labels
+    )
+
+def upload_text(services, filename, text):
+    from config import config
+    container = services.blob.get_container_client(config.AZURE_STORAGE_CONTAINER_NAME)
+    try:
+        container.create_container()
+    except Exception:
+        pass
+    container.upload_blob(filename, text.encode("utf-8"), overwrite=True)
+
+def index_permanent_corpus(services):
+    """Embed a CV-sized permanent document so CV-only chat has something to retrieve"""
+    import vector_engine
+    upload_text(services, "cv.txt", synthetic_document(24 * 1024, seed="cv"))
+    response = post("embed_document", "embed", {"fileName": "cv.txt", "sessionId": "global", "documentType": "permanent"})
+    if response.status_code != 200:
+        raise RuntimeError(f"Indexing the permanent corpus failed: {response.get_body()!r}")
+    # The fake index is immediately consistent, so the snapshot needn't wait for it to settle
+    vector_engine.INDEX_SETTLE_SECONDS = 0
+
+def bench_embed(services, size_kb, concurrency, requests):
+    sessions = []
+    calls = []
+    text = synthetic_document(size_kb * 1024, seed=size_kb)
+    for i in range(requests):
+        session_id = f"bench-{uuid.uuid4().hex[:12]}"
+        filename = f"{session_id}-{i}.txt"
+        upload_text(services, filename, text)
+        sessions.append(session_id)
+        body = {"fileName": filename, "sessionId": session_id, "documentType": "temporary"}
+        calls.append(lambda body=body: post("embed_document", "embed", body))
+    return run_concurrently("embed_document", calls, concurrency, docSizeKb=size_kb), sessions
+
+def bench_generate(concurrency, requests, sessions, label, size_kb, repeat_prompt=False):
+    calls = []
+    for i in range(requests):
+        prompt = "What cloud experience does Sam have?" if repeat_prompt else f"Question {uuid.uuid4().hex}: what about {WORDS[i % len(WORDS)]}?"
+        body = {"prompt": prompt, "sessionId": sessions[i % len(sessions)]}
+        calls.append(lambda body=body: post("generate_response", "generate", body))
+    return run_concurrently("generate_response", calls, concurrency, scenario=label, docSizeKb=size_kb)
+
+def bench_generate_batch(concurrency, requests, sessions, size_kb, batch_size=10):
+    calls = []
+    for i in range(requests):
+        prompts = [f"Question {uuid.uuid4().hex}: what about {WORDS[(i + j) % len(WORDS)]}?" for j in range(batch_size)]
+        body = {"prompts": prompts, "sessionId": sessions[i % len(sessions)]}
+        calls.append(lambda body=body: post("generate_batch", "generate/batch", body))
+    return run_concurrently("generate_batch", calls, concurrency, scenario=f"batch-{batch_size}", docSizeKb=size_kb)
+
+def bench_cleanup(stage, route, concurrency, sessions, size_kb):
+    calls = [lambda s=s: post(stage, route, {"sessionId": s}) for s in sessions]
+    return run_concurrently(stage, calls, concurrency, sessions=len(sessions), docSizeKb=size_kb)
+
+def run(sizes_kb, concurrency_levels, requests, latency):
+    from benchmarks.fakes import FakeServices
+
+    services = FakeServices(latency).install()
+    index_permanent_corpus(services)
+
+    results = []
+    for size_kb in sizes_kb:
+        for concurrency in concurrency_levels:
+            embed_result, sessions = bench_embed(services, size_kb, concurrency, requests)
+            results.append(embed_result)
+
+            # Prompts are unique (fake embeddings of distinct text are near-orthogonal),
+            # so only the "repeated" scenario is served from the caches
+            results.append(bench_generate(concurrency, requests, sessions, "session-documents", size_kb))
+            results.append(bench_generate(concurrency, requests, ["global"], "cv-only", size_kb))
+            results.append(bench_generate(concurrency, requests, ["global"], "cv-only-repeated", size_kb, repeat_prompt=True))
+            results.append(bench_generate_batch(concurrency, requests, sessions, size_kb))
+
+            half = len(sessions) // 2
+            results.append(bench_cleanup("cleanup_session", "cleanup/session", concurrency, sessions[:half], size_kb))
+            results.append(bench_cleanup("cleanup_documents", "cleanup", concurrency, sessions[half:], size_kb))
+            logging.warning(f"Finished {size_kb} KB documents at concurrency {concurrency}")
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def _result_key(result):
+    return tuple(sorted((k, v) for k, v in result.items() if k in ("stage", "scenario", "docSizeKb", "concurrency")))
+
+def compare(results, baseline_path):
+    """Print p95 changes against an earlier results file"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {_result_key(r): r for r in json.load(f)["results"]}
+    for result in results:
+        previous = baseline.get(_result_key(result))
+        if not previous or not previous["p95Ms"]:
+            continue
+        change = (result["p95Ms"] - previous["p95Ms"]) / previous["p95Ms"] * 100
+        labels = ", ".join(f"{k}={v}" for k, v in _result_key(result) if k != "stage")
+        print(f"{result['stage']:<18} {labels:<60} p95 {previous['p95Ms']:>9.1f} -> {result['p95Ms']:>9.1f} ms ({change:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline backend benchmarks against fake Azure services")
+    parser.add_argument("--sizes", default="4,64,512", help="Document sizes in KB (comma-separated)")
+    parser.add_argument("--concurrency", default="1,4,16", help="Concurrency levels (comma-separated)")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per stage and configuration")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every simulated latency (0 for none)")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare p95 latencies against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    snapshot_dir = tempfile.mkdtemp(prefix="bench-corpus-")
+    configure_environment(snapshot_dir)
+
+    # Backend modules live next to this package
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from benchmarks.fakes import Latency
+
+    latency = Latency()
+    for name, value in latency.to_dict().items():
+        setattr(latency, name, value * args.latency_scale)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+    results = run(sizes, concurrency_levels, args.requests, latency)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "gitRevision": git_revision(),
+            "python": platform.python_version(),
+            "cpuCount": os.cpu_count(),
+            "requests": args.requests,
+            "latencyMs": latency.to_dict()
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
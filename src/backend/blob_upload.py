@@ -0,0 +1,103 @@
+import base64
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+
+# Containers confirmed to exist by this worker; checked once per process, not per upload
+_ready_containers = set()
+_lock = threading.Lock()
+
+def ensure_container(container_client):
+    name = container_client.container_name
+    if name in _ready_containers:
+        return
+    from azure.core.exceptions import ResourceExistsError
+    with _lock:
+        if name in _ready_containers:
+            return
+        try:
+            container_client.create_container()
+            logging.info(f"Created blob container '{name}'")
+        except ResourceExistsError:
+            pass
+        _ready_containers.add(name)
+
+def _block_id(index):
+    return base64.b64encode(f"{index:08d}".encode("ascii")).decode("ascii")
+
+def upload_stream(blob_client, stream, content_type=None, block_size=None, max_concurrency=None):
+    """Upload a file-like object as parallel staged blocks.
+
+    At most max_concurrency blocks are read ahead of (and in flight to) Blob
+    Storage at a time. That bounds what this function buffers, not the
+    request: /documents/upload gets a func.HttpRequest whose body the host has
+    already read into memory. MD5 and SHA-256 are computed as the data passes
+    through; MD5 is set as the blob's Content-MD5 and SHA-256 is stored in its
+    metadata so later stages can reuse it without re-reading the blob.
+    """
+    from azure.storage.blob import BlobBlock, ContentSettings
+
+    block_size = block_size or config.BLOB_UPLOAD_BLOCK_SIZE
+    max_concurrency = max_concurrency or config.BLOB_UPLOAD_MAX_CONCURRENCY
+
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    size = 0
+
+    first = stream.read(block_size)
+    md5.update(first)
+    sha256.update(first)
+    size += len(first)
+    second = stream.read(block_size) if len(first) == block_size else b""
+
+    if not second:
+        # Fits in one block: a single Put Blob is cheaper than stage + commit
+        content_settings = ContentSettings(content_type=content_type, content_md5=bytearray(md5.digest()))
+        blob_client.upload_blob(
+            first,
+            overwrite=True,
+            content_settings=content_settings,
+            metadata={"sha256": sha256.hexdigest()}
+        )
+        return {"size": size, "blocks": 1, "contentMd5": base64.b64encode(md5.digest()).decode("ascii"), "sha256": sha256.hexdigest()}
+
+    slots = threading.BoundedSemaphore(max_concurrency)
+    block_ids = []
+    futures = []
+
+    def stage(block_id, data):
+        try:
+            blob_client.stage_block(block_id=block_id, data=data)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        data = first
+        while data:
+            slots.acquire()
+            block_id = _block_id(len(block_ids))
+            block_ids.append(block_id)
+            futures.append(executor.submit(stage, block_id, data))
+            # Fail fast instead of reading the rest of a large file after an error
+            if any(f.done() and f.exception() for f in futures):
+                break
+            if second is not None:
+                data, second = second, None
+            else:
+                data = stream.read(block_size)
+            md5.update(data)
+            sha256.update(data)
+            size += len(data)
+        for future in futures:
+            future.result()
+
+    content_settings = ContentSettings(content_type=content_type, content_md5=bytearray(md5.digest()))
+    blob_client.commit_block_list(
+        [BlobBlock(block_id=block_id) for block_id in block_ids],
+        content_settings=content_settings,
+        metadata={"sha256": sha256.hexdigest()}
+    )
+    return {"size": size, "blocks": len(block_ids), "contentMd5": base64.b64encode(md5.digest()).decode("ascii"), "sha256": sha256.hexdigest()}
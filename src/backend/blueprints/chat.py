@@ -1,31 +1,15 @@
 import azure.functions as func
 import logging
 import json
-from azure.search.documents import SearchClient
-from azure.search.documents.models import VectorizedQuery
-from azure.core.credentials import AzureKeyCredential
-from openai import AzureOpenAI
+from clients import get_openai_client, get_search_client
 from config import config
 
 chat_bp = func.Blueprint()
 
-def get_openai_client():
-    return AzureOpenAI(
-        api_key=config.AZURE_OPENAI_API_KEY,
-        api_version=config.AZURE_OPENAI_API_VERSION,
-        azure_endpoint=config.AZURE_OPENAI_ENDPOINT
-    )
-
-def get_search_client(index_name="documents"):
-    return SearchClient(
-        endpoint=config.AZURE_SEARCH_ENDPOINT,
-        index_name=index_name,
-        credential=AzureKeyCredential(config.AZURE_SEARCH_KEY)
-    )
-
 @chat_bp.route(route="generate", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
 @chat_bp.function_name(name="generate_response")
 def generate_response(req: func.HttpRequest) -> func.HttpResponse:
+    from azure.search.documents.models import VectorizedQuery
     try:
         req_body = req.get_json()
         prompt = req_body.get('prompt')
@@ -2,14 +2,11 @@ import azure.functions as func
 import logging
 import json
 import os
-from azure.storage.blob import BlobServiceClient
+from clients import get_blob_service_client
 from config import config
 
 documents_bp = func.Blueprint()
 
-def get_blob_service_client():
-    return BlobServiceClient.from_connection_string(config.AZURE_STORAGE_CONNECTION_STRING)
-
 @documents_bp.route(route="documents/upload", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
 @documents_bp.function_name(name="upload_document")
 def upload_document(req: func.HttpRequest) -> func.HttpResponse:
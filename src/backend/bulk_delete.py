@@ -0,0 +1,188 @@
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+
+# Matches are read in key order, each page starting after the last id of the
+# previous one, so there is no limit on how many can be read. Indexes created
+# before the key was filterable and sortable (see search_index.build_index_fields)
+# fall back to $skip paging, which Azure AI Search caps at 100,000; reaching the
+# cap raises SkipLimitReached instead of quietly stopping short.
+MAX_SKIP = 100000
+
+_warned_skip_paging = False
+
+class SkipLimitReached(Exception):
+    """$skip paging reached the service limit with matching documents left"""
+
+def key_range_filter(filter_query, after):
+    """filter_query restricted to ids after `after` (None for the first page)"""
+    from search_index import odata_quote
+    if after is None:
+        return filter_query
+    bound = f"id gt {odata_quote(after)}"
+    return f"({filter_query}) and {bound}" if filter_query else bound
+
+def is_unsortable_key_error(error):
+    """True for the 400 an index answers when its key can't be ordered or filtered on"""
+    return getattr(error, "status_code", None) == 400
+
+def warn_skip_paging(error):
+    global _warned_skip_paging
+    if not _warned_skip_paging:
+        _warned_skip_paging = True
+        logging.warning(f"Index key is not sortable, paging with $skip (at most {MAX_SKIP} results): {error}")
+
+def _iter_pages_by_skip(search_client, filter_query, select, page_size):
+    skip = 0
+    while True:
+        results = list(search_client.search(
+            search_text="*",
+            filter=filter_query,
+            select=select,
+            top=page_size,
+            skip=skip
+        ))
+        yield results, True
+        if len(results) < page_size:
+            return
+        skip += page_size
+        if skip > MAX_SKIP:
+            raise SkipLimitReached(f"More than {skip} documents match {filter_query!r}")
+
+def iter_matching_pages(search_client, filter_query, select, page_size=1000):
+    """Yield (page, by_skip) for the documents matching filter_query, one page request at a time.
+
+    by_skip is True once the index has fallen back to $skip paging, where
+    removing documents that were already read would shift the later pages.
+    """
+    from azure.core.exceptions import HttpResponseError
+    after = None
+    while True:
+        try:
+            results = list(search_client.search(
+                search_text="*",
+                filter=key_range_filter(filter_query, after),
+                select=select,
+                order_by=["id"],
+                top=page_size
+            ))
+        except HttpResponseError as e:
+            if after is not None or not is_unsortable_key_error(e):
+                raise
+            warn_skip_paging(e)
+            yield from _iter_pages_by_skip(search_client, filter_query, select, page_size)
+            return
+        yield results, False
+        if len(results) < page_size:
+            return
+        after = results[-1]["id"]
+
+def iter_matching(search_client, filter_query, select, page_size=1000):
+    """Yield every document matching filter_query, one page request at a time"""
+    for results, _ in iter_matching_pages(search_client, filter_query, select, page_size=page_size):
+        yield from results
+
+def iter_matching_ids(search_client, filter_query, page_size=1000):
+    """Yield the key of every matching document, selecting nothing else"""
+    for result in iter_matching(search_client, filter_query, ["id"], page_size=page_size):
+        yield result["id"]
+
+def _delete_batch(search_client, ids, max_attempts):
+    """Delete one batch, retrying the items (or whole request) that fail; returns (deleted, failed ids)"""
+    pending = list(ids)
+    deleted = 0
+    for attempt in range(1, max_attempts + 1):
+        try:
+            results = search_client.delete_documents(documents=[{"id": doc_id} for doc_id in pending])
+            failed = [r.key for r in results if not r.succeeded]
+            deleted += len(pending) - len(failed)
+        except Exception as e:
+            logging.warning(f"Delete batch of {len(pending)} failed (attempt {attempt}/{max_attempts}): {e}")
+            failed = pending
+        if not failed:
+            return deleted, []
+        pending = failed
+        if attempt < max_attempts:
+            time.sleep(min(8.0, 0.5 * 2 ** (attempt - 1)) * (0.5 + random.random()))
+    return deleted, pending
+
+def delete_ids(search_client, ids, batch_size=None, max_concurrency=None, max_attempts=None):
+    """Delete known document keys in bounded concurrent batches; returns deleted/failed totals"""
+    batch_size = batch_size or config.BULK_DELETE_BATCH_SIZE
+    max_concurrency = max_concurrency or config.BULK_DELETE_CONCURRENCY
+    max_attempts = max_attempts or config.BULK_DELETE_MAX_ATTEMPTS
+
+    totals = {"deleted": 0, "failed": 0, "failedIds": []}
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    if not batches:
+        return totals
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+        for deleted, failed in executor.map(lambda batch: _delete_batch(search_client, batch, max_attempts), batches):
+            totals["deleted"] += deleted
+            totals["failed"] += len(failed)
+            totals["failedIds"].extend(failed)
+    return totals
+
+def bulk_delete(search_client, filter_query, batch_size=None, max_concurrency=None, max_attempts=None, max_passes=None):
+    """Delete every document matching filter_query and return totals.
+
+    Matches are listed a page of keys at a time. With key-range paging each
+    page is deleted as soon as it is read (in bounded batches across a small
+    thread pool, retrying failed items), since the next page starts after the
+    last key and deleting doesn't move it. On an index that has to page with
+    $skip, where deleting would shift the pages, all ids are collected first;
+    a listing cut off at the limit is followed by another pass once the first
+    matches are gone, and "complete" is False if matches were still left after
+    the last pass.
+    """
+    batch_size = batch_size or config.BULK_DELETE_BATCH_SIZE
+    max_concurrency = max_concurrency or config.BULK_DELETE_CONCURRENCY
+    max_attempts = max_attempts or config.BULK_DELETE_MAX_ATTEMPTS
+    max_passes = max_passes or config.BULK_DELETE_MAX_PASSES
+
+    totals = {"matched": 0, "deleted": 0, "failed": 0, "passes": 0, "complete": True}
+    seen_failed = set()
+
+    def delete(ids):
+        totals["matched"] += len(ids)
+        deleted = delete_ids(search_client, ids, batch_size, max_concurrency, max_attempts)
+        totals["deleted"] += deleted["deleted"]
+        totals["failed"] += deleted["failed"]
+        # Items that exhausted their retries are not retried again by later passes
+        seen_failed.update(deleted["failedIds"])
+
+    for _ in range(max_passes):
+        listed = []
+        matched = totals["matched"]
+        truncated = False
+        try:
+            for results, by_skip in iter_matching_pages(search_client, filter_query, ["id"]):
+                ids = [result["id"] for result in results if result["id"] not in seen_failed]
+                if by_skip:
+                    listed.extend(ids)
+                elif ids:
+                    delete(ids)
+        except SkipLimitReached:
+            truncated = True
+        # dict.fromkeys de-duplicates while keeping page order
+        ids = [doc_id for doc_id in dict.fromkeys(listed) if doc_id not in seen_failed]
+        if ids:
+            delete(ids)
+        totals["complete"] = not truncated
+        if totals["matched"] == matched:
+            break
+        totals["passes"] += 1
+
+        if not truncated:
+            # Deletes take a moment to become visible; only loop again when the
+            # listing stopped at the $skip limit.
+            break
+
+    if totals["failed"]:
+        logging.error(f"Bulk delete left {totals['failed']} documents undeleted (filter: {filter_query})")
+    if not totals["complete"]:
+        logging.error(f"Bulk delete stopped after {totals['passes']} passes with documents still matching (filter: {filter_query})")
+    return totals
@@ -0,0 +1,139 @@
+import re
+
+from config import config
+from tokens import CHARS_PER_TOKEN
+
+# Token-sized chunking that streams: text pieces (PDF pages, line-aligned
+# blocks) go in, chunks come out as soon as they are full. Chunks are built
+# from whole paragraphs where they fit, then whole sentences, and only split
+# mid-sentence (on whitespace) when a single sentence is larger than a chunk.
+# Consecutive chunks share up to overlap_tokens of trailing sentences (or
+# words, if no whole sentence fits) so retrieval keeps some context across
+# the cut.
+#
+# Sizes are given in tokens and converted to characters with the same
+# estimate as tokens.estimate_tokens, so every chunk satisfies
+# estimate_tokens(chunk) <= max_tokens without counting per unit. These are
+# estimated tokens, not tokenizer counts (see tokens.py): a chunk of English
+# prose is close to max_tokens, while code, numbers or non-English text can
+# tokenize to noticeably more. The limit sizes chunks for retrieval; it is
+# nowhere near the embedding model's input limit, so the difference is safe.
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+WHITESPACE = re.compile(r"\s+")
+
+def _split_oversized(text, max_chars):
+    """Split text that is too big for one chunk: by sentence, then by words, then by characters"""
+    for pattern in (SENTENCE_END, WHITESPACE):
+        parts = [p for p in pattern.split(text) if p]
+        if len(parts) > 1:
+            units = []
+            for part in parts:
+                if len(part) > max_chars:
+                    units.extend(_split_oversized(part, max_chars))
+                else:
+                    units.append(part)
+            return units
+    # A single "word" longer than a chunk (e.g. a base64 blob)
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+def _collapse_whitespace(text):
+    """" ".join(text.split()), without splitting into words when only newlines need replacing"""
+    if text.isascii():
+        joined = text.replace("\n", " ")
+        # Printable ASCII has no whitespace but the space, so single spaces are all there is
+        if joined.isprintable() and "  " not in joined:
+            return joined.strip(" ")
+    return " ".join(text.split())
+
+def _paragraph_units(paragraph, continues, max_chars):
+    """(separator, text) units for one paragraph (or the rest of one, if continues)"""
+    paragraph = _collapse_whitespace(paragraph)
+    if not paragraph:
+        return []
+    first_separator = " " if continues else "\n\n"
+    if len(paragraph) <= max_chars:
+        return [(first_separator, paragraph)]
+    units = [(" ", part) for part in _split_oversized(paragraph, max_chars)]
+    units[0] = (first_separator, units[0][1])
+    return units
+
+def _iter_paragraphs(pieces, max_carry_chars):
+    """Yield (paragraph, continues) from a stream of pieces.
+
+    A paragraph that is still open at the end of a piece is carried into the
+    next. Text without blank lines (common in PDF extraction) would otherwise be
+    carried indefinitely, so once the carry passes max_carry_chars its complete
+    sentences are released and the remainder is yielded later with continues=True.
+    """
+    carry = ""
+    continues = False
+    for piece in pieces:
+        paragraphs = PARAGRAPH_BREAK.split(carry + piece + "\n")
+        carry = paragraphs.pop()
+        for paragraph in paragraphs:
+            yield paragraph, continues
+            continues = False
+        if len(carry) > max_carry_chars:
+            # Cut after the last sentence, or after the last word if there is none
+            cut = max((m.end() for m in SENTENCE_END.finditer(carry)), default=0) or carry.rstrip().rfind(" ") + 1
+            if cut:
+                yield carry[:cut], continues
+                carry = carry[cut:]
+                continues = True
+    if carry.strip():
+        yield carry, continues
+
+def _overlap(separators, texts, overlap_chars):
+    """Trailing units of a finished chunk to repeat at the start of the next: (separators, texts, size)"""
+    if overlap_chars <= 0:
+        return [], [], 0
+    count = 0
+    size = 0
+    for i in range(len(texts) - 1, -1, -1):
+        if size + len(texts[i]) > overlap_chars:
+            break
+        size += len(texts[i]) + len(separators[i])
+        count += 1
+    if count:
+        # The first carried unit's separator isn't part of the chunk text
+        return separators[-count:], texts[-count:], size - len(separators[-count])
+    # No whole unit fits: take the tail of the last unit from its first
+    # sentence start, or failing that its first word start
+    tail = texts[-1][-overlap_chars:]
+    match = SENTENCE_END.search(tail) or WHITESPACE.search(tail)
+    if match and match.end() < len(tail):
+        tail = tail[match.end():]
+        return [" "], [tail], len(tail)
+    return [], [], 0
+
+def _join(separators, texts):
+    """Chunk text of units; the first unit's separator is dropped"""
+    if len(texts) == 1:
+        return texts[0]
+    return texts[0] + "".join([separator + text for separator, text in zip(separators[1:], texts[1:])])
+
+def iter_token_chunks(pieces, max_tokens=None, overlap_tokens=None):
+    """Yield chunks of at most max_tokens (estimated) from an iterable of text pieces"""
+    max_tokens = max_tokens or config.CHUNK_MAX_TOKENS
+    overlap_tokens = config.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens, max_tokens // 2) * CHARS_PER_TOKEN
+
+    # The current chunk's units as parallel lists, and the length of its text
+    separators, texts = [], []
+    size = 0
+    for paragraph, continues in _iter_paragraphs(pieces, max_carry_chars=8 * max_chars):
+        for separator, text in _paragraph_units(paragraph, continues, max_chars):
+            if texts and size + len(separator) + len(text) > max_chars:
+                yield _join(separators, texts)
+                # The next chunk starts with the overlap and always gets this unit too
+                separators, texts, size = _overlap(separators, texts, overlap_chars)
+                if texts and size + len(separator) + len(text) > max_chars:
+                    separators, texts, size = [], [], 0
+            size += len(text) + (len(separator) if texts else 0)
+            separators.append(separator)
+            texts.append(text)
+    if texts:
+        yield _join(separators, texts)
@@ -0,0 +1,135 @@
+import logging
+import threading
+
+# Process-wide client registry. Azure Functions keeps a Python worker alive
+# between invocations, so clients (and their keep-alive connection pools)
+# built here are reused by every request the worker serves.
+_lock = threading.RLock()
+_clients = {}
+_fingerprint = None
+
+def _config_fingerprint():
+    from config import config
+    return (
+        config.AZURE_OPENAI_ENDPOINT,
+        config.AZURE_OPENAI_API_KEY,
+        config.AZURE_OPENAI_API_VERSION,
+        config.AZURE_SEARCH_ENDPOINT,
+        config.AZURE_SEARCH_KEY,
+        config.AZURE_STORAGE_CONNECTION_STRING,
+        config.CLIENT_POOL_SIZE,
+    )
+
+def _get_or_create(key, factory):
+    """Return the pooled client for key, rebuilding the registry if config changed"""
+    global _fingerprint
+    fingerprint = _config_fingerprint()
+    client = _clients.get(key)
+    if client is not None and fingerprint == _fingerprint:
+        return client
+
+    with _lock:
+        if fingerprint != _fingerprint:
+            if _clients:
+                logging.info("Client configuration changed - rebuilding pooled clients")
+            # Retired clients are not closed: in-flight requests on other threads
+            # may still hold them, and they are released once unreferenced.
+            _clients.clear()
+            _fingerprint = fingerprint
+        client = _clients.get(key)
+        if client is None:
+            client = factory()
+            _clients[key] = client
+        return client
+
+def reset_clients():
+    """Drop every pooled client so the next call rebuilds from current config (e.g. after a test installed fakes)"""
+    global _fingerprint
+    with _lock:
+        _clients.clear()
+        _fingerprint = None
+
+def install_clients(clients):
+    """Replace the pooled clients with stand-ins (keys as used by the getters below), e.g. for benchmarks"""
+    global _fingerprint
+    with _lock:
+        _clients.clear()
+        _clients.update(clients)
+        _fingerprint = _config_fingerprint()
+
+def _azure_transport():
+    """Shared requests session with a sized keep-alive pool for Azure SDK clients"""
+    def build():
+        import requests
+        from requests.adapters import HTTPAdapter
+        from config import config
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=config.CLIENT_POOL_SIZE, pool_maxsize=config.CLIENT_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    session = _get_or_create("azure-session", build)
+    from azure.core.pipeline.transport import RequestsTransport
+    return RequestsTransport(session=session, session_owner=False)
+
+def get_openai_client(priority="interactive"):
+    """The pooled Azure OpenAI client, with calls scheduled at priority (see openai_scheduler.py)"""
+    def build():
+        from openai import AzureOpenAI, DefaultHttpxClient
+        import httpx
+        from config import config
+        return AzureOpenAI(
+            api_key=config.AZURE_OPENAI_API_KEY,
+            api_version=config.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
+            # The scheduler retries, honouring Retry-After across all callers
+            max_retries=0,
+            http_client=DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=config.CLIENT_POOL_SIZE,
+                    max_keepalive_connections=config.CLIENT_POOL_SIZE
+                )
+            )
+        )
+    from openai_scheduler import ScheduledOpenAI
+    return ScheduledOpenAI(_get_or_create("openai", build), priority)
+
+def get_blob_service_client():
+    def build():
+        from azure.storage.blob import BlobServiceClient
+        from config import config
+        return BlobServiceClient.from_connection_string(
+            config.AZURE_STORAGE_CONNECTION_STRING,
+            transport=_azure_transport()
+        )
+    return _get_or_create("blob", build)
+
+def get_search_index_client():
+    def build():
+        from azure.search.documents.indexes import SearchIndexClient
+        from azure.core.credentials import AzureKeyCredential
+        from config import config
+        return SearchIndexClient(
+            endpoint=config.AZURE_SEARCH_ENDPOINT,
+            credential=AzureKeyCredential(config.AZURE_SEARCH_KEY),
+            transport=_azure_transport()
+        )
+    return _get_or_create("search-index", build)
+
+def get_search_client(index_name=None):
+    """Client for index_name, or for the active index version when it isn't given"""
+    if index_name is None:
+        from index_versions import active_index_name
+        index_name = active_index_name()
+
+    def build():
+        from azure.search.documents import SearchClient
+        from azure.core.credentials import AzureKeyCredential
+        from config import config
+        return SearchClient(
+            endpoint=config.AZURE_SEARCH_ENDPOINT,
+            index_name=index_name,
+            credential=AzureKeyCredential(config.AZURE_SEARCH_KEY),
+            transport=_azure_transport()
+        )
+    return _get_or_create(f"search:{index_name}", build)
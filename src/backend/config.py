@@ -10,9 +10,137 @@ class Config:
         self.AZURE_SEARCH_KEY = os.getenv("AZURE_SEARCH_KEY")
         self.AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
         self.AZURE_STORAGE_CONTAINER_NAME = os.getenv("AZURE_STORAGE_CONTAINER_NAME", "documents")
+        # Internal bookkeeping blobs (corpus version etc.), kept out of the documents listing
+        self.AZURE_STORAGE_META_CONTAINER_NAME = os.getenv("AZURE_STORAGE_META_CONTAINER_NAME", "rag-meta")
         
         # Model deployments in Sweden Central
         self.OPENAI_CHAT_MODEL = "chat"  # gpt-4.1
         self.OPENAI_EMBEDDING_MODEL = "embedding"  # text-embedding-ada-002
+        # Native vector size of the embedding deployment; indexes built with fewer
+        # dimensions request shortened embeddings (text-embedding-3 models only)
+        self.OPENAI_EMBEDDING_DIMENSIONS = int(os.getenv("OPENAI_EMBEDDING_DIMENSIONS", "1536"))
+
+        # Azure OpenAI quotas per deployment, shared by every call on a worker
+        # (see openai_scheduler.py); 0 disables a limit. Set them to the
+        # deployment's quota divided by the number of workers.
+        self.OPENAI_CHAT_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_CHAT_REQUESTS_PER_MINUTE", "300"))
+        self.OPENAI_CHAT_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_CHAT_TOKENS_PER_MINUTE", "50000"))
+        self.OPENAI_EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_EMBEDDING_REQUESTS_PER_MINUTE", "720"))
+        self.OPENAI_EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_EMBEDDING_TOKENS_PER_MINUTE", "120000"))
+        # Tokens charged for a completion that doesn't set max_tokens
+        self.OPENAI_COMPLETION_TOKEN_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_TOKEN_ESTIMATE", "800"))
+        # Share of each budget bulk work (ingest, migrations) leaves for interactive requests
+        self.OPENAI_BULK_RESERVE_FRACTION = float(os.getenv("OPENAI_BULK_RESERVE_FRACTION", "0.2"))
+        self.OPENAI_INTERACTIVE_MAX_WAIT_SECONDS = float(os.getenv("OPENAI_INTERACTIVE_MAX_WAIT_SECONDS", "20"))
+        self.OPENAI_BULK_MAX_WAIT_SECONDS = float(os.getenv("OPENAI_BULK_MAX_WAIT_SECONDS", "300"))
+        self.OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "6"))
+        self.OPENAI_RETRY_MAX_DELAY_SECONDS = float(os.getenv("OPENAI_RETRY_MAX_DELAY_SECONDS", "20"))
+
+        # Keep-alive connections per host for the pooled clients (see clients.py)
+        self.CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "10"))
+        # Also run warmup_timer whenever the host starts. Off by default: on the
+        # Consumption plan that means an extra billed run on every scale-out and restart
+        self.WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+
+        # Embedding batching for ingest
+        self.EMBEDDING_BATCH_MAX_ITEMS = int(os.getenv("EMBEDDING_BATCH_MAX_ITEMS", "64"))
+        self.EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "32000"))
+        self.EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+
+        # Streaming block upload for /documents/upload
+        self.BLOB_UPLOAD_BLOCK_SIZE = int(os.getenv("BLOB_UPLOAD_BLOCK_SIZE", str(4 * 1024 * 1024)))
+        self.BLOB_UPLOAD_MAX_CONCURRENCY = int(os.getenv("BLOB_UPLOAD_MAX_CONCURRENCY", "4"))
+
+        # Cached /documents listing pages (invalidated by upload/delete on the same worker)
+        self.DOCUMENT_LIST_CACHE_TTL_SECONDS = int(os.getenv("DOCUMENT_LIST_CACHE_TTL_SECONDS", "10"))
+
+        # Ingest pipeline: "sync" (staged) or "async" (overlapped stages, see ingest_pipeline.py)
+        self.INGEST_PIPELINE = os.getenv("INGEST_PIPELINE", "sync")
+        self.INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "256"))
+        self.INGEST_UPLOAD_CONCURRENCY = int(os.getenv("INGEST_UPLOAD_CONCURRENCY", "2"))
+
+        # Ingest jobs (/embed with "mode": "job", see ingest_jobs.py). INGEST_JOB_QUEUE is
+        # "storage" (the ingest-jobs queue) or "memory" (in-process, for local runs);
+        # INGEST_JOB_MAX_ATTEMPTS must match queues.maxDequeueCount in host.json
+        self.INGEST_DEFAULT_MODE = os.getenv("INGEST_DEFAULT_MODE", "inline")
+        self.INGEST_JOB_QUEUE = os.getenv("INGEST_JOB_QUEUE", "storage")
+        self.INGEST_JOB_STORE_BACKEND = os.getenv("INGEST_JOB_STORE_BACKEND", "blob")
+        self.INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+        self.INGEST_JOB_PROGRESS_INTERVAL_SECONDS = float(os.getenv("INGEST_JOB_PROGRESS_INTERVAL_SECONDS", "2"))
+        self.INGEST_JOB_TTL_HOURS = int(os.getenv("INGEST_JOB_TTL_HOURS", "24"))
+
+        # PDF extraction (large PDFs are split across a process pool)
+        self.PDF_EXTRACT_MAX_WORKERS = int(os.getenv("PDF_EXTRACT_MAX_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+        self.PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "32"))
+        self.PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+        # Vector settings for the next index version built by index_migration.py;
+        # the index serving traffic keeps the settings it was built with
+        self.SEARCH_VECTOR_DIMENSIONS = int(os.getenv("SEARCH_VECTOR_DIMENSIONS", "1536"))
+        self.SEARCH_HNSW_M = int(os.getenv("SEARCH_HNSW_M", "4"))
+        self.SEARCH_HNSW_EF_CONSTRUCTION = int(os.getenv("SEARCH_HNSW_EF_CONSTRUCTION", "400"))
+        self.SEARCH_HNSW_EF_SEARCH = int(os.getenv("SEARCH_HNSW_EF_SEARCH", "500"))
+        self.SEARCH_VECTOR_COMPRESSION = os.getenv("SEARCH_VECTOR_COMPRESSION", "none")  # none, scalar or binary
+        self.SEARCH_RESCORE_OVERSAMPLING = float(os.getenv("SEARCH_RESCORE_OVERSAMPLING", "4"))
+        self.SEARCH_INDEX_POINTER_POLL_SECONDS = int(os.getenv("SEARCH_INDEX_POINTER_POLL_SECONDS", "30"))
+
+        # Chunking for indexing (see chunker.py); tokens are estimated at 4 characters
+        # each (see tokens.py), not counted with the model's tokenizer
+        self.CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "250"))
+        self.CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "25"))
+
+        # Session registry backend for cleanup: "blob" (meta container) or "memory" (local/tests)
+        self.SESSION_REGISTRY_BACKEND = os.getenv("SESSION_REGISTRY_BACKEND", "blob")
+
+        # Bulk delete (cleanup endpoints and timer)
+        self.BULK_DELETE_BATCH_SIZE = int(os.getenv("BULK_DELETE_BATCH_SIZE", "500"))
+        self.BULK_DELETE_CONCURRENCY = int(os.getenv("BULK_DELETE_CONCURRENCY", "4"))
+        self.BULK_DELETE_MAX_ATTEMPTS = int(os.getenv("BULK_DELETE_MAX_ATTEMPTS", "4"))
+        self.BULK_DELETE_MAX_PASSES = int(os.getenv("BULK_DELETE_MAX_PASSES", "10"))
+
+        # Query embedding cache for /generate
+        self.QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+        self.QUERY_EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+
+        # Semantic answer cache for permanent-only (CV) questions
+        self.ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+        self.ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIMILARITY_THRESHOLD", "0.97"))
+        self.ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+        self.CORPUS_VERSION_POLL_SECONDS = int(os.getenv("CORPUS_VERSION_POLL_SECONDS", "30"))
+
+        # /generate/batch: prompts per request and how many searches/completions run at once
+        self.GENERATE_BATCH_MAX_PROMPTS = int(os.getenv("GENERATE_BATCH_MAX_PROMPTS", "50"))
+        self.GENERATE_BATCH_SEARCH_CONCURRENCY = int(os.getenv("GENERATE_BATCH_SEARCH_CONCURRENCY", "8"))
+        self.GENERATE_BATCH_COMPLETION_CONCURRENCY = int(os.getenv("GENERATE_BATCH_COMPLETION_CONCURRENCY", "4"))
+
+        # Chunks retrieved per prompt. With RETRIEVAL_MMR, RETRIEVAL_MMR_CANDIDATES are
+        # fetched (with vectors) and re-ranked down to RETRIEVAL_TOP_K by Maximal
+        # Marginal Relevance; lambda 1 is pure relevance, lower favours diversity
+        self.RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+        self.RETRIEVAL_MMR = os.getenv("RETRIEVAL_MMR", "false").lower() == "true"
+        self.RETRIEVAL_MMR_CANDIDATES = int(os.getenv("RETRIEVAL_MMR_CANDIDATES", "30"))
+        self.RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7"))
+
+        # Prompt context packing (see context_packer.py)
+        self.CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+        # Conversation memory (see conversation.py)
+        self.CONVERSATION_STORE_BACKEND = os.getenv("CONVERSATION_STORE_BACKEND", "blob")
+        self.CONVERSATION_RECENT_TURNS = int(os.getenv("CONVERSATION_RECENT_TURNS", "4"))
+        self.CONVERSATION_SUMMARY_MAX_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_MAX_TOKENS", "300"))
+        # A follow-up at least this similar to the previous question reuses its
+        # retrieval; 0 (the default) always searches. Related questions about
+        # different things often score 0.9, so only near-repeats (~0.98) are safe
+        self.CONVERSATION_REUSE_SIMILARITY = float(os.getenv("CONVERSATION_REUSE_SIMILARITY", "0"))
+        self.CONVERSATION_TTL_HOURS = int(os.getenv("CONVERSATION_TTL_HOURS", "24"))
+
+        # In-process vector search over the permanent corpus (see vector_engine.py)
+        self.LOCAL_VECTOR_ENGINE = os.getenv("LOCAL_VECTOR_ENGINE", "true").lower() == "true"
+        self.LOCAL_VECTOR_SNAPSHOT_DIR = os.getenv("LOCAL_VECTOR_SNAPSHOT_DIR", "")
+        self.SESSION_LOOKUP_CACHE_TTL_SECONDS = int(os.getenv("SESSION_LOOKUP_CACHE_TTL_SECONDS", "15"))
+
+    def reload(self):
+        """Re-read settings from the environment; pooled clients rebuild on next use"""
+        self.__init__()
 
 config = Config()
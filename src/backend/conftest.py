@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+# Backend settings for tests that drive the handlers against the fakes in
+# benchmarks/fakes.py: every store in memory, no quotas, no waiting on the
+# index to settle
+OFFLINE_SETTINGS = {
+    "SESSION_REGISTRY_BACKEND": "memory",
+    "CONVERSATION_STORE_BACKEND": "memory",
+    "INGEST_JOB_STORE_BACKEND": "memory",
+    "INGEST_JOB_QUEUE": "memory",
+    "INGEST_PIPELINE": "sync",
+    "OPENAI_CHAT_REQUESTS_PER_MINUTE": 0,
+    "OPENAI_CHAT_TOKENS_PER_MINUTE": 0,
+    "OPENAI_EMBEDDING_REQUESTS_PER_MINUTE": 0,
+    "OPENAI_EMBEDDING_TOKENS_PER_MINUTE": 0,
+}
+
+@pytest.fixture
+def services(monkeypatch, tmp_path):
+    """Fake Azure services in the client pool, with fresh per-worker state for one test"""
+    import clients
+    import conversation
+    import corpus
+    import index_versions
+    import ingest_jobs
+    import retrieval
+    import search_index
+    import semantic_cache
+    import session_registry
+    import vector_engine
+    from benchmarks.fakes import FakeServices, Latency
+    from caches import TTLCache
+    from config import config
+
+    for name, value in OFFLINE_SETTINGS.items():
+        monkeypatch.setattr(config, name, value)
+    monkeypatch.setattr(config, "LOCAL_VECTOR_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(vector_engine, "INDEX_SETTLE_SECONDS", 0)
+    for module, name, value in (
+        (session_registry, "_registry", None),
+        (session_registry, "_session_lookup_cache", TTLCache(max_entries=64, ttl_seconds=60)),
+        (conversation, "_store", None),
+        (ingest_jobs, "_store", None),
+        (corpus, "_cached_version", None),
+        (index_versions, "_cached_active", None),
+        (vector_engine, "_engine", None),
+        (search_index, "_verified", {}),
+        (search_index, "_mismatches", {}),
+        (retrieval, "query_embedding_cache", TTLCache(max_entries=64, ttl_seconds=60)),
+        (semantic_cache, "answer_cache", semantic_cache.SemanticCache(max_entries=16, threshold=0.97, ttl_seconds=60)),
+    ):
+        monkeypatch.setattr(module, name, value)
+
+    fakes = FakeServices(Latency.zero()).install()
+    yield fakes
+    clients.reset_clients()
+
+@pytest.fixture
+def call(services):
+    """Invoke an HTTP handler of function_app with a JSON body; returns (status, parsed body)"""
+    from benchmarks.run import post
+
+    def invoke(name, route, body):
+        response = post(name, route, body)
+        payload = response.get_body()
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = payload.decode("utf-8")
+        return response.status_code, payload
+    return invoke
@@ -0,0 +1,126 @@
+import re
+
+from tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Packs retrieved chunks into the prompt context under a token budget. Chunks
+# are split with a short token overlap (see chunker.py), so neighbouring hits from the same
+# file repeat text; they are stitched into one passage first. Passages that say
+# (nearly) the same thing as a better-ranked one are dropped, and the rest are
+# added in rank order for as long as they fit.
+
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400
+SHINGLE_WORDS = 5
+DUPLICATE_SIMILARITY = 0.8
+
+def split_chunk_id(doc_id):
+    """(document key, chunk index) from an index id ending in -<i>, or (doc_id, None)"""
+    if not doc_id:
+        return doc_id, None
+    key, _, index = doc_id.rpartition("-")
+    return (key, int(index)) if key and index.isdigit() else (doc_id, None)
+
+def stitch(first, second):
+    """Join two consecutive chunks, dropping the text the second repeats from the first"""
+    limit = min(len(first), len(second), MAX_OVERLAP_CHARS)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+def is_near_duplicate(shingles, kept):
+    """True if most of this passage's shingles already appear in one kept passage"""
+    for other in kept:
+        overlap = len(shingles & other)
+        if overlap / max(1, min(len(shingles), len(other))) >= DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+def merge_adjacent(results):
+    """Group ranked results into passages, stitching consecutive chunks of the same document.
+
+    Returns passages in rank order (a passage ranks as its best chunk), each a
+    dict with filename, content and documentType.
+    """
+    groups = {}
+    for rank, result in enumerate(results):
+        key, index = split_chunk_id(result.get("id"))
+        if index is None:
+            key = ("unkeyed", rank)
+        groups.setdefault(key, []).append((index, rank, result))
+
+    passages = []
+    for members in groups.values():
+        # Keyed groups hold chunks of one document; order them by position in it
+        members.sort(key=lambda member: member[0] or 0)
+        run = [members[0]]
+        for member in members[1:]:
+            if run[-1][0] is not None and member[0] == run[-1][0] + 1:
+                run.append(member)
+            else:
+                passages.append(_passage(run))
+                run = [member]
+        passages.append(_passage(run))
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages
+
+def _passage(run):
+    content = run[0][2]["content"]
+    for _, _, result in run[1:]:
+        content = stitch(content, result["content"])
+    first = run[0][2]
+    return {
+        "rank": min(rank for _, rank, _ in run),
+        "filename": first["filename"],
+        "documentType": first.get("documentType"),
+        "content": content
+    }
+
+def format_passage(passage):
+    return f"Source: {passage['filename']}\nContent: {passage['content']}\n\n"
+
+def truncate_to_budget(passage, token_budget):
+    """Cut a passage's content so the formatted passage fits token_budget"""
+    overhead = estimate_tokens(format_passage({**passage, "content": ""}))
+    max_chars = max(0, (token_budget - overhead) * CHARS_PER_TOKEN)
+    return {**passage, "content": passage["content"][:max_chars]}
+
+def pack_context(results, token_budget):
+    """Build the prompt context from ranked search results within token_budget.
+
+    Returns a dict with the context string, the citation filenames and whether
+    every passage that made it in came from the permanent corpus.
+    """
+    passages = merge_adjacent(results)
+    kept_shingles = []
+    packed = []
+    used = 0
+    for passage in passages:
+        shingles = _shingles(passage["content"])
+        if is_near_duplicate(shingles, kept_shingles):
+            continue
+        tokens = estimate_tokens(format_passage(passage))
+        if used + tokens > token_budget:
+            # A lower-ranked but shorter passage may still fit
+            continue
+        kept_shingles.append(shingles)
+        packed.append(passage)
+        used += tokens
+
+    if not packed and passages:
+        # Even the best passage is over budget on its own; send as much of it as fits
+        packed.append(truncate_to_budget(passages[0], token_budget))
+
+    return {
+        "context": "".join(format_passage(p) for p in packed),
+        "citations": [p["filename"] for p in packed],
+        # Nothing retrieved isn't evidence the answer only depends on permanent documents
+        "permanent_only": bool(packed) and all(p["documentType"] == "permanent" for p in packed),
+        "tokens": sum(estimate_tokens(format_passage(p)) for p in packed)
+    }
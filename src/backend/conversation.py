@@ -0,0 +1,281 @@
+import base64
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+import numpy as np
+
+from config import config
+
+# Server-side conversation memory keyed by sessionId. The last few turns are
+# kept verbatim; once there are twice as many, the older ones are folded into a
+# rolling summary by the chat model, so the history sent with each prompt stays
+# bounded no matter how long the chat runs. The previous turn's retrieval is
+# kept too, so a follow-up that asks about the same thing can skip the search.
+#
+# Turns are recorded after the answer has been sent, on a small per-worker pool
+# (record_turn_later), so the store write and an occasional summarization never
+# hold up the response. A request that arrives on the same worker while its
+# session's previous turn is still being recorded waits for it (up to
+# RECORD_WAIT_SECONDS) before loading the conversation.
+#
+# State shape:
+#   {"sessionId": "...", "summary": "...", "turns": [{"user": "...", "assistant": "..."}],
+#    "lastRetrieval": {"vector": "<base64 float32>", "context": "...", "citations": [...], "permanentOnly": bool},
+#    "updatedAt": "<iso>"}
+
+SUMMARY_PROMPT = """You maintain a running summary of a chat between a visitor and SamBot, an assistant that answers questions about Samrudh Anavatti's CV.
+Merge the existing summary and the new exchanges into one concise summary. Keep names, facts, and what the visitor is interested in; drop greetings and repetition."""
+
+RECORD_WORKERS = 2
+RECORD_WAIT_SECONDS = 10
+
+def new_state(session_id):
+    return {"sessionId": session_id, "summary": "", "turns": [], "lastRetrieval": None, "updatedAt": None}
+
+def encode_vector(vector):
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+def decode_vector(encoded):
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float32)
+
+class InMemoryConversationStore:
+    """Process-local store for tests and local runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def load(self, session_id):
+        """(state, version token) - state is None for a new conversation"""
+        with self._lock:
+            entry = self._states.get(session_id)
+            if entry is None:
+                return None, None
+            state, version = entry
+            return json.loads(json.dumps(state)), version
+
+    def save(self, session_id, state, token):
+        """Write state if nothing changed since load returned token; False on a conflict"""
+        with self._lock:
+            current = self._states.get(session_id)
+            if (current[1] if current else None) != token:
+                return False
+            self._states[session_id] = (json.loads(json.dumps(state)), (token or 0) + 1)
+            return True
+
+    def delete(self, session_id):
+        with self._lock:
+            self._states.pop(session_id, None)
+
+    def expire(self, cutoff):
+        """Delete conversations last updated before cutoff; returns how many"""
+        with self._lock:
+            expired = [
+                session_id for session_id, (state, _) in self._states.items()
+                if state.get("updatedAt") and datetime.fromisoformat(state["updatedAt"]) < cutoff
+            ]
+            for session_id in expired:
+                del self._states[session_id]
+        return len(expired)
+
+class BlobConversationStore:
+    """One JSON blob per conversation (conversations/<session>.json) in the meta container, written with ETags"""
+
+    PREFIX = "conversations/"
+
+    def _container(self):
+        from clients import get_blob_service_client
+        return get_blob_service_client().get_container_client(config.AZURE_STORAGE_META_CONTAINER_NAME)
+
+    def _blob_name(self, session_id):
+        return f"{self.PREFIX}{quote(session_id, safe='')}.json"
+
+    def load(self, session_id):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            downloader = self._container().get_blob_client(self._blob_name(session_id)).download_blob()
+        except ResourceNotFoundError:
+            return None, None
+        return json.loads(downloader.readall()), downloader.properties.etag
+
+    def save(self, session_id, state, token):
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+        container = self._container()
+        blob_client = container.get_blob_client(self._blob_name(session_id))
+        data = json.dumps(state).encode("utf-8")
+        for _ in range(2):
+            try:
+                if token:
+                    blob_client.upload_blob(data, overwrite=True, etag=token, match_condition=MatchConditions.IfNotModified)
+                else:
+                    blob_client.upload_blob(data, overwrite=False)
+                return True
+            except (ResourceModifiedError, ResourceExistsError):
+                return False
+            except ResourceNotFoundError:
+                container.create_container()
+        return False
+
+    def delete(self, session_id):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            self._container().delete_blob(self._blob_name(session_id))
+        except ResourceNotFoundError:
+            pass
+
+    def expire(self, cutoff):
+        from azure.core.exceptions import ResourceNotFoundError
+        container = self._container()
+        expired = 0
+        try:
+            for blob in container.list_blobs(name_starts_with=self.PREFIX):
+                if blob.last_modified and blob.last_modified.replace(tzinfo=None) < cutoff:
+                    try:
+                        container.delete_blob(blob.name)
+                        expired += 1
+                    except ResourceNotFoundError:
+                        pass
+        except ResourceNotFoundError:
+            return 0
+        return expired
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_conversation_store():
+    """Store selected by CONVERSATION_STORE_BACKEND ("blob" or "memory"), shared per process"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if config.CONVERSATION_STORE_BACKEND == "memory":
+                    _store = InMemoryConversationStore()
+                else:
+                    _store = BlobConversationStore()
+    return _store
+
+def load_conversation(session_id):
+    """The session's conversation state (a fresh one if there is none or the store is unavailable)"""
+    _wait_for_recording(session_id)
+    try:
+        state, _ = get_conversation_store().load(session_id)
+    except Exception as e:
+        logging.warning(f"Conversation store unavailable for {session_id}: {e}")
+        state = None
+    return state or new_state(session_id)
+
+def history_messages(state):
+    """Chat messages carrying the summary and verbatim recent turns"""
+    messages = []
+    if state["summary"]:
+        messages.append({"role": "system", "content": f"Summary of the conversation so far:\n{state['summary']}"})
+    for turn in state["turns"]:
+        messages.append({"role": "user", "content": turn["user"]})
+        messages.append({"role": "assistant", "content": turn["assistant"]})
+    return messages
+
+def history_key(messages):
+    """Stable hash of the history messages (None without history), for scoping cached answers"""
+    if not messages:
+        return None
+    return hashlib.sha256(json.dumps(messages, sort_keys=True).encode("utf-8")).hexdigest()
+
+def previous_retrieval(state):
+    """The last turn's retrieval in retrieve_context's shape, or None"""
+    last = state.get("lastRetrieval")
+    if not last:
+        return None
+    return {
+        "context": last["context"],
+        "citations": last["citations"],
+        "query_vector": decode_vector(last["vector"]),
+        "permanent_only": last["permanentOnly"]
+    }
+
+def summarize(openai_client, summary, turns):
+    """Fold turns into the running summary with one chat completion"""
+    transcript = "\n".join(f"Visitor: {t['user']}\nSamBot: {t['assistant']}" for t in turns)
+    response = openai_client.chat.completions.create(
+        model=config.OPENAI_CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew exchanges:\n{transcript}"}
+        ],
+        max_tokens=config.CONVERSATION_SUMMARY_MAX_TOKENS
+    )
+    return response.choices[0].message.content.strip()
+
+def _append_turn(openai_client, state, prompt, response, retrieved):
+    state["turns"].append({"user": prompt, "assistant": response})
+    recent = config.CONVERSATION_RECENT_TURNS
+    # Fold in batches (only once there are 2x the verbatim turns) so most turns
+    # don't pay for a summarization call
+    if len(state["turns"]) > 2 * recent:
+        older, state["turns"] = state["turns"][:-recent], state["turns"][-recent:]
+        try:
+            state["summary"] = summarize(openai_client, state["summary"], older)
+        except Exception as e:
+            # The older turns are lost from memory but the prompt stays bounded
+            logging.warning(f"Conversation summary failed for {state['sessionId']}: {e}")
+    if retrieved.get("query_vector") is not None:
+        state["lastRetrieval"] = {
+            "vector": encode_vector(retrieved["query_vector"]),
+            "context": retrieved["context"],
+            "citations": retrieved["citations"],
+            "permanentOnly": retrieved["permanent_only"]
+        }
+    state["updatedAt"] = datetime.utcnow().isoformat()
+    return state
+
+def record_turn(openai_client, session_id, prompt, response, retrieved, max_attempts=3):
+    """Append a turn (summarizing older ones as needed); failures are logged, never raised"""
+    store = get_conversation_store()
+    try:
+        for _ in range(max_attempts):
+            state, token = store.load(session_id)
+            state = _append_turn(openai_client, state or new_state(session_id), prompt, response, retrieved)
+            if store.save(session_id, state, token):
+                return
+            # Another request in this session saved first; re-apply on top of it
+        logging.warning(f"Gave up recording conversation turn for {session_id} after {max_attempts} conflicts")
+    except Exception as e:
+        logging.warning(f"Failed to record conversation turn for {session_id}: {e}")
+
+_record_pool = None
+_recording = {}  # session id -> future of its latest background record_turn
+_recording_lock = threading.Lock()
+
+def _wait_for_recording(session_id):
+    with _recording_lock:
+        future = _recording.get(session_id)
+    if future is None:
+        return
+    try:
+        future.result(timeout=RECORD_WAIT_SECONDS)
+    except Exception:
+        # Still running (or failed, which record_turn has logged); load what is stored
+        pass
+
+def record_turn_later(openai_client, session_id, prompt, response, retrieved):
+    """record_turn on the background pool, so the caller can answer without waiting for it"""
+    global _record_pool
+    with _recording_lock:
+        if _record_pool is None:
+            _record_pool = ThreadPoolExecutor(max_workers=RECORD_WORKERS, thread_name_prefix="conversation")
+        future = _record_pool.submit(record_turn, openai_client, session_id, prompt, response, retrieved)
+        _recording[session_id] = future
+
+    def forget(done):
+        with _recording_lock:
+            if _recording.get(session_id) is done:
+                del _recording[session_id]
+
+    future.add_done_callback(forget)
+    return future
@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+import uuid
+
+from clients import get_blob_service_client
+from config import config
+
+# The permanent (CV) corpus carries a version stamp stored in Blob so every
+# worker can tell when cached answers derived from it are stale. Reads are
+# cached briefly so the hot path does not pay a storage round trip per request.
+VERSION_BLOB_NAME = "permanent-corpus-version"
+
+_lock = threading.Lock()
+_cached_version = None
+_cached_at = 0.0
+
+def _version_blob_client():
+    blob_service_client = get_blob_service_client()
+    return blob_service_client.get_blob_client(
+        container=config.AZURE_STORAGE_META_CONTAINER_NAME,
+        blob=VERSION_BLOB_NAME
+    )
+
+def get_permanent_corpus_version():
+    """Current permanent corpus version, re-read at most every CORPUS_VERSION_POLL_SECONDS"""
+    global _cached_version, _cached_at
+    now = time.monotonic()
+    if _cached_version is not None and now - _cached_at < config.CORPUS_VERSION_POLL_SECONDS:
+        return _cached_version
+
+    from azure.core.exceptions import ResourceNotFoundError
+
+    try:
+        version = _version_blob_client().download_blob().readall().decode("utf-8").strip()
+    except ResourceNotFoundError:
+        version = "0"
+    with _lock:
+        _cached_version = version
+        _cached_at = now
+    return version
+
+def bump_permanent_corpus_version():
+    """Record that the permanent corpus changed; other workers pick this up on their next poll"""
+    global _cached_version, _cached_at
+    from azure.core.exceptions import ResourceNotFoundError
+
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    blob_client = _version_blob_client()
+    try:
+        blob_client.upload_blob(version.encode("utf-8"), overwrite=True)
+    except ResourceNotFoundError:
+        get_blob_service_client().create_container(config.AZURE_STORAGE_META_CONTAINER_NAME)
+        blob_client.upload_blob(version.encode("utf-8"), overwrite=True)
+
+    with _lock:
+        _cached_version = version
+        _cached_at = time.monotonic()
+    logging.info(f"Permanent corpus version is now {version}")
+    return version
@@ -0,0 +1,51 @@
+import hashlib
+import json
+
+from caches import TTLCache
+from config import config
+
+# Short-lived per-worker cache of listing pages. The upload and delete handlers
+# invalidate it; the TTL bounds staleness from changes made on other workers.
+document_listing_cache = TTLCache(
+    max_entries=256,
+    ttl_seconds=config.DOCUMENT_LIST_CACHE_TTL_SECONDS
+)
+
+MAX_PAGE_SIZE = 5000
+
+def list_document_page(container_client, prefix=None, page_size=None, continuation_token=None):
+    """One page of blobs as (documents, next continuation token), served from cache when fresh"""
+    key = (container_client.container_name, prefix, page_size, continuation_token)
+    cached = document_listing_cache.get(key)
+    if cached is not None:
+        return cached
+
+    from azure.core.exceptions import ResourceNotFoundError
+
+    try:
+        if page_size is None:
+            # Unpaged (legacy) listing: walk everything
+            documents = [{"name": b.name, "size": b.size} for b in container_client.list_blobs(name_starts_with=prefix)]
+            page = (documents, None)
+        else:
+            pager = container_client.list_blobs(name_starts_with=prefix, results_per_page=page_size).by_page(
+                continuation_token=continuation_token
+            )
+            blobs = next(pager, [])
+            documents = [{"name": b.name, "size": b.size} for b in blobs]
+            page = (documents, pager.continuation_token)
+    except ResourceNotFoundError:
+        # Container not created yet (nothing has been uploaded)
+        page = ([], None)
+
+    document_listing_cache.put(key, page)
+    return page
+
+def etag_for(body):
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+def render_listing(documents, continuation_token, paged):
+    """JSON body for a listing: the original bare array when unpaged, an envelope when paged"""
+    if not paged:
+        return json.dumps(documents)
+    return json.dumps({"documents": documents, "continuationToken": continuation_token})
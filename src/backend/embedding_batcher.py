@@ -0,0 +1,62 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from tokens import estimate_tokens
+
+def plan_batches(texts, max_items, max_tokens):
+    """Group text indexes into consecutive batches bounded by item count and estimated tokens"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(i)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def embed_texts(openai_client, texts, model, max_items=None, max_tokens=None, max_concurrency=None, dimensions=None, on_batch=None):
+    """Embed texts in packed batches with bounded concurrency; vectors are returned in input order.
+
+    dimensions requests shortened vectors (see index_versions.embedding_dimensions).
+    on_batch, if given, is called with the number of texts in each batch as it completes.
+    """
+    from config import config
+
+    max_items = max_items or config.EMBEDDING_BATCH_MAX_ITEMS
+    max_tokens = max_tokens or config.EMBEDDING_BATCH_MAX_TOKENS
+    max_concurrency = max_concurrency or config.EMBEDDING_MAX_CONCURRENCY
+
+    texts = list(texts)
+    if not texts:
+        return []
+
+    batches = plan_batches(texts, max_items, max_tokens)
+    options = {"dimensions": dimensions} if dimensions else {}
+
+    def embed_batch(batch):
+        response = openai_client.embeddings.create(
+            input=[texts[i] for i in batch],
+            model=model,
+            **options
+        )
+        # Each item carries the position of its input, so ordering never depends on the service
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    vectors = [None] * len(texts)
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+        for batch, embeddings in zip(batches, executor.map(embed_batch, batches)):
+            if len(embeddings) != len(batch):
+                raise ValueError(f"Embedding batch returned {len(embeddings)} vectors for {len(batch)} inputs")
+            for i, embedding in zip(batch, embeddings):
+                vectors[i] = embedding
+            if on_batch:
+                on_batch(len(batch))
+
+    logging.info(f"Embedded {len(texts)} texts in {len(batches)} batches (concurrency {max_concurrency})")
+    return vectors
@@ -0,0 +1,55 @@
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from config import config
+
+# Per-process state for pool workers: each worker parses the PDF once and then
+# extracts whichever page ranges it is handed.
+_worker_reader = None
+
+def _init_worker(data):
+    global _worker_reader
+    import pypdf
+    _worker_reader = pypdf.PdfReader(io.BytesIO(data))
+
+def _extract_page_range(start, end):
+    return [_worker_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def iter_pdf_pages(data, max_workers=None, parallel_threshold=None, pages_per_task=None):
+    """Yield the text of each PDF page in order, spreading large documents over a process pool"""
+    import pypdf
+
+    max_workers = max_workers or config.PDF_EXTRACT_MAX_WORKERS
+    parallel_threshold = parallel_threshold or config.PDF_PARALLEL_PAGE_THRESHOLD
+    pages_per_task = pages_per_task or config.PDF_PAGES_PER_TASK
+
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+
+    if max_workers <= 1 or page_count < parallel_threshold:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    logging.info(f"Extracting {page_count} pages in {len(ranges)} tasks across {max_workers} processes")
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data,)) as executor:
+        # Keep a bounded window of ranges in flight so finished pages are handed
+        # to the consumer in order without buffering the whole document
+        window = max_workers * 2
+        pending = [executor.submit(_extract_page_range, *r) for r in ranges[:window]]
+        next_range = len(pending)
+        while pending:
+            pages = pending.pop(0).result()
+            if next_range < len(ranges):
+                pending.append(executor.submit(_extract_page_range, *ranges[next_range]))
+                next_range += 1
+            yield from pages
+
+def iter_document_text(filename, data):
+    """Yield the text of a document piece by piece (pages for PDFs, the whole body otherwise)"""
+    if filename.lower().endswith('.pdf'):
+        yield from iter_pdf_pages(data)
+    else:
+        yield data.decode('utf-8', errors='ignore')
@@ -5,95 +5,22 @@ import os
 
 app = func.FunctionApp()
 
-# Helper functions - imports moved inside to avoid trigger detection issues
-def get_openai_client():
-    from openai import AzureOpenAI
-    from config import config
-    return AzureOpenAI(
-        api_key=config.AZURE_OPENAI_API_KEY,
-        api_version=config.AZURE_OPENAI_API_VERSION,
-        azure_endpoint=config.AZURE_OPENAI_ENDPOINT
-    )
-
-def get_blob_service_client():
-    from azure.storage.blob import BlobServiceClient
-    from config import config
-    return BlobServiceClient.from_connection_string(config.AZURE_STORAGE_CONNECTION_STRING)
-
-def get_search_index_client():
-    from azure.search.documents.indexes import SearchIndexClient
-    from azure.core.credentials import AzureKeyCredential
-    from config import config
-    return SearchIndexClient(
-        endpoint=config.AZURE_SEARCH_ENDPOINT,
-        credential=AzureKeyCredential(config.AZURE_SEARCH_KEY)
-    )
-
-def get_search_client(index_name="documents"):
-    from azure.search.documents import SearchClient
-    from azure.core.credentials import AzureKeyCredential
-    from config import config
-    return SearchClient(
-        endpoint=config.AZURE_SEARCH_ENDPOINT,
-        index_name=index_name,
-        credential=AzureKeyCredential(config.AZURE_SEARCH_KEY)
-    )
-
-def create_index_if_not_exists(index_name="documents"):
-    from azure.search.documents.indexes.models import (
-        SearchIndex,
-        SimpleField,
-        SearchField,
-        SearchFieldDataType,
-        VectorSearch,
-        HnswAlgorithmConfiguration,
-        VectorSearchProfile
-    )
-    try:
-        client = get_search_index_client()
-        existing_indexes = list(client.list_index_names())
-        logging.info(f"Existing indexes: {existing_indexes}")
-        
-        if index_name not in existing_indexes:
-            logging.info(f"Creating index '{index_name}'...")
-            fields = [
-                SimpleField(name="id", type=SearchFieldDataType.String, key=True),
-                SimpleField(name="filename", type=SearchFieldDataType.String, filterable=True),
-                SearchField(name="content", type=SearchFieldDataType.String, searchable=True),
-                SearchField(
-                    name="contentVector",
-                    type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
-                    searchable=True,
-                    vector_search_dimensions=1536,
-                    vector_search_profile_name="my-vector-profile"
-                ),
-                # Session-based isolation fields
-                SimpleField(name="sessionId", type=SearchFieldDataType.String, filterable=True),
-                SimpleField(name="documentType", type=SearchFieldDataType.String, filterable=True),
-                SimpleField(name="uploadTimestamp", type=SearchFieldDataType.String, filterable=True)
-            ]
-            
-            vector_search = VectorSearch(
-                algorithms=[HnswAlgorithmConfiguration(name="my-hnsw")],
-                profiles=[VectorSearchProfile(name="my-vector-profile", algorithm_configuration_name="my-hnsw")]
-            )
-            
-            index = SearchIndex(name=index_name, fields=fields, vector_search=vector_search)
-            client.create_index(index)
-            logging.info(f"✓ Created search index '{index_name}' with session isolation support")
-        else:
-            logging.info(f"Index '{index_name}' already exists")
-    except Exception as e:
-        logging.error(f"Failed to create index: {str(e)}")
-        logging.error(f"Error type: {type(e).__name__}")
-        import traceback
-        logging.error(f"Traceback: {traceback.format_exc()}")
-        raise  # Re-raise to let caller handle it
+# Shared clients live for the lifetime of the worker process (see clients.py);
+# SDK imports stay inside the factories to avoid trigger detection issues
+from clients import (
+    get_openai_client,
+    get_blob_service_client,
+    get_search_client
+)
+# Only reads app settings; trigger options below depend on it
+from config import config
 
 # Document Management Functions
 @app.route(route="documents/upload", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
 def upload_document(req: func.HttpRequest) -> func.HttpResponse:
     from config import config
+    from blob_upload import ensure_container, upload_stream
+    from document_listing import document_listing_cache
     try:
         file = req.files.get('file')
         if not file:
@@ -103,14 +30,22 @@ def upload_document(req: func.HttpRequest) -> func.HttpResponse:
         blob_service_client = get_blob_service_client()
         container_client = blob_service_client.get_container_client(config.AZURE_STORAGE_CONTAINER_NAME)
         
-        if not container_client.exists():
-            container_client.create_container()
+        # Checked once per worker process rather than on every upload
+        ensure_container(container_client)
 
+        # Staged blocks go up in parallel; the host has already buffered the request body
         blob_client = container_client.get_blob_client(filename)
-        blob_client.upload_blob(file.read(), overwrite=True)
+        uploaded = upload_stream(blob_client, file.stream, content_type=file.content_type)
+        document_listing_cache.invalidate()
 
         return func.HttpResponse(
-            json.dumps({"message": "File uploaded successfully", "filename": filename}),
+            json.dumps({
+                "message": "File uploaded successfully",
+                "filename": filename,
+                "size": uploaded["size"],
+                "contentMd5": uploaded["contentMd5"],
+                "sha256": uploaded["sha256"]
+            }),
             status_code=201,
             mimetype="application/json"
         )
@@ -120,18 +55,33 @@ def upload_document(req: func.HttpRequest) -> func.HttpResponse:
 
 @app.route(route="documents", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
 def list_documents(req: func.HttpRequest) -> func.HttpResponse:
+    """List uploaded blobs; pageSize/continuationToken page through them and prefix filters by name"""
     from config import config
+    from document_listing import MAX_PAGE_SIZE, etag_for, list_document_page, render_listing
     try:
+        prefix = req.params.get('prefix') or None
+        continuation_token = req.params.get('continuationToken') or None
+        page_size = req.params.get('pageSize')
+        paged = page_size is not None or continuation_token is not None
+        if paged:
+            try:
+                page_size = int(page_size or 100)
+            except ValueError:
+                return func.HttpResponse("pageSize must be an integer", status_code=400)
+            if not 1 <= page_size <= MAX_PAGE_SIZE:
+                return func.HttpResponse(f"pageSize must be between 1 and {MAX_PAGE_SIZE}", status_code=400)
+
         blob_service_client = get_blob_service_client()
         container_client = blob_service_client.get_container_client(config.AZURE_STORAGE_CONTAINER_NAME)
-        
-        if not container_client.exists():
-            return func.HttpResponse(json.dumps([]), mimetype="application/json")
+        documents, next_token = list_document_page(container_client, prefix, page_size, continuation_token)
 
-        blobs = container_client.list_blobs()
-        documents = [{"name": b.name, "size": b.size} for b in blobs]
+        body = render_listing(documents, next_token, paged)
+        etag = etag_for(body)
+        # Pollers that send back the last ETag get an empty 304 when nothing changed
+        if req.headers.get('If-None-Match') == etag:
+            return func.HttpResponse(status_code=304, headers={"ETag": etag})
 
-        return func.HttpResponse(json.dumps(documents), mimetype="application/json")
+        return func.HttpResponse(body, mimetype="application/json", headers={"ETag": etag})
     except Exception as e:
         logging.error(f"Error listing documents: {e}")
         return func.HttpResponse(str(e), status_code=500)
@@ -139,6 +89,7 @@ def list_documents(req: func.HttpRequest) -> func.HttpResponse:
 @app.route(route="documents/{name}", methods=["DELETE"], auth_level=func.AuthLevel.ANONYMOUS)
 def delete_document(req: func.HttpRequest) -> func.HttpResponse:
     from config import config
+    from document_listing import document_listing_cache
     filename = req.route_params.get('name')
     try:
         blob_service_client = get_blob_service_client()
@@ -147,6 +98,7 @@ def delete_document(req: func.HttpRequest) -> func.HttpResponse:
         
         if blob_client.exists():
             blob_client.delete_blob()
+            document_listing_cache.invalidate()
             return func.HttpResponse(json.dumps({"message": "Deleted"}), mimetype="application/json")
         else:
             return func.HttpResponse("Not found", status_code=404)
@@ -155,86 +107,71 @@ def delete_document(req: func.HttpRequest) -> func.HttpResponse:
         return func.HttpResponse(str(e), status_code=500)
 
 # Embedding Function
+def run_timed(route, req, handle):
+    """Run a handler under a per-request stage timer, returning its timings as Server-Timing"""
+    from timing import start_request, end_request
+    timer, token = start_request(req.headers.get('x-request-id'))
+    try:
+        response = handle(req)
+    finally:
+        end_request(token)
+    for name, value in timer.headers().items():
+        response.headers[name] = value
+    timer.log(route, response.status_code)
+    return response
+
 @app.route(route="embed", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
-def embed_document(req: func.HttpRequest) -> func.HttpResponse:
-    import io
-    import pypdf
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
-    from datetime import datetime
+@app.queue_output(arg_name="jobs", queue_name="ingest-jobs", connection="AzureWebJobsStorage")
+def embed_document(req: func.HttpRequest, jobs: func.Out[str]) -> func.HttpResponse:
+    return run_timed("embed", req, lambda req: handle_embed(req, jobs))
+
+def handle_embed(req: func.HttpRequest, jobs: func.Out[str]) -> func.HttpResponse:
     from config import config
+    from ingest import ingest_document
+    from ingest_pipeline import run_ingest_pipeline
+    from timing import stage
     
     try:
         req_body = req.get_json()
         filename = req_body.get('fileName')
         session_id = req_body.get('sessionId', 'global')  # Default to 'global' for CV
         document_type = req_body.get('documentType', 'permanent')  # Default to 'permanent' for CV
+        # Only re-embed chunks whose content changed since the last ingest of this file
+        incremental = req_body.get('incremental', True)
+        # "async" overlaps download, extraction, embedding and upload
+        pipeline = req_body.get('pipeline', config.INGEST_PIPELINE)
+        # "job" queues the ingest and answers 202 with a job id (see ingest_jobs.py)
+        mode = req_body.get('mode', config.INGEST_DEFAULT_MODE)
         
         if not filename:
             return func.HttpResponse("FileName required", status_code=400)
+        if mode not in ('inline', 'job'):
+            return func.HttpResponse("mode must be 'inline' or 'job'", status_code=400)
 
-        # Read file from Blob
-        blob_service_client = get_blob_service_client()
-        blob_client = blob_service_client.get_blob_client(container=config.AZURE_STORAGE_CONTAINER_NAME, blob=filename)
-        
-        if not blob_client.exists():
-            return func.HttpResponse("File not found", status_code=404)
-            
-        stream = blob_client.download_blob()
-        file_content = stream.readall()
-        
-        # Extract Text
-        text = ""
-        if filename.lower().endswith('.pdf'):
-            pdf_file = io.BytesIO(file_content)
-            pdf_reader = pypdf.PdfReader(pdf_file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        else:
-            text = file_content.decode('utf-8', errors='ignore')
-
-        # Chunk Text
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        chunks = splitter.split_text(text)
-
-        # Generate Embeddings & Index
-        openai_client = get_openai_client()
-        create_index_if_not_exists()
-        search_client = get_search_client()
-        
-        upload_timestamp = datetime.utcnow().isoformat()
-        documents_to_index = []
-        for i, chunk in enumerate(chunks):
-            response = openai_client.embeddings.create(
-                input=chunk,
-                model=config.OPENAI_EMBEDDING_MODEL
-            )
-            embedding = response.data[0].embedding
-            
-            doc = {
-                "id": f"{session_id}-{filename}-{i}".replace(".", "_").replace(" ", "_").replace("/", "_").replace("(", "").replace(")", "").replace("[", "").replace("]", ""),
-                "filename": filename,
-                "content": chunk,
-                "contentVector": embedding,
+        if mode == 'job':
+            return enqueue_embed_job(jobs, {
+                "fileName": filename,
                 "sessionId": session_id,
                 "documentType": document_type,
-                "uploadTimestamp": upload_timestamp
-            }
-            documents_to_index.append(doc)
-            
-            if len(documents_to_index) >= 100:
-                search_client.upload_documents(documents=documents_to_index)
-                documents_to_index = []
-
-        if documents_to_index:
-            search_client.upload_documents(documents=documents_to_index)
+                "incremental": incremental,
+                "pipeline": pipeline
+            })
+
+        try:
+            if pipeline == 'async':
+                # Stages overlap here, so only the pipeline as a whole is timed
+                with stage("pipeline"):
+                    result = run_ingest_pipeline(filename, session_id, document_type, incremental=incremental)
+            else:
+                result = ingest_document(filename, session_id, document_type, incremental=incremental)
+        except FileNotFoundError:
+            return func.HttpResponse("File not found", status_code=404)
 
-        logging.info(f"Embedded {len(chunks)} chunks for {filename} (type: {document_type}, session: {session_id})")
         return func.HttpResponse(
-            json.dumps({"message": "Embedded successfully", "chunks": len(chunks)}),
+            json.dumps({"message": "Embedded successfully", **result}),
             mimetype="application/json"
         )
 
-
     except Exception as e:
         logging.error(f"Embedding error: {str(e)}")
         logging.error(f"Error type: {type(e).__name__}")
@@ -246,11 +183,73 @@ def embed_document(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
 
+def enqueue_embed_job(jobs, request):
+    """Queue an ingest and answer 202 with where to poll for it"""
+    from config import config
+    from ingest_jobs import create_job, enqueue_job
+    from timing import stage
+
+    with stage("blob_check"):
+        exists = get_blob_service_client().get_blob_client(
+            container=config.AZURE_STORAGE_CONTAINER_NAME,
+            blob=request["fileName"]
+        ).exists()
+    if not exists:
+        return func.HttpResponse("File not found", status_code=404)
+
+    with stage("job_queue"):
+        job = create_job(request)
+        enqueue_job(job, jobs)
+    status_url = f"/api/embed/status/{job['jobId']}"
+    return func.HttpResponse(
+        json.dumps({"jobId": job["jobId"], "status": job["status"], "statusUrl": status_url}),
+        status_code=202,
+        headers={"Location": status_url},
+        mimetype="application/json"
+    )
+
+@app.route(route="embed/status/{jobId}", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+def embed_status(req: func.HttpRequest) -> func.HttpResponse:
+    """Status, progress and (once finished) result of an ingest job"""
+    from ingest_jobs import get_job_store, valid_job_id
+    job_id = req.route_params.get('jobId')
+    try:
+        job = get_job_store().get(job_id) if valid_job_id(job_id) else None
+    except Exception as e:
+        logging.error(f"Error reading ingest job {job_id}: {e}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e)}),
+            status_code=500,
+            mimetype="application/json"
+        )
+    if job is None:
+        return func.HttpResponse("Job not found", status_code=404)
+    return func.HttpResponse(json.dumps(job), mimetype="application/json")
+
+@app.queue_trigger(arg_name="msg", queue_name="ingest-jobs", connection="AzureWebJobsStorage")
+def ingest_job_worker(msg: func.QueueMessage) -> None:
+    """Run a queued ingest; raising hands the message back to the queue for another attempt"""
+    from ingest_jobs import run_job
+    try:
+        job_id = json.loads(msg.get_body().decode("utf-8"))["jobId"]
+    except (ValueError, KeyError, TypeError):
+        logging.error(f"Dropping malformed ingest job message {msg.id}")
+        return
+    run_job(job_id, attempt=msg.dequeue_count)
+
 # Chat Function
 @app.route(route="generate", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
 def generate_response(req: func.HttpRequest) -> func.HttpResponse:
-    from azure.search.documents.models import VectorizedQuery
+    return run_timed("generate", req, handle_generate)
+
+def handle_generate(req: func.HttpRequest) -> func.HttpResponse:
     from config import config
+    from conversation import history_key, history_messages, previous_retrieval, record_turn_later
+    from generation import load_conversation_for, lookup_cached_answer, retrieve_for_prompt
+    from openai_scheduler import SchedulerTimeout
+    from retrieval import build_chat_messages
+    from semantic_cache import answer_cache
+    from timing import stage
     
     try:
         req_body = req.get_json()
@@ -262,70 +261,65 @@ def generate_response(req: func.HttpRequest) -> func.HttpResponse:
             return func.HttpResponse("Prompt required", status_code=400)
 
         openai_client = get_openai_client()
-        context = ""
-        citations = []
-
-        if enable_rag:
-            try:
-                # Embed Query
-                emb_response = openai_client.embeddings.create(
-                    input=prompt,
-                    model=config.OPENAI_EMBEDDING_MODEL
-                )
-                query_vector = emb_response.data[0].embedding
-
-                # Search with session filtering - only retrieve CV (permanent) + user's own documents
-                search_client = get_search_client()
-                vector_query = VectorizedQuery(vector=query_vector, k_nearest_neighbors=5, fields="contentVector")
-                
-                # Filter: (sessionId eq 'user_session' OR documentType eq 'permanent')
-                filter_query = f"sessionId eq '{session_id}' or documentType eq 'permanent'"
-                
-                results = search_client.search(
-                    search_text=prompt,
-                    vector_queries=[vector_query],
-                    filter=filter_query,
-                    select=["content", "filename", "documentType"],
-                    top=5
-                )
-
-                # Construct Context
-                for result in results:
-                    context += f"Source: {result['filename']}\nContent: {result['content']}\n\n"
-                    citations.append(result['filename'])
-                    
-                logging.info(f"RAG search returned {len(citations)} results for session {session_id}")
-            except Exception as search_error:
-                logging.warning(f"RAG search failed (index may not exist): {search_error}")
-                # Continue without RAG if search fails
-                enable_rag = False
+        # Multi-turn memory: a rolling summary plus the last few turns for this session
+        with stage("memory"):
+            conversation = load_conversation_for(req_body, session_id)
+        history = history_messages(conversation) if conversation else []
+
+        retrieved = retrieve_for_prompt(
+            openai_client, prompt, session_id, enable_rag,
+            previous=previous_retrieval(conversation) if conversation else None
+        )
+        context = retrieved["context"]
+        citations = retrieved["citations"]
+
+        # Answers grounded only in the CV are reused for near-identical questions
+        # until the permanent corpus version changes. Mid-conversation the answer
+        # also depends on the history, so it is part of the cache key
+        scope = history_key(history)
+        with stage("answer_cache"):
+            corpus_version, cached = lookup_cached_answer(retrieved, session_id, scope)
+        if cached:
+            if conversation is not None:
+                record_turn_later(openai_client, session_id, prompt, cached["response"], retrieved)
+            return func.HttpResponse(
+                json.dumps({**cached, "cached": True}),
+                mimetype="application/json"
+            )
 
         # Generate Response
-        system_message = """You are SamBot, an AI assistant that helps people learn about Samrudh Anavatti's professional background, skills, and experience. 
-Be friendly, professional, and enthusiastic about Samrudh's qualifications. 
-Always end your responses with a friendly reminder: "Be sure to hire Sam!" """
-        if context:
-            system_message += f"\n\nUse the following context to answer the user's question:\n\n{context}"
-
-        chat_response = openai_client.chat.completions.create(
-            model=config.OPENAI_CHAT_MODEL,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        with stage("completion"):
+            chat_response = openai_client.chat.completions.create(
+                model=config.OPENAI_CHAT_MODEL,
+                messages=build_chat_messages(prompt, context, history)
+            )
         
         response_text = chat_response.choices[0].message.content
+        payload = {
+            "response": response_text,
+            "citations": list(set(citations)),
+            "success": True
+        }
+        if corpus_version is not None:
+            answer_cache.store(retrieved["query_vector"], corpus_version, payload, scope)
+        if conversation is not None:
+            # Recorded (and summarized, when due) after the response goes out
+            record_turn_later(openai_client, session_id, prompt, response_text, retrieved)
 
         return func.HttpResponse(
-            json.dumps({
-                "response": response_text,
-                "citations": list(set(citations)),
-                "success": True
-            }),
+            json.dumps(payload),
             mimetype="application/json"
         )
 
+    except SchedulerTimeout as e:
+        # Out of Azure OpenAI quota for longer than a visitor should wait
+        logging.warning(f"Chat deferred: {e}")
+        return func.HttpResponse(
+            json.dumps({"error": "The assistant is busy, please try again shortly", "success": False}),
+            status_code=503,
+            headers={"Retry-After": "5"},
+            mimetype="application/json"
+        )
     except Exception as e:
         logging.error(f"Chat error: {e}")
         import traceback
@@ -336,10 +330,121 @@ Always end your responses with a friendly reminder: "Be sure to hire Sam!" """
             mimetype="application/json"
         )
 
+@app.route(route="generate/batch", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
+def generate_batch(req: func.HttpRequest) -> func.HttpResponse:
+    return run_timed("generate_batch", req, handle_generate_batch)
+
+def handle_generate_batch(req: func.HttpRequest) -> func.HttpResponse:
+    """Answer many prompts at once: results come back in request order, failures per item"""
+    from concurrent.futures import ThreadPoolExecutor
+    from config import config
+    from generation import lookup_cached_answer, retrieve_for_prompts
+    from retrieval import build_chat_messages
+    from semantic_cache import answer_cache
+    from timing import stage
+
+    try:
+        req_body = req.get_json()
+        prompts = req_body.get('prompts')
+        enable_rag = req_body.get('enableRag', True)
+        session_id = req_body.get('sessionId', 'global')
+
+        if not isinstance(prompts, list) or not prompts:
+            return func.HttpResponse("Prompts required", status_code=400)
+        if len(prompts) > config.GENERATE_BATCH_MAX_PROMPTS:
+            return func.HttpResponse(
+                json.dumps({"error": f"At most {config.GENERATE_BATCH_MAX_PROMPTS} prompts per batch", "success": False}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        results = [None] * len(prompts)
+        valid = []
+        for i, prompt in enumerate(prompts):
+            if isinstance(prompt, str) and prompt.strip():
+                valid.append(i)
+            else:
+                results[i] = {"error": "Prompt required", "success": False}
+
+        openai_client = get_openai_client()
+        retrieved = dict(zip(valid, retrieve_for_prompts(openai_client, [prompts[i] for i in valid], session_id, enable_rag)))
+
+        corpus_versions = {}
+        with stage("answer_cache"):
+            for i in valid:
+                corpus_versions[i], cached = lookup_cached_answer(retrieved[i], session_id)
+                if cached:
+                    results[i] = {**cached, "cached": True}
+
+        def complete(i):
+            try:
+                chat_response = openai_client.chat.completions.create(
+                    model=config.OPENAI_CHAT_MODEL,
+                    messages=build_chat_messages(prompts[i], retrieved[i]["context"])
+                )
+                payload = {
+                    "response": chat_response.choices[0].message.content,
+                    "citations": list(set(retrieved[i]["citations"])),
+                    "success": True
+                }
+                if corpus_versions[i] is not None:
+                    answer_cache.store(retrieved[i]["query_vector"], corpus_versions[i], payload)
+                return payload
+            except Exception as completion_error:
+                logging.warning(f"Completion failed for batch prompt {i}: {completion_error}")
+                return {"error": str(completion_error), "success": False}
+
+        pending = [i for i in valid if results[i] is None]
+        if pending:
+            with stage("completion"):
+                with ThreadPoolExecutor(max_workers=min(config.GENERATE_BATCH_COMPLETION_CONCURRENCY, len(pending))) as executor:
+                    for i, payload in zip(pending, executor.map(complete, pending)):
+                        results[i] = payload
+
+        return func.HttpResponse(
+            json.dumps({"results": results, "success": all(result["success"] for result in results)}),
+            mimetype="application/json"
+        )
+
+    except Exception as e:
+        logging.error(f"Batch chat error: {e}")
+        import traceback
+        logging.error(f"Traceback: {traceback.format_exc()}")
+        return func.HttpResponse(
+            json.dumps({"error": str(e), "success": False}),
+            status_code=500,
+            mimetype="application/json"
+        )
+
+@app.route(route="cache/stats", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+def cache_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """Hit/miss counters for the per-worker caches, plus index schema checks and Azure OpenAI queue depths"""
+    from retrieval import query_embedding_cache
+    from semantic_cache import answer_cache
+    from document_listing import document_listing_cache
+    from index_versions import get_active_index
+    from openai_scheduler import scheduler
+    from search_index import get_index_status
+    return func.HttpResponse(
+        json.dumps({
+            "queryEmbeddingCache": query_embedding_cache.stats(),
+            "semanticAnswerCache": answer_cache.stats(),
+            "documentListingCache": document_listing_cache.stats(),
+            "searchIndex": get_active_index(),
+            "searchIndexSchema": get_index_status(),
+            "openaiScheduler": scheduler.stats()
+        }),
+        mimetype="application/json"
+    )
+
 # Cleanup Functions
 @app.route(route="cleanup/session", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
 def cleanup_session(req: func.HttpRequest) -> func.HttpResponse:
     """Delete all temporary documents for a specific session (called on page unload)"""
+    from bulk_delete import bulk_delete, delete_ids
+    from search_index import odata_quote
+    from session_registry import get_session_registry, manifest_chunk_ids
+    from conversation import get_conversation_store
     try:
         req_body = req.get_json()
         session_id = req_body.get('sessionId')
@@ -352,24 +457,32 @@ def cleanup_session(req: func.HttpRequest) -> func.HttpResponse:
             )
         
         search_client = get_search_client()
+        registry = get_session_registry()
+        manifest = registry.get(session_id)
         
-        # Find all documents for this session
-        filter_query = f"sessionId eq '{session_id}' and documentType eq 'temporary'"
-        results = search_client.search(
-            search_text="*",
-            filter=filter_query,
-            select=["id"]
-        )
-        
-        # Delete documents
-        doc_ids = [result['id'] for result in results]
-        if doc_ids:
-            documents_to_delete = [{"id": doc_id} for doc_id in doc_ids]
-            search_client.delete_documents(documents=documents_to_delete)
-            logging.info(f"Cleaned up {len(doc_ids)} documents for session {session_id}")
+        if manifest is not None:
+            # Delete by key from the session manifest - no search needed
+            totals = delete_ids(search_client, manifest_chunk_ids(manifest))
+            if not totals["failed"]:
+                registry.remove(session_id)
+        else:
+            # No manifest (indexed before the registry existed): find the documents by filter
+            filter_query = f"sessionId eq {odata_quote(session_id)} and documentType eq 'temporary'"
+            totals = bulk_delete(search_client, filter_query)
+        if totals["deleted"]:
+            logging.info(f"Cleaned up {totals['deleted']} documents for session {session_id}")
+
+        # The visitor has left; drop the session's conversation memory too
+        get_conversation_store().delete(session_id)
         
         return func.HttpResponse(
-            json.dumps({"message": f"Cleaned up {len(doc_ids)} documents", "count": len(doc_ids)}),
+            json.dumps({
+                "message": f"Cleaned up {totals['deleted']} documents",
+                "count": totals["deleted"],
+                "failed": totals["failed"],
+                # False if the filter sweep gave up with documents still matching
+                "complete": totals.get("complete", True)
+            }),
             mimetype="application/json"
         )
     except Exception as e:
@@ -383,6 +496,8 @@ def cleanup_session(req: func.HttpRequest) -> func.HttpResponse:
 @app.route(route="cleanup", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
 def cleanup_documents(req: func.HttpRequest) -> func.HttpResponse:
     """General cleanup endpoint - delete documents by sessionId and/or documentType"""
+    from bulk_delete import bulk_delete
+    from search_index import odata_quote
     try:
         req_body = req.get_json()
         session_id = req_body.get('sessionId')
@@ -400,28 +515,28 @@ def cleanup_documents(req: func.HttpRequest) -> func.HttpResponse:
         # Build filter query
         filters = []
         if session_id:
-            filters.append(f"sessionId eq '{session_id}'")
+            filters.append(f"sessionId eq {odata_quote(session_id)}")
         if document_type:
-            filters.append(f"documentType eq '{document_type}'")
+            filters.append(f"documentType eq {odata_quote(document_type)}")
         
         filter_query = " and ".join(filters)
         
-        # Find matching documents
-        results = search_client.search(
-            search_text="*",
-            filter=filter_query,
-            select=["id"]
-        )
-        
-        # Delete documents
-        doc_ids = [result['id'] for result in results]
-        if doc_ids:
-            documents_to_delete = [{"id": doc_id} for doc_id in doc_ids]
-            search_client.delete_documents(documents=documents_to_delete)
-            logging.info(f"Cleaned up {len(doc_ids)} documents (filter: {filter_query})")
+        # Delete every matching document, page by page
+        totals = bulk_delete(search_client, filter_query)
+        if totals["deleted"]:
+            logging.info(f"Cleaned up {totals['deleted']} documents (filter: {filter_query})")
+            # Any delete not scoped to temporary documents may have touched the CV
+            if document_type != 'temporary':
+                from corpus import bump_permanent_corpus_version
+                bump_permanent_corpus_version()
         
         return func.HttpResponse(
-            json.dumps({"message": f"Cleaned up {len(doc_ids)} documents", "deletedCount": len(doc_ids)}),
+            json.dumps({
+                "message": f"Cleaned up {totals['deleted']} documents",
+                "deletedCount": totals["deleted"],
+                "failed": totals["failed"],
+                "complete": totals["complete"]
+            }),
             mimetype="application/json"
         )
     except Exception as e:
@@ -436,27 +551,66 @@ def cleanup_documents(req: func.HttpRequest) -> func.HttpResponse:
 def cleanup_timer(timer: func.TimerRequest) -> None:
     """Automated cleanup of temporary documents older than 2 hours (runs every 30 minutes)"""
     from datetime import datetime, timedelta
+    from bulk_delete import bulk_delete, delete_ids
+    from config import config
+    from conversation import get_conversation_store
+    from ingest_jobs import get_job_store
+    from session_registry import get_session_registry, manifest_chunk_ids
     
     try:
         search_client = get_search_client()
+        registry = get_session_registry()
         
         # Calculate cutoff time (2 hours ago)
-        cutoff_time = (datetime.utcnow() - timedelta(hours=2)).isoformat()
+        cutoff = datetime.utcnow() - timedelta(hours=2)
+        cutoff_time = cutoff.isoformat()
         
-        # Find old temporary documents
-        filter_query = f"documentType eq 'temporary' and uploadTimestamp lt '{cutoff_time}'"
-        results = search_client.search(
-            search_text="*",
-            filter=filter_query,
-            select=["id", "sessionId", "uploadTimestamp"]
-        )
+        # Expired sessions come from the time-ordered registry and are deleted by key
+        expired_sessions = registry.expired_sessions(cutoff)
+        removed = 0
+        for session_id, marker in expired_sessions:
+            manifest = registry.get(session_id)
+            # A leftover marker can point at a session that was removed or has
+            # uploaded again since; drop it so it isn't listed on every sweep
+            if manifest is None or datetime.fromisoformat(manifest["lastUpload"]) >= cutoff:
+                registry.remove_marker(marker)
+                continue
+            totals = delete_ids(search_client, manifest_chunk_ids(manifest))
+            removed += totals["deleted"]
+            if not totals["failed"]:
+                registry.remove(session_id)
+        if expired_sessions:
+            logging.info(f"Timer cleanup: Removed {removed} documents from {len(expired_sessions)} expired sessions")
+
+        # Conversations of sessions that stopped chatting
+        try:
+            expired_conversations = get_conversation_store().expire(
+                datetime.utcnow() - timedelta(hours=config.CONVERSATION_TTL_HOURS)
+            )
+            if expired_conversations:
+                logging.info(f"Timer cleanup: Removed {expired_conversations} expired conversations")
+        except Exception as e:
+            logging.warning(f"Timer cleanup: Could not expire conversations: {e}")
+
+        # Ingest job records, once callers have had time to read the outcome
+        try:
+            expired_jobs = get_job_store().expire(
+                datetime.utcnow() - timedelta(hours=config.INGEST_JOB_TTL_HOURS)
+            )
+            if expired_jobs:
+                logging.info(f"Timer cleanup: Removed {expired_jobs} expired ingest jobs")
+        except Exception as e:
+            logging.warning(f"Timer cleanup: Could not expire ingest jobs: {e}")
         
-        # Delete documents
-        doc_ids = [result['id'] for result in results]
-        if doc_ids:
-            documents_to_delete = [{"id": doc_id} for doc_id in doc_ids]
-            search_client.delete_documents(documents=documents_to_delete)
-            logging.info(f"Timer cleanup: Removed {len(doc_ids)} old temporary documents")
+        # Safety net for documents the registry does not know about (indexed before it
+        # existed, or whose manifest write failed); normally this query matches nothing
+        filter_query = f"documentType eq 'temporary' and uploadTimestamp lt '{cutoff_time}'"
+        totals = bulk_delete(search_client, filter_query)
+        if totals["matched"]:
+            logging.info(
+                f"Timer cleanup: Removed {totals['deleted']} old temporary documents "
+                f"({totals['failed']} failed, {totals['passes']} passes)"
+            )
         else:
             logging.info("Timer cleanup: No old documents to remove")
             
@@ -464,3 +618,13 @@ def cleanup_timer(timer: func.TimerRequest) -> None:
         logging.error(f"Timer cleanup error: {e}")
         import traceback
         logging.error(f"Traceback: {traceback.format_exc()}")
+
+@app.timer_trigger(schedule="0 */10 * * * *", arg_name="timer", run_on_startup=config.WARMUP_ON_STARTUP)
+def warmup_timer(timer: func.TimerRequest) -> None:
+    """Every 10 minutes (and at host start with WARMUP_ON_STARTUP), so an idle app stays warm:
+    import deferred dependencies, open pooled connections and prime the caches"""
+    from warmup import warm_up
+    try:
+        warm_up()
+    except Exception as e:
+        logging.error(f"Warm-up error: {e}")
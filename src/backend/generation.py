@@ -0,0 +1,84 @@
+import logging
+
+# Retrieval, conversation and answer-cache steps shared by /generate and
+# /generate/batch (function_app.py) and /generate/stream (stream_app.py), which
+# run as separate Function Apps and so can't import each other.
+
+def retrieve_for_prompt(openai_client, prompt, session_id, enable_rag, previous=None):
+    """RAG retrieval for a prompt; degrades to an empty context if search is unavailable"""
+    from retrieval import retrieve_context
+    empty = {"context": "", "citations": [], "query_vector": None, "permanent_only": False}
+    if not enable_rag:
+        return empty
+    try:
+        retrieved = retrieve_context(openai_client, prompt, session_id, previous=previous)
+        if retrieved.get("reused"):
+            logging.info(f"Reused previous turn's retrieval for follow-up in session {session_id}")
+        else:
+            logging.info(f"RAG search returned {len(retrieved['citations'])} results for session {session_id}")
+        return retrieved
+    except Exception as search_error:
+        logging.warning(f"RAG search failed (index may not exist): {search_error}")
+        # Continue without RAG if search fails
+        return empty
+
+def retrieve_for_prompts(openai_client, prompts, session_id, enable_rag):
+    """Batch counterpart of retrieve_for_prompt: one embeddings request, then a bounded fan-out of searches"""
+    from concurrent.futures import ThreadPoolExecutor
+    from config import config
+    from index_versions import embedding_dimensions, get_active_index
+    from retrieval import embed_queries, search_context
+    from timing import stage
+    empty = {"context": "", "citations": [], "query_vector": None, "permanent_only": False}
+    if not enable_rag or not prompts:
+        return [empty] * len(prompts)
+    try:
+        index = get_active_index()
+        vectors = embed_queries(openai_client, prompts, dimensions=embedding_dimensions(index["spec"]))
+    except Exception as embed_error:
+        logging.warning(f"Batch query embedding failed, answering without RAG: {embed_error}")
+        return [empty] * len(prompts)
+
+    def search(item):
+        prompt, query_vector = item
+        try:
+            return search_context(prompt, query_vector, session_id, index["name"])
+        except Exception as search_error:
+            logging.warning(f"RAG search failed for a batch prompt: {search_error}")
+            return empty
+
+    # Worker threads aren't timed individually; this stage covers the whole fan-out
+    with stage("search"):
+        with ThreadPoolExecutor(max_workers=min(config.GENERATE_BATCH_SEARCH_CONCURRENCY, len(prompts))) as executor:
+            return list(executor.map(search, zip(prompts, vectors)))
+
+def load_conversation_for(req_body, session_id):
+    """Conversation state for requests that carry their own sessionId (and haven't set useMemory: false)"""
+    from conversation import load_conversation
+    # 'global' is the shared default, not a visitor: one state for it would mix
+    # everyone's history (and cleanup_session never removes it)
+    if session_id == 'global' or not req_body.get('sessionId') or not req_body.get('useMemory', True):
+        return None
+    return load_conversation(session_id)
+
+def lookup_cached_answer(retrieved, session_id, scope=None):
+    """Return (corpus_version, cached_payload) for permanent-only retrievals, else (None, None).
+
+    scope is conversation.history_key of the history the answer would be
+    generated with, so answers are only shared between identical conversations.
+    """
+    from semantic_cache import answer_cache
+    from corpus import get_permanent_corpus_version
+    if not retrieved["permanent_only"]:
+        return None, None
+    try:
+        corpus_version = get_permanent_corpus_version()
+        cached = answer_cache.lookup(retrieved["query_vector"], corpus_version, scope)
+    except Exception as cache_error:
+        logging.warning(f"Answer cache unavailable: {cache_error}")
+        return None, None
+    if not cached:
+        return corpus_version, None
+    payload, similarity = cached
+    logging.info(f"Answer cache hit (similarity {similarity:.4f}) for session {session_id}")
+    return corpus_version, payload
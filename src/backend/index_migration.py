@@ -0,0 +1,247 @@
+"""Build a new search index version, switch traffic to it, and roll back.
+
+Run from src/backend with the Function App's settings in the environment:
+
+    python -m index_migration status
+    python -m index_migration migrate --m 8 --ef-search 300 --compression scalar
+    python -m index_migration migrate --dimensions 512      # re-embeds every chunk
+    python -m index_migration rollback
+    python -m index_migration drop documents-v2
+
+migrate creates documents-vN from the SEARCH_* settings (flags override them)
+while the current version keeps serving, fills it, waits until the copy is
+searchable, and then switches the pointer blob (see index_versions.py). The
+copy pages by key range (see bulk_delete.iter_matching), and the switch is
+refused if it wrote fewer chunks than the current version held when the
+migration started. Vectors
+are copied as-is when the dimensions match and re-embedded otherwise (or with
+--reembed). Chunks uploaded to the old version during the migration, including
+by workers that haven't seen the switch yet, are copied over afterwards.
+
+rollback points traffic back at the previously active version and copies over
+what was uploaded since it stopped serving. Deletes made while a version wasn't
+serving are not replayed; the cleanup timer removes expired temporary chunks
+from whichever version is active.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+from config import config
+from index_versions import (
+    activation_entry,
+    embedding_dimensions,
+    get_active_index,
+    index_name_for,
+    legacy_entry,
+    read_pointer,
+    spec_from_config,
+    validate_spec,
+    version_of,
+    write_pointer
+)
+
+COPY_BATCH_SIZE = 500
+
+def index_fields():
+    from search_index import build_index_fields
+    return [field.name for field in build_index_fields()]
+
+def known_versions(index_client):
+    """Version numbers of every documents index that exists"""
+    return sorted(v for v in (version_of(name) for name in index_client.list_index_names()) if v)
+
+def copy_documents(source, target, filter_query=None, reembed=False):
+    """Copy chunks from one index version to another; returns how many were written.
+
+    source and target are pointer entries. Vectors are reused when the
+    dimensions match unless reembed is set.
+    """
+    from bulk_delete import iter_matching
+    from clients import get_openai_client, get_search_client
+    from embedding_batcher import embed_texts
+
+    source_client = get_search_client(source["name"])
+    target_client = get_search_client(target["name"])
+    reembed = reembed or source["spec"]["dimensions"] != target["spec"]["dimensions"]
+    dimensions = embedding_dimensions(target["spec"])
+
+    def flush(batch):
+        if reembed:
+            vectors = embed_texts(get_openai_client(priority="bulk"), [doc["content"] for doc in batch], config.OPENAI_EMBEDDING_MODEL, dimensions=dimensions)
+            batch = [{**doc, "contentVector": vector} for doc, vector in zip(batch, vectors)]
+        target_client.upload_documents(documents=batch)
+        return len(batch)
+
+    copied = 0
+    batch = []
+    for doc in iter_matching(source_client, filter_query, index_fields()):
+        batch.append({key: value for key, value in doc.items() if not key.startswith("@")})
+        if len(batch) >= COPY_BATCH_SIZE:
+            copied += flush(batch)
+            batch = []
+            print(f"  copied {copied} chunks to '{target['name']}'")
+    if batch:
+        copied += flush(batch)
+    return copied
+
+def count_matching(index_name, filter_query):
+    """Number of documents in an index matching an OData filter"""
+    from clients import get_search_client
+    results = get_search_client(index_name).search(search_text="*", filter=filter_query, include_total_count=True, top=0)
+    return results.get_count()
+
+def verify_copy(source, copied, since):
+    """Raise unless copied covers every chunk the source held before `since`.
+
+    Chunks uploaded after `since` are left to catch_up, and chunks deleted
+    during the copy only lower the count, so fewer than expected means the
+    copy missed documents.
+    """
+    expected = count_matching(source["name"], f"uploadTimestamp lt '{since}'")
+    if copied < expected:
+        raise RuntimeError(f"Copied {copied} chunks but '{source['name']}' holds {expected} from before the migration; not switching")
+    print(f"Copied {copied} chunks ({expected} existed before the migration started)")
+
+def wait_until_searchable(index_name, expected, timeout_seconds):
+    """Block until the index reports at least expected documents (indexing is near-real-time)"""
+    from clients import get_search_client
+    client = get_search_client(index_name)
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        count = client.get_document_count()
+        if count >= expected:
+            return count
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"'{index_name}' has {count} of {expected} documents after {timeout_seconds}s")
+        time.sleep(2)
+
+def switch_to(entry, etag, history):
+    """Point traffic at entry; the CV snapshot and answer caches follow via the corpus version"""
+    from corpus import bump_permanent_corpus_version
+    write_pointer({"active": entry, "history": history}, etag)
+    bump_permanent_corpus_version()
+    print(f"Traffic now goes to '{entry['name']}'")
+
+def catch_up(source, target, since, settle_seconds):
+    """After a switch, copy what was uploaded to source since `since` into target"""
+    # Workers keep writing to the old version until they re-read the pointer
+    print(f"Waiting {settle_seconds}s for every worker to pick up the switch...")
+    time.sleep(settle_seconds)
+    copied = copy_documents(source, target, filter_query=f"uploadTimestamp ge '{since}'")
+    print(f"Caught up {copied} chunks uploaded to '{source['name']}' since {since}")
+
+def migrate(spec, reembed=False, timeout_seconds=600, settle_seconds=None):
+    from clients import get_search_index_client
+    from search_index import create_index_if_not_exists
+
+    validate_spec(spec)
+    settle_seconds = config.SEARCH_INDEX_POINTER_POLL_SECONDS + 15 if settle_seconds is None else settle_seconds
+    started = datetime.utcnow().isoformat()
+    pointer, etag = read_pointer()
+    current = pointer["active"] if pointer else legacy_entry()
+    history = pointer["history"] if pointer else []
+
+    version = max(known_versions(get_search_index_client()) + [current["version"]]) + 1
+    target = {"name": index_name_for(version), "version": version, "spec": spec}
+    print(f"Building '{target['name']}' from '{current['name']}' with {json.dumps(spec)}")
+    create_index_if_not_exists(target["name"], spec)
+
+    copied = copy_documents(current, target, reembed=reembed)
+    verify_copy(current, copied, started)
+    wait_until_searchable(target["name"], copied, timeout_seconds)
+
+    switch_to(activation_entry(target["name"], version, spec), etag, history + [current])
+    catch_up(current, target, started, settle_seconds)
+    return target["name"]
+
+def rollback(settle_seconds=None):
+    settle_seconds = config.SEARCH_INDEX_POINTER_POLL_SECONDS + 15 if settle_seconds is None else settle_seconds
+    pointer, etag = read_pointer()
+    if not pointer or not pointer["history"]:
+        raise ValueError("There is no previous index version to roll back to")
+    current = pointer["active"]
+    previous = pointer["history"][-1]
+    print(f"Rolling back from '{current['name']}' to '{previous['name']}'")
+    switch_to(activation_entry(previous["name"], previous["version"], previous["spec"]), etag, pointer["history"][:-1])
+    catch_up(current, previous, current["activatedAt"], settle_seconds)
+    return previous["name"]
+
+def drop(index_name, force=False):
+    """Delete an index version that isn't serving (nor, without force, the rollback target)"""
+    from clients import get_search_index_client
+    pointer, etag = read_pointer()
+    active = pointer["active"] if pointer else legacy_entry()
+    history = pointer["history"] if pointer else []
+    if index_name == active["name"]:
+        raise ValueError(f"'{index_name}' is serving traffic")
+    if not force and history and history[-1]["name"] == index_name:
+        raise ValueError(f"'{index_name}' is the rollback target; pass --force to drop it anyway")
+    remaining = [entry for entry in history if entry["name"] != index_name]
+    if len(remaining) != len(history):
+        # Rollback must never point at an index that no longer exists
+        write_pointer({"active": active, "history": remaining}, etag)
+    get_search_index_client().delete_index(index_name)
+    print(f"Dropped '{index_name}'")
+
+def status():
+    from clients import get_search_client, get_search_index_client
+    pointer, _ = read_pointer()
+    active = get_active_index()
+    report = {"active": active, "history": pointer["history"] if pointer else [], "indexes": {}}
+    for version in known_versions(get_search_index_client()):
+        name = index_name_for(version)
+        report["indexes"][name] = get_search_client(name).get_document_count()
+    print(json.dumps(report, indent=2))
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search index versions: migrate, roll back, inspect")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the active version, history and document counts")
+
+    migrate_parser = commands.add_parser("migrate", help="Build the next version and switch traffic to it")
+    migrate_parser.add_argument("--dimensions", type=int, help="Vector dimensions (re-embeds if different)")
+    migrate_parser.add_argument("--m", type=int, help="HNSW links per node (4-10)")
+    migrate_parser.add_argument("--ef-construction", type=int, help="HNSW build-time candidate list (100-1000)")
+    migrate_parser.add_argument("--ef-search", type=int, help="HNSW query-time candidate list (100-1000)")
+    migrate_parser.add_argument("--compression", choices=["none", "scalar", "binary"], help="Vector quantization")
+    migrate_parser.add_argument("--oversampling", type=float, help="Candidates re-scored at full precision, per result")
+    migrate_parser.add_argument("--reembed", action="store_true", help="Re-embed even if the dimensions match")
+    migrate_parser.add_argument("--timeout", type=int, default=600, help="Seconds to wait for the copy to become searchable")
+    migrate_parser.add_argument("--settle-seconds", type=int, help="Wait before the catch-up copy (default: pointer poll + 15s)")
+
+    rollback_parser = commands.add_parser("rollback", help="Switch traffic back to the previous version")
+    rollback_parser.add_argument("--settle-seconds", type=int, help="Wait before the catch-up copy (default: pointer poll + 15s)")
+
+    drop_parser = commands.add_parser("drop", help="Delete an index version that isn't serving")
+    drop_parser.add_argument("index_name")
+    drop_parser.add_argument("--force", action="store_true", help="Allow dropping the rollback target")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "status":
+            status()
+        elif args.command == "migrate":
+            spec = spec_from_config(
+                dimensions=args.dimensions,
+                m=args.m,
+                efConstruction=args.ef_construction,
+                efSearch=args.ef_search,
+                compression=args.compression,
+                oversampling=args.oversampling
+            )
+            migrate(spec, reembed=args.reembed, timeout_seconds=args.timeout, settle_seconds=args.settle_seconds)
+        elif args.command == "rollback":
+            rollback(settle_seconds=args.settle_seconds)
+        elif args.command == "drop":
+            drop(args.index_name, force=args.force)
+    except Exception as e:
+        print(f"FAIL: {type(e).__name__}: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
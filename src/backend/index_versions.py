@@ -0,0 +1,179 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+from config import config
+
+# Search index versions. Version 1 is the original "documents" index; later
+# versions are "documents-v2", "documents-v3", ... each built with its own
+# vector settings (a "spec"). Which version serves traffic is recorded in a
+# pointer blob in the meta container:
+#
+#   {"active": {"name": "documents-v2", "version": 2, "spec": {...}, "activatedAt": "<iso>"},
+#    "history": [<previously active entries, oldest first>]}
+#
+# Workers re-read the pointer at most every SEARCH_INDEX_POINTER_POLL_SECONDS,
+# so switching traffic to another version (index_migration.py) is one
+# conditional blob write. The spec travels with the pointer so query and ingest
+# embeddings always match the dimensions of the index they are used against.
+# Without a pointer the original index is active with LEGACY_SPEC.
+
+POINTER_BLOB_NAME = "search-index-pointer.json"
+BASE_INDEX_NAME = "documents"
+
+# Azure AI Search's HNSW defaults, which the original index was created with
+LEGACY_SPEC = {
+    "dimensions": 1536,
+    "m": 4,
+    "efConstruction": 400,
+    "efSearch": 500,
+    "metric": "cosine",
+    "compression": "none",
+    "oversampling": 4.0
+}
+
+COMPRESSIONS = ("none", "scalar", "binary")
+
+_lock = threading.Lock()
+_cached_active = None
+_cached_at = 0.0
+
+def index_name_for(version):
+    return BASE_INDEX_NAME if version == 1 else f"{BASE_INDEX_NAME}-v{version}"
+
+def version_of(index_name):
+    """Version number of an index name, or None if it isn't one of ours"""
+    if index_name == BASE_INDEX_NAME:
+        return 1
+    prefix = f"{BASE_INDEX_NAME}-v"
+    suffix = index_name[len(prefix):] if index_name.startswith(prefix) else ""
+    return int(suffix) if suffix.isdigit() else None
+
+def spec_from_config(**overrides):
+    """Spec for a new index version from the SEARCH_* settings, with overrides applied"""
+    spec = {
+        "dimensions": config.SEARCH_VECTOR_DIMENSIONS,
+        "m": config.SEARCH_HNSW_M,
+        "efConstruction": config.SEARCH_HNSW_EF_CONSTRUCTION,
+        "efSearch": config.SEARCH_HNSW_EF_SEARCH,
+        "metric": "cosine",
+        "compression": config.SEARCH_VECTOR_COMPRESSION,
+        "oversampling": config.SEARCH_RESCORE_OVERSAMPLING
+    }
+    spec.update({key: value for key, value in overrides.items() if value is not None})
+    return spec
+
+def validate_spec(spec):
+    """Raise ValueError if the service would reject the spec"""
+    problems = []
+    if not 1 <= spec["dimensions"] <= config.OPENAI_EMBEDDING_DIMENSIONS:
+        problems.append(f"dimensions must be between 1 and {config.OPENAI_EMBEDDING_DIMENSIONS}")
+    if not 4 <= spec["m"] <= 10:
+        problems.append("m must be between 4 and 10")
+    for key in ("efConstruction", "efSearch"):
+        if not 100 <= spec[key] <= 1000:
+            problems.append(f"{key} must be between 100 and 1000")
+    if spec["compression"] not in COMPRESSIONS:
+        problems.append(f"compression must be one of {', '.join(COMPRESSIONS)}")
+    if spec["oversampling"] < 1:
+        problems.append("oversampling must be at least 1")
+    if problems:
+        raise ValueError("; ".join(problems))
+
+def embedding_dimensions(spec):
+    """The dimensions argument for embeddings requests against an index with this spec (None for native size)"""
+    dimensions = spec["dimensions"]
+    return None if dimensions == config.OPENAI_EMBEDDING_DIMENSIONS else dimensions
+
+def legacy_entry():
+    return {"name": BASE_INDEX_NAME, "version": 1, "spec": dict(LEGACY_SPEC), "activatedAt": None}
+
+def _pointer_blob_client():
+    from clients import get_blob_service_client
+    return get_blob_service_client().get_blob_client(
+        container=config.AZURE_STORAGE_META_CONTAINER_NAME,
+        blob=POINTER_BLOB_NAME
+    )
+
+def read_pointer():
+    """(pointer, etag); pointer is None when no version has ever been activated"""
+    from azure.core.exceptions import ResourceNotFoundError
+    try:
+        downloader = _pointer_blob_client().download_blob()
+    except ResourceNotFoundError:
+        return None, None
+    return json.loads(downloader.readall()), downloader.properties.etag
+
+def write_pointer(pointer, etag):
+    """Replace the pointer if it is unchanged since it was read with etag.
+
+    Raises azure.core.exceptions.ResourceModifiedError (or ResourceExistsError
+    when etag is None) if someone else switched versions in between.
+    """
+    from azure.core import MatchConditions
+    from azure.core.exceptions import ResourceNotFoundError
+    from clients import get_blob_service_client
+
+    blob_client = _pointer_blob_client()
+    data = json.dumps(pointer, indent=2).encode("utf-8")
+    for attempt in range(2):
+        try:
+            if etag:
+                blob_client.upload_blob(data, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified)
+            else:
+                blob_client.upload_blob(data, overwrite=False)
+            break
+        except ResourceNotFoundError:
+            if attempt:
+                raise
+            get_blob_service_client().create_container(config.AZURE_STORAGE_META_CONTAINER_NAME)
+    set_active_index(pointer["active"])
+
+def get_active_index():
+    """The index serving traffic as {"name", "version", "spec", "activatedAt"}.
+
+    The pointer is re-read at most every SEARCH_INDEX_POINTER_POLL_SECONDS.
+    Without a pointer blob the original index is active. If the pointer can't
+    be read, the last known entry is used; with none known yet the error is
+    raised rather than guessing, since the original index may no longer be the
+    one serving traffic.
+    """
+    global _cached_active, _cached_at
+    now = time.monotonic()
+    if _cached_active is not None and now - _cached_at < config.SEARCH_INDEX_POINTER_POLL_SECONDS:
+        return _cached_active
+
+    try:
+        pointer, _ = read_pointer()
+        active = pointer["active"] if pointer else legacy_entry()
+    except Exception as e:
+        if _cached_active is None:
+            raise
+        logging.warning(f"Could not read the search index pointer, keeping '{_cached_active['name']}': {e}")
+        active = _cached_active
+    with _lock:
+        moved = _cached_active is not None and active["name"] != _cached_active["name"]
+        if moved:
+            logging.info(f"Search traffic moved from '{_cached_active['name']}' to '{active['name']}'")
+        _cached_active = active
+        _cached_at = now
+    if moved:
+        # A version this worker verified earlier may have been dropped and rebuilt since (e.g. on rollback)
+        from search_index import reset_index_cache
+        reset_index_cache(active["name"])
+    return active
+
+def active_index_name():
+    return get_active_index()["name"]
+
+def set_active_index(entry):
+    """Use entry on this worker right away (other workers pick it up on their next poll)"""
+    global _cached_active, _cached_at
+    with _lock:
+        _cached_active = entry
+        _cached_at = time.monotonic()
+
+def activation_entry(name, version, spec):
+    return {"name": name, "version": version, "spec": spec, "activatedAt": datetime.utcnow().isoformat()}
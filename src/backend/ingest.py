@@ -0,0 +1,205 @@
+import hashlib
+import logging
+from datetime import datetime
+
+from clients import get_blob_service_client, get_openai_client, get_search_client
+from config import config
+from search_index import create_index_if_not_exists, odata_quote
+from session_registry import record_ingest
+from timing import stage, timed_iter
+
+# Azure AI Search accepts at most 1000 actions per indexing batch; 100 keeps requests small
+UPLOAD_BATCH_SIZE = 100
+# Concurrent key lookups when copying the vectors of moved chunks
+VECTOR_FETCH_CONCURRENCY = 8
+
+def chunk_id(session_id, filename, index):
+    return f"{session_id}-{filename}-{index}".replace(".", "_").replace(" ", "_").replace("/", "_").replace("(", "").replace(")", "").replace("[", "").replace("]", "")
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def fetch_indexed_hashes(search_client, session_id, filename):
+    """Map chunk id -> contentHash for what is already indexed for this file and session"""
+    from bulk_delete import iter_matching
+    filter_query = f"sessionId eq {odata_quote(session_id)} and filename eq {odata_quote(filename)}"
+    return {
+        result["id"]: result.get("contentHash")
+        for result in iter_matching(search_client, filter_query, ["id", "contentHash"])
+    }
+
+def plan_incremental_update(ids, hashes, indexed):
+    """Split chunks into (positions to embed, unchanged ids, reusable, stale ids to delete).
+
+    Chunk ids are positional, so text inserted near the top of a document moves
+    every later chunk to another id. A chunk whose text is already indexed
+    under a different id is returned in reusable (position -> that id) so its
+    vector can be copied instead of embedded again. Stale ids are indexed ids
+    past the new last chunk; every other indexed id is overwritten.
+    """
+    by_hash = {}
+    for doc_id, digest in indexed.items():
+        if digest:
+            by_hash.setdefault(digest, doc_id)
+    to_embed = []
+    unchanged = []
+    reusable = {}
+    for i, (doc_id, digest) in enumerate(zip(ids, hashes)):
+        if indexed.get(doc_id) == digest:
+            unchanged.append(doc_id)
+        elif digest in by_hash:
+            reusable[i] = by_hash[digest]
+        else:
+            to_embed.append(i)
+    current = set(ids)
+    stale = [doc_id for doc_id in indexed if doc_id not in current]
+    return to_embed, unchanged, reusable, stale
+
+def fetch_vectors(search_client, ids):
+    """Map id -> contentVector for indexed chunks; ids that no longer exist are left out"""
+    from concurrent.futures import ThreadPoolExecutor
+    from azure.core.exceptions import ResourceNotFoundError
+
+    def fetch(doc_id):
+        try:
+            document = search_client.get_document(key=doc_id, selected_fields=["contentVector"])
+        except ResourceNotFoundError:
+            return doc_id, None
+        return doc_id, document.get("contentVector")
+
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(VECTOR_FETCH_CONCURRENCY, len(ids))) as executor:
+        return {doc_id: vector for doc_id, vector in executor.map(fetch, ids) if vector}
+
+def iter_document_chunks(filename, pages):
+    """Chunk a stream of text pieces (PDF pages or line-aligned text) into indexable chunks"""
+    from chunker import iter_token_chunks
+
+    # Extraction time (pulling pages) is nested in, and excluded from, chunking time
+    return timed_iter("chunk", iter_token_chunks(timed_iter("extract", pages)))
+
+def read_document_chunks(filename):
+    """Download a document from Blob and return its text chunks"""
+    from extraction import iter_document_text
+
+    blob_service_client = get_blob_service_client()
+    blob_client = blob_service_client.get_blob_client(container=config.AZURE_STORAGE_CONTAINER_NAME, blob=filename)
+
+    with stage("download"):
+        if not blob_client.exists():
+            raise FileNotFoundError(filename)
+
+        stream = blob_client.download_blob()
+        file_content = stream.readall()
+
+    # Extract and chunk text as a stream of pages (large PDFs extract in parallel)
+    return list(iter_document_chunks(filename, iter_document_text(filename, file_content)))
+
+def _upload_in_batches(upload, documents, on_batch=None):
+    for start in range(0, len(documents), UPLOAD_BATCH_SIZE):
+        batch = documents[start:start + UPLOAD_BATCH_SIZE]
+        upload(documents=batch)
+        if on_batch:
+            on_batch(len(batch))
+
+def no_progress(**counts):
+    pass
+
+def ingest_document(filename, session_id, document_type, incremental=True, progress=no_progress):
+    """Chunk, embed and index one blob.
+
+    With incremental=True only chunks whose content hash differs from the
+    indexed copy are embedded and uploaded, ids that no longer exist are
+    deleted, and unchanged chunks just have their upload timestamp refreshed.
+    Text that moved to another position keeps its indexed vector.
+    progress is called with running totals (chunks, embedded, uploaded) as
+    the ingest advances.
+    """
+    from embedding_batcher import embed_texts
+    from index_versions import embedding_dimensions, get_active_index
+
+    chunks = read_document_chunks(filename)
+
+    # Resolve the index version once so every write of this ingest goes to the same one
+    index = get_active_index()
+    openai_client = get_openai_client(priority="bulk")
+    with stage("index_check"):
+        create_index_if_not_exists(index["name"], index["spec"])
+    search_client = get_search_client(index["name"])
+
+    ids = [chunk_id(session_id, filename, i) for i in range(len(chunks))]
+    hashes = [content_hash(chunk) for chunk in chunks]
+    with stage("index_diff"):
+        indexed = fetch_indexed_hashes(search_client, session_id, filename) if incremental else {}
+        to_embed, unchanged, reusable, stale = plan_incremental_update(ids, hashes, indexed)
+        # Fetched before anything is uploaded, since the uploads overwrite the ids these vectors sit under
+        vectors = fetch_vectors(search_client, reusable.values())
+    reused = {i: vectors[doc_id] for i, doc_id in reusable.items() if doc_id in vectors}
+    # A chunk whose indexed copy disappeared in the meantime is embedded after all
+    to_embed = sorted(to_embed + [i for i in reusable if i not in reused])
+    progress(chunks=len(chunks), unchanged=len(unchanged), reused=len(reused), embedded=0, uploaded=0)
+    totals = {"embedded": 0, "uploaded": 0}
+
+    def advance(key):
+        def on_batch(count):
+            totals[key] += count
+            progress(**{key: totals[key]})
+        return on_batch
+
+    # Register the chunk ids before uploading so a half-finished ingest can still be cleaned up by key
+    upload_timestamp = datetime.utcnow().isoformat()
+    with stage("session_registry"):
+        record_ingest(session_id, document_type, filename, ids, upload_timestamp)
+
+    # Embed in packed, concurrent batches; vectors come back in chunk order
+    with stage("embedding"):
+        embeddings = embed_texts(
+            openai_client,
+            [chunks[i] for i in to_embed],
+            config.OPENAI_EMBEDDING_MODEL,
+            dimensions=embedding_dimensions(index["spec"]),
+            on_batch=advance("embedded")
+        )
+
+    documents_to_index = [
+        {
+            "id": ids[i],
+            "filename": filename,
+            "content": chunks[i],
+            "contentHash": hashes[i],
+            "contentVector": embedding,
+            "sessionId": session_id,
+            "documentType": document_type,
+            "uploadTimestamp": upload_timestamp
+        }
+        for i, embedding in sorted([*zip(to_embed, embeddings), *reused.items()], key=lambda item: item[0])
+    ]
+    with stage("index_upload"):
+        _upload_in_batches(search_client.upload_documents, documents_to_index, on_batch=advance("uploaded"))
+
+        # Unchanged chunks keep their vectors; only the timestamp moves so expiry stays per-upload
+        _upload_in_batches(
+            search_client.merge_documents,
+            [{"id": doc_id, "uploadTimestamp": upload_timestamp} for doc_id in unchanged]
+        )
+
+        if stale:
+            _upload_in_batches(search_client.delete_documents, [{"id": doc_id} for doc_id in stale])
+
+    if document_type == 'permanent' and (to_embed or reused or stale):
+        from corpus import bump_permanent_corpus_version
+        bump_permanent_corpus_version()
+
+    logging.info(
+        f"Indexed {filename} (type: {document_type}, session: {session_id}): "
+        f"{len(chunks)} chunks, {len(to_embed)} embedded, {len(reused)} reused, {len(unchanged)} unchanged, {len(stale)} deleted"
+    )
+    return {
+        "chunks": len(chunks),
+        "embedded": len(to_embed),
+        "reused": len(reused),
+        "unchanged": len(unchanged),
+        "deleted": len(stale)
+    }
@@ -0,0 +1,246 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import config
+
+# Background ingest: /embed with "mode": "job" records a job, puts its id on the
+# "ingest-jobs" storage queue and answers 202 straight away. The queue-triggered function
+# (ingest_job_worker in function_app.py) runs the ingest on whichever worker
+# picks the message up, writing progress to the job record as it goes, and
+# /embed/status/{jobId} serves the record. A failed attempt is retried by the
+# queue until INGEST_JOB_MAX_ATTEMPTS (keep it equal to maxDequeueCount in
+# host.json); the last attempt records the job as failed instead of raising,
+# so nothing is left in the poison queue. Ingest is idempotent (chunk ids are
+# deterministic), so a retry or a duplicate delivery just re-indexes.
+#
+# With INGEST_JOB_QUEUE=memory jobs run on a small in-process pool instead of
+# the storage queue, for local runs and benchmarks without Azurite.
+#
+# Job record:
+#   {"jobId": "...", "status": "queued" | "running" | "retrying" | "succeeded" | "failed",
+#    "request": {"fileName", "sessionId", "documentType", "incremental", "pipeline"},
+#    "progress": {"chunks", "unchanged", "reused", "embedded", "uploaded"}, "attempts": n,
+#    "result": <the synchronous /embed summary> | None, "error": "..." | None,
+#    "createdAt", "startedAt", "finishedAt": "<iso>" | None}
+
+FINISHED = ("succeeded", "failed")
+LOCAL_WORKERS = 2
+
+class InMemoryJobStore:
+    """Process-local job records for tests and local runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job["jobId"]] = json.loads(json.dumps(job))
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def expire(self, cutoff):
+        """Delete jobs last updated before cutoff; returns how many"""
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if datetime.fromisoformat(job["updatedAt"]) < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        return len(expired)
+
+class BlobJobStore:
+    """One JSON blob per job (ingest-jobs/<id>.json) in the meta container.
+
+    Only the worker running a job writes its record, so writes simply overwrite.
+    """
+
+    PREFIX = "ingest-jobs/"
+
+    def _container(self):
+        from clients import get_blob_service_client
+        return get_blob_service_client().get_container_client(config.AZURE_STORAGE_META_CONTAINER_NAME)
+
+    def save(self, job):
+        from azure.core.exceptions import ResourceNotFoundError
+        container = self._container()
+        data = json.dumps(job).encode("utf-8")
+        try:
+            container.upload_blob(f"{self.PREFIX}{job['jobId']}.json", data, overwrite=True)
+        except ResourceNotFoundError:
+            container.create_container()
+            container.upload_blob(f"{self.PREFIX}{job['jobId']}.json", data, overwrite=True)
+
+    def get(self, job_id):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            downloader = self._container().get_blob_client(f"{self.PREFIX}{job_id}.json").download_blob()
+        except ResourceNotFoundError:
+            return None
+        return json.loads(downloader.readall())
+
+    def expire(self, cutoff):
+        from azure.core.exceptions import ResourceNotFoundError
+        container = self._container()
+        expired = 0
+        try:
+            for blob in container.list_blobs(name_starts_with=self.PREFIX):
+                if blob.last_modified and blob.last_modified.replace(tzinfo=None) < cutoff:
+                    try:
+                        container.delete_blob(blob.name)
+                        expired += 1
+                    except ResourceNotFoundError:
+                        pass
+        except ResourceNotFoundError:
+            return 0
+        return expired
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_job_store():
+    """Store selected by INGEST_JOB_STORE_BACKEND ("blob" or "memory"), shared per process"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if config.INGEST_JOB_STORE_BACKEND == "memory":
+                    _store = InMemoryJobStore()
+                else:
+                    _store = BlobJobStore()
+    return _store
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+def _save(job):
+    job["updatedAt"] = _now()
+    get_job_store().save(job)
+
+def valid_job_id(job_id):
+    try:
+        return uuid.UUID(job_id).hex == job_id
+    except (TypeError, ValueError):
+        return False
+
+def create_job(request):
+    """Record a queued job for an /embed request body (already validated) and return it"""
+    now = _now()
+    job = {
+        "jobId": uuid.uuid4().hex,
+        "status": "queued",
+        "request": request,
+        "progress": {"chunks": 0, "unchanged": 0, "reused": 0, "embedded": 0, "uploaded": 0},
+        "attempts": 0,
+        "result": None,
+        "error": None,
+        "createdAt": now,
+        "startedAt": None,
+        "finishedAt": None
+    }
+    _save(job)
+    return job
+
+_local_pool = None
+_local_pool_lock = threading.Lock()
+
+def _run_locally(job_id):
+    try:
+        run_job(job_id, attempt=1, max_attempts=1)
+    except Exception as e:
+        logging.error(f"Ingest job {job_id} failed: {e}")
+
+def enqueue_job(job, queue_output):
+    """Hand a job to the workers: the queue output binding, or the in-process pool"""
+    global _local_pool
+    if config.INGEST_JOB_QUEUE == "memory":
+        with _local_pool_lock:
+            if _local_pool is None:
+                _local_pool = ThreadPoolExecutor(max_workers=LOCAL_WORKERS, thread_name_prefix="ingest-job")
+        _local_pool.submit(_run_locally, job["jobId"])
+    else:
+        queue_output.set(json.dumps({"jobId": job["jobId"]}))
+
+class JobProgress:
+    """Progress callback for an ingest that saves the job at most every INGEST_JOB_PROGRESS_INTERVAL_SECONDS"""
+
+    def __init__(self, job):
+        self.job = job
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+
+    def __call__(self, **counts):
+        with self._lock:
+            self.job["progress"].update(counts)
+            now = time.monotonic()
+            if now - self._saved_at < config.INGEST_JOB_PROGRESS_INTERVAL_SECONDS:
+                return
+            self._saved_at = now
+            snapshot = json.loads(json.dumps(self.job))
+        try:
+            _save(snapshot)
+        except Exception as e:
+            # Progress is advisory; the final status is written regardless
+            logging.warning(f"Could not save progress for ingest job {self.job['jobId']}: {e}")
+
+def run_job(job_id, attempt, max_attempts=None):
+    """Run a queued ingest job, recording progress and the outcome on its record.
+
+    Raises on a failed attempt that should be retried by the queue.
+    """
+    from ingest import ingest_document
+    from ingest_pipeline import run_ingest_pipeline
+    from timing import end_request, start_request
+
+    max_attempts = max_attempts or config.INGEST_JOB_MAX_ATTEMPTS
+    job = get_job_store().get(job_id)
+    if job is None:
+        logging.warning(f"Ingest job {job_id} not found; dropping the message")
+        return None
+    if job["status"] in FINISHED:
+        # A duplicate delivery of a job that already ran to completion
+        return job
+
+    job.update(status="running", attempts=attempt, error=None, startedAt=_now())
+    _save(job)
+    request = job["request"]
+    progress = JobProgress(job)
+    ingest = run_ingest_pipeline if request["pipeline"] == "async" else ingest_document
+    timer, token = start_request(job_id)
+    try:
+        result = ingest(
+            request["fileName"],
+            request["sessionId"],
+            request["documentType"],
+            incremental=request["incremental"],
+            progress=progress
+        )
+        job.update(status="succeeded", result=result)
+        # The status the same ingest would have answered inline, for the timing log
+        status_code = 200
+    except FileNotFoundError:
+        job.update(status="failed", error="File not found")
+        status_code = 404
+    except Exception as e:
+        logging.error(f"Ingest job {job_id} attempt {attempt}/{max_attempts} failed: {e}")
+        job.update(status="failed" if attempt >= max_attempts else "retrying", error=str(e))
+        status_code = 500
+    finally:
+        end_request(token)
+
+    if job["status"] in FINISHED:
+        job["finishedAt"] = _now()
+    _save(job)
+    timer.log("ingest_job", status_code, jobId=job_id, jobStatus=job["status"], attempt=attempt)
+    if job["status"] == "retrying":
+        raise RuntimeError(f"Ingest job {job_id} will be retried: {job['error']}")
+    return job
@@ -0,0 +1,429 @@
+import asyncio
+import codecs
+import concurrent.futures
+import logging
+import threading
+from datetime import datetime
+
+from config import config
+from ingest import (
+    UPLOAD_BATCH_SIZE,
+    VECTOR_FETCH_CONCURRENCY,
+    chunk_id,
+    content_hash,
+    iter_document_chunks,
+    no_progress
+)
+from openai_scheduler import ScheduledOpenAI
+from search_index import create_index_if_not_exists, odata_quote
+from session_registry import record_ingest
+from tokens import estimate_tokens
+
+# Async ingest: download -> extract/chunk -> embed -> upload run as concurrent
+# stages joined by bounded queues, so index uploads start while later chunks
+# are still being embedded and memory is capped by the queue sizes.
+#
+# Async SDK clients are bound to the event loop that created them, and each
+# ingest runs on its own loop (see run_ingest_pipeline), so they are built per
+# ingest rather than taken from the process-wide registry in clients.py.
+
+_DONE = None
+
+def _async_clients(index_name):
+    from openai import AsyncAzureOpenAI
+    from azure.storage.blob.aio import BlobServiceClient
+    from azure.search.documents.aio import SearchClient
+    from azure.core.credentials import AzureKeyCredential
+    return (
+        BlobServiceClient.from_connection_string(config.AZURE_STORAGE_CONNECTION_STRING),
+        SearchClient(
+            endpoint=config.AZURE_SEARCH_ENDPOINT,
+            index_name=index_name,
+            credential=AzureKeyCredential(config.AZURE_SEARCH_KEY)
+        ),
+        AsyncAzureOpenAI(
+            api_key=config.AZURE_OPENAI_API_KEY,
+            api_version=config.AZURE_OPENAI_API_VERSION,
+            azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
+            # Retries are left to the scheduler (see openai_scheduler.py)
+            max_retries=0
+        )
+    )
+
+async def _fetch_indexed_hashes(search_client, session_id, filename, page_size=1000):
+    """Async counterpart of ingest.fetch_indexed_hashes, paged the same way as bulk_delete.iter_matching"""
+    from azure.core.exceptions import HttpResponseError
+    from bulk_delete import MAX_SKIP, SkipLimitReached, is_unsortable_key_error, key_range_filter, warn_skip_paging
+    filter_query = f"sessionId eq {odata_quote(session_id)} and filename eq {odata_quote(filename)}"
+    indexed = {}
+    after = None
+    skip = None  # set when the index can only be paged with $skip
+    while True:
+        if skip is None:
+            page = {"filter": key_range_filter(filter_query, after), "order_by": ["id"]}
+        else:
+            page = {"filter": filter_query, "skip": skip}
+        try:
+            results = await search_client.search(search_text="*", select=["id", "contentHash"], top=page_size, **page)
+            count = 0
+            async for result in results:
+                indexed[result["id"]] = result.get("contentHash")
+                after = result["id"]
+                count += 1
+        except HttpResponseError as e:
+            if skip is not None or after is not None or not is_unsortable_key_error(e):
+                raise
+            warn_skip_paging(e)
+            skip = 0
+            continue
+        if count < page_size:
+            return indexed
+        if skip is not None:
+            skip += page_size
+            if skip > MAX_SKIP:
+                raise SkipLimitReached(f"More than {skip} documents match {filter_query!r}")
+
+async def _fetch_vector(search_client, doc_id, digest, semaphore):
+    """Read the indexed vector of doc_id, or None if it is gone or no longer holds the text with this digest"""
+    from azure.core.exceptions import ResourceNotFoundError
+    async with semaphore:
+        try:
+            document = await search_client.get_document(key=doc_id, selected_fields=["contentVector", "contentHash"])
+        except ResourceNotFoundError:
+            return None
+    if document.get("contentHash") != digest:
+        return None
+    return document.get("contentVector")
+
+async def _download(blob_client, piece_queue):
+    """Stage 1: stream the blob in blocks"""
+    stream = await blob_client.download_blob()
+    async for block in stream.chunks():
+        await piece_queue.put(block)
+    await piece_queue.put(_DONE)
+
+def _extract_and_chunk(filename, piece_queue, chunk_queue, loop, stop):
+    """Stage 2 (worker thread): turn downloaded blocks into chunks.
+
+    Text files are decoded and split on line boundaries as blocks arrive. PDFs
+    need the whole file (the cross-reference table sits at the end), so their
+    blocks are collected first and pages are then streamed into the chunker.
+    """
+    from extraction import iter_pdf_pages
+
+    def from_loop(coro):
+        # Poll so a failure elsewhere in the pipeline can release this thread
+        # even while it waits on a full (or empty) queue
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except concurrent.futures.TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    raise RuntimeError("Ingest pipeline stopped")
+
+    def blocks():
+        while True:
+            block = from_loop(piece_queue.get())
+            if block is _DONE:
+                return
+            yield block
+
+    def text_pieces():
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        pending = ""
+        for block in blocks():
+            pending += decoder.decode(block)
+            head, sep, pending = pending.rpartition("\n")
+            if sep:
+                yield head
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+
+    if filename.lower().endswith('.pdf'):
+        pieces = iter_pdf_pages(b"".join(blocks()))
+    else:
+        pieces = text_pieces()
+
+    for chunk in iter_document_chunks(filename, pieces):
+        from_loop(chunk_queue.put(chunk))
+    from_loop(chunk_queue.put(_DONE))
+
+async def _embed(openai_client, search_client, chunk_queue, doc_queue, session_id, filename, document_type, indexed_task, result, dimensions=None, progress=no_progress):
+    """Stage 3: pack incoming chunks into embedding batches and run a bounded number at once.
+
+    Chunks whose text is already indexed under another id (it moved) get that
+    vector copied instead, read as soon as the chunk arrives. A document that
+    overwrites such a source id waits only until that read has finished, so an
+    upload never replaces a vector before it is copied; everything else goes to
+    the upload stage straight away.
+
+    Chunk ids are registered for session cleanup before the first upload that
+    includes them (together with the ids already indexed for the file), so a
+    pipeline that fails part-way leaves nothing cleanup can't find.
+    """
+    options = {"dimensions": dimensions} if dimensions else {}
+    semaphore = asyncio.Semaphore(config.EMBEDDING_MAX_CONCURRENCY)
+    upload_timestamp = result["uploadTimestamp"]
+    indexed = await indexed_task if indexed_task else {}
+    by_hash = {}
+    for doc_id, digest in indexed.items():
+        if digest:
+            by_hash.setdefault(digest, doc_id)
+    in_flight = set()
+    errors = []
+    batch = []
+    batch_tokens = 0
+    position = 0
+    embedded = 0
+    # Source id -> task reading its indexed vector, started by the first chunk that copies it
+    fetches = {}
+    fetch_semaphore = asyncio.Semaphore(VECTOR_FETCH_CONCURRENCY)
+    reuses = set()
+    reuse_slots = asyncio.Semaphore(config.INGEST_QUEUE_SIZE)
+    missing = []
+    registered = set()
+    register_lock = asyncio.Lock()
+
+    async def register(doc_id):
+        if document_type != 'temporary':
+            return
+        async with register_lock:
+            if doc_id in registered:
+                return
+            # Everything produced so far, so this costs one registry write per few batches rather than per document
+            ids = list(dict.fromkeys(result["ids"] + list(indexed)))
+            await asyncio.to_thread(record_ingest, session_id, document_type, filename, ids, upload_timestamp)
+            registered.update(ids)
+
+    async def send(doc):
+        await register(doc["id"])
+        fetch = fetches.get(doc["id"])
+        if fetch:
+            # Another chunk is copying the vector stored under this id
+            await asyncio.wait([fetch])
+        await doc_queue.put(doc)
+
+    async def reuse(item, fetch):
+        try:
+            vector = await fetch
+            if vector:
+                result["reused"] += 1
+                await send({**item, "contentVector": vector})
+            else:
+                # Its indexed copy disappeared or was replaced in the meantime
+                missing.append(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            reuse_slots.release()
+
+    def report():
+        progress(chunks=position, unchanged=len(result["unchanged"]), reused=result["reused"], embedded=embedded)
+
+    async def embed_batch(items):
+        nonlocal embedded
+        try:
+            response = await openai_client.embeddings.create(
+                input=[item["content"] for item in items],
+                model=config.OPENAI_EMBEDDING_MODEL,
+                **options
+            )
+            vectors = [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+            embedded += len(vectors)
+            report()
+            for item, vector in zip(items, vectors):
+                await send({**item, "contentVector": vector})
+        except Exception as e:
+            errors.append(e)
+        finally:
+            semaphore.release()
+
+    async def flush():
+        nonlocal batch, batch_tokens
+        if not batch:
+            return
+        await semaphore.acquire()
+        # Stop dispatching as soon as any batch has failed
+        if errors:
+            semaphore.release()
+            raise errors[0]
+        task = asyncio.create_task(embed_batch(batch))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        batch = []
+        batch_tokens = 0
+
+    async def add(item):
+        nonlocal batch_tokens
+        tokens = estimate_tokens(item["content"])
+        if batch and (len(batch) >= config.EMBEDDING_BATCH_MAX_ITEMS or batch_tokens + tokens > config.EMBEDDING_BATCH_MAX_TOKENS):
+            await flush()
+        batch.append(item)
+        batch_tokens += tokens
+
+    try:
+        while True:
+            chunk = await chunk_queue.get()
+            if chunk is _DONE:
+                break
+            doc_id = chunk_id(session_id, filename, position)
+            digest = content_hash(chunk)
+            position += 1
+            result["ids"].append(doc_id)
+            if indexed.get(doc_id) == digest:
+                result["unchanged"].append(doc_id)
+                continue
+
+            item = {
+                "id": doc_id,
+                "filename": filename,
+                "content": chunk,
+                "contentHash": digest,
+                "sessionId": session_id,
+                "documentType": document_type,
+                "uploadTimestamp": upload_timestamp
+            }
+            if digest in by_hash:
+                source = by_hash[digest]
+                if source not in fetches:
+                    fetches[source] = asyncio.create_task(_fetch_vector(search_client, source, digest, fetch_semaphore))
+                await reuse_slots.acquire()
+                task = asyncio.create_task(reuse(item, fetches[source]))
+                reuses.add(task)
+                task.add_done_callback(reuses.discard)
+            else:
+                await add(item)
+
+        while reuses:
+            await asyncio.gather(*list(reuses))
+        for item in missing:
+            await add(item)
+        await flush()
+        while in_flight:
+            await asyncio.gather(*list(in_flight))
+        if errors:
+            raise errors[0]
+        report()
+    finally:
+        for task in [*in_flight, *reuses, *fetches.values()]:
+            task.cancel()
+    for _ in range(config.INGEST_UPLOAD_CONCURRENCY):
+        await doc_queue.put(_DONE)
+    result["embedded"] = embedded
+    result["indexed"] = indexed
+
+async def _upload(search_client, doc_queue, result, progress=no_progress):
+    """Stage 4: upload embedded documents as soon as they are ready, up to one batch per call"""
+    while True:
+        doc = await doc_queue.get()
+        if doc is _DONE:
+            return
+        batch = [doc]
+        finished = False
+        while len(batch) < UPLOAD_BATCH_SIZE and not doc_queue.empty():
+            doc = doc_queue.get_nowait()
+            if doc is _DONE:
+                finished = True
+                break
+            batch.append(doc)
+        await search_client.upload_documents(documents=batch)
+        result["uploaded"] += len(batch)
+        progress(uploaded=result["uploaded"])
+        if finished:
+            return
+
+async def ingest_document_async(filename, session_id, document_type, incremental=True, progress=no_progress):
+    """Async counterpart of ingest.ingest_document with overlapped stages; returns the same summary.
+
+    progress gets the same running totals, except that chunks grows as
+    chunks are produced rather than being known up front.
+    """
+    from index_versions import embedding_dimensions, get_active_index
+
+    # Resolve the index version once so every write of this ingest goes to the same one
+    index = await asyncio.to_thread(get_active_index)
+    await asyncio.to_thread(create_index_if_not_exists, index["name"], index["spec"])
+    loop = asyncio.get_running_loop()
+    blob_service_client, search_client, openai_client = _async_clients(index["name"])
+
+    async with blob_service_client, search_client, openai_client:
+        blob_client = blob_service_client.get_blob_client(container=config.AZURE_STORAGE_CONTAINER_NAME, blob=filename)
+        if not await blob_client.exists():
+            raise FileNotFoundError(filename)
+
+        queue_size = config.INGEST_QUEUE_SIZE
+        piece_queue = asyncio.Queue(maxsize=4)
+        chunk_queue = asyncio.Queue(maxsize=queue_size)
+        doc_queue = asyncio.Queue(maxsize=queue_size)
+        result = {
+            "ids": [],
+            "unchanged": [],
+            "embedded": 0,
+            "reused": 0,
+            "uploaded": 0,
+            "uploadTimestamp": datetime.utcnow().isoformat()
+        }
+
+        stop = threading.Event()
+        indexed_task = asyncio.create_task(_fetch_indexed_hashes(search_client, session_id, filename)) if incremental else None
+        tasks = [
+            asyncio.create_task(_download(blob_client, piece_queue)),
+            asyncio.create_task(asyncio.to_thread(_extract_and_chunk, filename, piece_queue, chunk_queue, loop, stop)),
+            asyncio.create_task(_embed(
+                ScheduledOpenAI(openai_client, priority="bulk", is_async=True), search_client, chunk_queue, doc_queue, session_id, filename, document_type, indexed_task, result,
+                dimensions=embedding_dimensions(index["spec"]),
+                progress=progress
+            )),
+        ] + [
+            asyncio.create_task(_upload(search_client, doc_queue, result, progress))
+            for _ in range(config.INGEST_UPLOAD_CONCURRENCY)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            stop.set()
+            for task in tasks + ([indexed_task] if indexed_task else []):
+                task.cancel()
+            raise
+
+        current = set(result["ids"])
+        unchanged = result["unchanged"]
+        stale = [doc_id for doc_id in result["indexed"] if doc_id not in current]
+        upload_timestamp = result["uploadTimestamp"]
+        for start in range(0, len(unchanged), UPLOAD_BATCH_SIZE):
+            await search_client.merge_documents(documents=[
+                {"id": doc_id, "uploadTimestamp": upload_timestamp}
+                for doc_id in unchanged[start:start + UPLOAD_BATCH_SIZE]
+            ])
+        for start in range(0, len(stale), UPLOAD_BATCH_SIZE):
+            await search_client.delete_documents(documents=[{"id": doc_id} for doc_id in stale[start:start + UPLOAD_BATCH_SIZE]])
+
+    # Final manifest: drops the stale ids that were just deleted. Every uploaded id
+    # is registered already, so if this write fails the manifest only lists extra ids.
+    try:
+        await asyncio.to_thread(record_ingest, session_id, document_type, filename, result["ids"], result["uploadTimestamp"])
+    except Exception as e:
+        logging.warning(f"Could not trim the session manifest for {filename}: {e}")
+
+    if document_type == 'permanent' and (result["uploaded"] or stale):
+        from corpus import bump_permanent_corpus_version
+        await asyncio.to_thread(bump_permanent_corpus_version)
+
+    logging.info(
+        f"Pipeline indexed {filename} (type: {document_type}, session: {session_id}): "
+        f"{len(result['ids'])} chunks, {result['embedded']} embedded, {result['reused']} reused, {len(unchanged)} unchanged, {len(stale)} deleted"
+    )
+    return {
+        "chunks": len(result["ids"]),
+        "embedded": result["embedded"],
+        "reused": result["reused"],
+        "unchanged": len(unchanged),
+        "deleted": len(stale)
+    }
+
+def run_ingest_pipeline(filename, session_id, document_type, incremental=True, progress=no_progress):
+    """Run the async pipeline to completion from synchronous code (e.g. an HTTP handler thread)"""
+    return asyncio.run(ingest_document_async(filename, session_id, document_type, incremental=incremental, progress=progress))
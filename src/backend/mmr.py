@@ -0,0 +1,39 @@
+import numpy as np
+
+# Maximal Marginal Relevance: pick results one at a time, each time taking the
+# candidate with the best trade-off between relevance to the query and
+# similarity to what has already been picked:
+#
+#   lambda * sim(query, d) - (1 - lambda) * max(sim(d, s) for s in selected)
+#
+# lambda = 1 is plain relevance ranking; lower values favour diversity. The
+# pairwise similarities of the (few dozen) candidates are one matrix product,
+# and the "most similar selected result" column is updated incrementally, so a
+# selection of k costs O(k * n) after that.
+
+def _normalized(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def mmr_select(query_vector, candidate_vectors, k, lambda_mult):
+    """Indexes of up to k candidates in MMR selection order (the most relevant first)"""
+    vectors = _normalized(np.asarray(candidate_vectors, dtype=np.float32))
+    if not len(vectors) or k <= 0:
+        return []
+    query = _normalized(np.asarray(query_vector, dtype=np.float32))
+    relevance = vectors @ query
+    pairwise = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = pairwise[selected[0]].copy()
+    available = np.ones(len(vectors), dtype=bool)
+    available[selected[0]] = False
+    for _ in range(min(k, len(vectors)) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        choice = int(np.argmax(scores))
+        selected.append(choice)
+        available[choice] = False
+        np.maximum(redundancy, pairwise[choice], out=redundancy)
+    return selected
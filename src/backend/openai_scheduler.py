@@ -0,0 +1,302 @@
+import asyncio
+import itertools
+import logging
+import random
+import threading
+import time
+from bisect import insort
+
+from config import config
+from timing import stage
+
+# Every Azure OpenAI call from this worker goes through one scheduler, so chat,
+# query embeddings and ingest share the deployment quotas instead of each
+# finding them with a 429.
+#
+# Each deployment has two token buckets mirroring its Azure quota: requests per
+# minute (refilled continuously, bursting up to 10 seconds' worth, which is the
+# window Azure enforces RPM over) and tokens per minute (bursting up to a
+# minute's worth). A call is charged its estimated tokens up front - for chat
+# that includes the completion allowance, which is what Azure's limiter counts
+# too - so nothing is refunded afterwards.
+#
+# Callers wait in one queue per deployment, ordered by priority and then
+# arrival: interactive requests (chat, query embeddings) always go before bulk
+# ones (ingest, migrations), and bulk requests may not dip into the last
+# OPENAI_BULK_RESERVE_FRACTION of either bucket, so a burst of ingest leaves
+# headroom for the next visitor. A 429 pauses the whole deployment for the
+# Retry-After the service sent (plus jitter) and the call queues again; other
+# transient failures back off on their own. Under load calls get slower rather
+# than failing, up to each priority's maximum wait.
+
+PRIORITIES = {"interactive": 0, "bulk": 1}
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+REQUEST_BURST_SECONDS = 10
+TOKEN_BURST_SECONDS = 60
+
+class SchedulerTimeout(Exception):
+    """The call could not be scheduled within its priority's maximum wait"""
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to burst_seconds' worth.
+
+    A take larger than the whole bucket waits for a full bucket and leaves it in
+    debt, so oversized requests still go through, just less often.
+    """
+
+    def __init__(self, rate_per_minute, burst_seconds):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def seconds_until(self, amount, now, reserve=0.0):
+        """How long until amount can be taken while leaving reserve (a fraction of capacity) in the bucket"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(self.capacity, amount + reserve * self.capacity)
+        return max(0.0, (needed - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= amount
+
+class _Deployment:
+    def __init__(self, name):
+        self.name = name
+        self.requests_per_minute = self.tokens_per_minute = None
+        self.requests = self.tokens = None
+        self.paused_until = 0.0
+        self.waiting = []  # sorted (priority, sequence) tickets; the head is next to go
+        self.peak_waiting = 0
+        self.granted = 0
+        self.rate_limited = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def configure(self, requests_per_minute, tokens_per_minute):
+        """Apply the budgets (0 = unlimited); buckets start full and are only rebuilt when a budget changes"""
+        if requests_per_minute != self.requests_per_minute:
+            self.requests_per_minute = requests_per_minute
+            self.requests = TokenBucket(requests_per_minute, REQUEST_BURST_SECONDS) if requests_per_minute else None
+        if tokens_per_minute != self.tokens_per_minute:
+            self.tokens_per_minute = tokens_per_minute
+            self.tokens = TokenBucket(tokens_per_minute, TOKEN_BURST_SECONDS) if tokens_per_minute else None
+
+    def seconds_until(self, tokens, now, reserve):
+        wait = self.paused_until - now
+        if self.requests:
+            wait = max(wait, self.requests.seconds_until(1, now, reserve))
+        if self.tokens:
+            wait = max(wait, self.tokens.seconds_until(tokens, now, reserve))
+        return max(0.0, wait)
+
+    def take(self, tokens):
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(tokens)
+
+    def stats(self, now):
+        queued = {name: 0 for name in PRIORITIES}
+        names = {rank: name for name, rank in PRIORITIES.items()}
+        for rank, _ in self.waiting:
+            queued[names[rank]] += 1
+        return {
+            "requestsPerMinute": self.requests_per_minute,
+            "tokensPerMinute": self.tokens_per_minute,
+            "queued": queued,
+            "peakQueued": self.peak_waiting,
+            "granted": self.granted,
+            "rateLimited": self.rate_limited,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "meanWaitMs": round(self.wait_seconds / self.granted * 1000, 1) if self.granted else 0.0,
+            "maxWaitMs": round(self.max_wait_seconds * 1000, 1),
+            "pausedForSeconds": round(max(0.0, self.paused_until - now), 1)
+        }
+
+def _budgets(deployment):
+    """(requests, tokens) per minute for a deployment; 0 means unlimited"""
+    if deployment == config.OPENAI_CHAT_MODEL:
+        return config.OPENAI_CHAT_REQUESTS_PER_MINUTE, config.OPENAI_CHAT_TOKENS_PER_MINUTE
+    if deployment == config.OPENAI_EMBEDDING_MODEL:
+        return config.OPENAI_EMBEDDING_REQUESTS_PER_MINUTE, config.OPENAI_EMBEDDING_TOKENS_PER_MINUTE
+    return 0, 0
+
+def retry_after_seconds(error):
+    """The wait the service asked for in a failed response's headers, or None"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            continue  # an HTTP date; fall back to our own backoff
+    return None
+
+def is_retryable(error):
+    from openai import APIConnectionError
+    return isinstance(error, APIConnectionError) or getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+class OpenAIScheduler:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._deployments = {}
+        self._sequence = itertools.count()
+
+    def _deployment(self, name):
+        """The queue for a deployment, with the current budgets applied (call with the lock held)"""
+        deployment = self._deployments.get(name)
+        if deployment is None:
+            deployment = self._deployments[name] = _Deployment(name)
+        deployment.configure(*_budgets(name))
+        return deployment
+
+    def acquire(self, deployment, tokens, priority="interactive"):
+        """Block until a call of about tokens may go to deployment; returns the seconds waited"""
+        rank = PRIORITIES[priority]
+        reserve = config.OPENAI_BULK_RESERVE_FRACTION if rank else 0.0
+        max_wait = config.OPENAI_BULK_MAX_WAIT_SECONDS if rank else config.OPENAI_INTERACTIVE_MAX_WAIT_SECONDS
+        started = time.monotonic()
+        deadline = started + max_wait
+        ticket = (rank, next(self._sequence))
+
+        with self._cond:
+            queue = self._deployment(deployment)
+            insort(queue.waiting, ticket)
+            queue.peak_waiting = max(queue.peak_waiting, len(queue.waiting))
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if queue.waiting[0] == ticket:
+                        wait = queue.seconds_until(tokens, now, reserve)
+                        if wait <= 0:
+                            queue.take(tokens)
+                            break
+                    if now >= deadline:
+                        queue.timeouts += 1
+                        raise SchedulerTimeout(f"No {priority} capacity on '{deployment}' within {max_wait}s")
+                    self._cond.wait(timeout=min(wait, deadline - now) if wait is not None else deadline - now)
+            finally:
+                queue.waiting.remove(ticket)
+                self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            queue.granted += 1
+            queue.wait_seconds += waited
+            queue.max_wait_seconds = max(queue.max_wait_seconds, waited)
+        return waited
+
+    def _backoff(self, deployment, error, attempt):
+        """Seconds to sleep before retrying a failed call; re-raises if it shouldn't be retried"""
+        if attempt >= config.OPENAI_MAX_ATTEMPTS or not is_retryable(error):
+            raise error
+        retry_after = retry_after_seconds(error)
+        backoff = min(config.OPENAI_RETRY_MAX_DELAY_SECONDS, 0.5 * 2 ** (attempt - 1))
+        with self._cond:
+            queue = self._deployment(deployment)
+            queue.retries += 1
+            if getattr(error, "status_code", None) != 429:
+                return backoff * (0.5 + random.random())
+            # Over quota: hold every caller for this deployment, not just this one.
+            # Jitter spreads the restart; it never goes below what the service asked for.
+            pause = (retry_after if retry_after is not None else backoff) * (1 + 0.25 * random.random())
+            queue.rate_limited += 1
+            queue.paused_until = max(queue.paused_until, time.monotonic() + pause)
+            self._cond.notify_all()
+        logging.warning(f"Azure OpenAI '{deployment}' rate limited (attempt {attempt}); pausing {pause:.1f}s")
+        return 0.0
+
+    def call(self, deployment, tokens, priority, request):
+        """Run request() once deployment has capacity, retrying transient failures"""
+        attempt = 0
+        while True:
+            attempt += 1
+            with stage("openai_queue"):
+                self.acquire(deployment, tokens, priority)
+            try:
+                return request()
+            except Exception as e:
+                delay = self._backoff(deployment, e, attempt)
+            if delay:
+                time.sleep(delay)
+
+    async def call_async(self, deployment, tokens, priority, request):
+        """call() for coroutines; waiting for capacity happens off the event loop"""
+        attempt = 0
+        while True:
+            attempt += 1
+            await asyncio.to_thread(self.acquire, deployment, tokens, priority)
+            try:
+                return await request()
+            except Exception as e:
+                delay = self._backoff(deployment, e, attempt)
+            if delay:
+                await asyncio.sleep(delay)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            return {name: queue.stats(now) for name, queue in self._deployments.items()}
+
+scheduler = OpenAIScheduler()
+
+def embedding_tokens(kwargs):
+    from tokens import estimate_tokens
+    texts = kwargs.get("input")
+    texts = texts if isinstance(texts, list) else [texts]
+    return sum(estimate_tokens(text) for text in texts)
+
+def chat_tokens(kwargs):
+    """Prompt estimate plus the completion allowance (max_tokens, or the configured default)"""
+    from tokens import estimate_tokens
+    prompt = sum(estimate_tokens(message.get("content") or "") for message in kwargs.get("messages", []))
+    return prompt + (kwargs.get("max_tokens") or config.OPENAI_COMPLETION_TOKEN_ESTIMATE)
+
+class _ScheduledCreate:
+    def __init__(self, resource, priority, estimate):
+        self._resource = resource
+        self._priority = priority
+        self._estimate = estimate
+
+    def create(self, **kwargs):
+        return scheduler.call(kwargs["model"], self._estimate(kwargs), self._priority, lambda: self._resource.create(**kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+class _ScheduledCreateAsync(_ScheduledCreate):
+    async def create(self, **kwargs):
+        return await scheduler.call_async(kwargs["model"], self._estimate(kwargs), self._priority, lambda: self._resource.create(**kwargs))
+
+class _ScheduledChat:
+    def __init__(self, chat, completions):
+        self._chat = chat
+        self.completions = completions
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+class ScheduledOpenAI:
+    """An (Async)AzureOpenAI client whose embeddings and chat completions go through the scheduler.
+
+    Everything else (e.g. models.list) is passed straight to the client.
+    """
+
+    def __init__(self, client, priority="interactive", is_async=False):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        wrap = _ScheduledCreateAsync if is_async else _ScheduledCreate
+        self._client = client
+        self.priority = priority
+        self.embeddings = wrap(client.embeddings, priority, embedding_tokens)
+        self.chat = _ScheduledChat(client.chat, wrap(client.chat.completions, priority, chat_tokens))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,184 @@
+import logging
+
+from caches import TTLCache
+from config import config
+from context_packer import pack_context
+from timing import stage
+
+# Visitors ask the same handful of questions, so query vectors are cached per worker
+query_embedding_cache = TTLCache(
+    max_entries=config.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=config.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
+
+def normalize_prompt(prompt):
+    """Case- and whitespace-insensitive form of a prompt, used for cache keys"""
+    return " ".join(prompt.lower().split())
+
+def embed_query(openai_client, prompt, model=None, dimensions=None):
+    """Embed a user prompt, serving repeats from the query-embedding cache"""
+    model = model or config.OPENAI_EMBEDDING_MODEL
+    key = (model, dimensions, normalize_prompt(prompt))
+    with stage("query_embedding"):
+        vector = query_embedding_cache.get(key)
+        if vector is not None:
+            return vector
+
+        options = {"dimensions": dimensions} if dimensions else {}
+        response = openai_client.embeddings.create(input=prompt, model=model, **options)
+        vector = response.data[0].embedding
+    query_embedding_cache.put(key, vector)
+    return vector
+
+def embed_queries(openai_client, prompts, model=None, dimensions=None):
+    """Embed many prompts; cache misses (deduplicated) go out in as few packed requests as possible"""
+    from embedding_batcher import embed_texts
+
+    model = model or config.OPENAI_EMBEDDING_MODEL
+    keys = [(model, dimensions, normalize_prompt(prompt)) for prompt in prompts]
+    with stage("query_embedding"):
+        vectors = {key: query_embedding_cache.get(key) for key in keys}
+        missing = {}
+        for key, prompt in zip(keys, prompts):
+            if vectors[key] is None:
+                missing.setdefault(key, prompt)
+        if missing:
+            embedded = embed_texts(openai_client, list(missing.values()), model, dimensions=dimensions)
+            for key, vector in zip(missing, embedded):
+                vectors[key] = vector
+                query_embedding_cache.put(key, vector)
+    return [vectors[key] for key in keys]
+
+SYSTEM_PROMPT = """You are SamBot, an AI assistant that helps people learn about Samrudh Anavatti's professional background, skills, and experience. 
+Be friendly, professional, and enthusiastic about Samrudh's qualifications. 
+Always end your responses with a friendly reminder: "Be sure to hire Sam!" """
+
+def local_permanent_search(query_vector, session_id, k=5, with_vectors=False):
+    """Top-k permanent chunks from the in-process engine, or None if the search service must be used"""
+    from session_registry import session_has_documents
+    from vector_engine import get_permanent_engine
+
+    if not config.LOCAL_VECTOR_ENGINE:
+        return None
+    try:
+        # Sessions with their own uploads need the index's session filter
+        if session_has_documents(session_id):
+            return None
+        engine = get_permanent_engine()
+    except Exception as e:
+        logging.warning(f"Local vector engine unavailable: {e}")
+        return None
+    if engine is None:
+        return None
+    if len(engine.documents) and engine.vectors.shape[1] != len(query_vector):
+        # Just after an index version switch, before this worker has the new snapshot
+        return None
+    return engine.search(query_vector, k, with_vectors=with_vectors)
+
+def search_index_for_context(prompt, query_vector, session_id, index_name=None, k=5, with_vectors=False):
+    from azure.search.documents.models import VectorizedQuery
+    from clients import get_search_client
+    from search_index import odata_quote
+
+    # Search with session filtering - only retrieve CV (permanent) + user's own documents
+    search_client = get_search_client(index_name)
+    vector_query = VectorizedQuery(vector=query_vector, k_nearest_neighbors=k, fields="contentVector")
+    
+    # Filter: (sessionId eq 'user_session' OR documentType eq 'permanent')
+    filter_query = f"sessionId eq {odata_quote(session_id)} or documentType eq 'permanent'"
+    
+    return search_client.search(
+        search_text=prompt,
+        vector_queries=[vector_query],
+        filter=filter_query,
+        select=["id", "content", "filename", "documentType"] + (["contentVector"] if with_vectors else []),
+        top=k
+    )
+
+def diversify(query_vector, results, k):
+    """Re-rank over-fetched results down to k by Maximal Marginal Relevance (see mmr.py)"""
+    from mmr import mmr_select
+
+    candidates = [result for result in results if result.get("contentVector") is not None]
+    if len(candidates) > k:
+        order = mmr_select(query_vector, [c["contentVector"] for c in candidates], k, config.RETRIEVAL_MMR_LAMBDA)
+        results = [candidates[i] for i in order]
+    # Vectors were only needed for the re-rank
+    return [{key: value for key, value in result.items() if key != "contentVector"} for result in results[:k]]
+
+def similarity(a, b):
+    import numpy as np
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    if a.shape != b.shape:
+        # Embedded for different index versions
+        return 0.0
+    denominator = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(np.dot(a, b)) / denominator if denominator else 0.0
+
+def retrieve_context(openai_client, prompt, session_id, previous=None):
+    """Embed the prompt and fetch matching CV chunks plus the session's own documents.
+
+    Sessions without uploads are served from the in-process permanent corpus
+    engine; everything else goes to Azure AI Search.
+
+    With CONVERSATION_REUSE_SIMILARITY set, a follow-up whose embedding is at
+    least that close to the previous turn's (previous is that turn's result)
+    reuses its context instead of searching again.
+
+    Returns a dict with the assembled context string, the citation filenames,
+    the query vector and whether every hit came from the permanent corpus.
+    """
+    from index_versions import embedding_dimensions, get_active_index
+
+    # Embed Query (repeat questions are served from the per-worker cache) to
+    # match the index version being searched
+    index = get_active_index()
+    query_vector = embed_query(openai_client, prompt, dimensions=embedding_dimensions(index["spec"]))
+
+    threshold = config.CONVERSATION_REUSE_SIMILARITY
+    if previous is not None and threshold > 0 and similarity(previous["query_vector"], query_vector) >= threshold:
+        return {**previous, "query_vector": query_vector, "reused": True}
+
+    return search_context(prompt, query_vector, session_id, index["name"])
+
+def search_context(prompt, query_vector, session_id, index_name=None):
+    """Search with an already embedded prompt and pack the hits into a context (see retrieve_context).
+
+    With RETRIEVAL_MMR, RETRIEVAL_MMR_CANDIDATES hits are fetched with their
+    vectors and narrowed to RETRIEVAL_TOP_K by MMR, so near-duplicate chunks
+    don't crowd out other relevant ones.
+    """
+    top_k = config.RETRIEVAL_TOP_K
+    mmr = config.RETRIEVAL_MMR
+    fetch = max(top_k, config.RETRIEVAL_MMR_CANDIDATES) if mmr else top_k
+    with stage("search"):
+        results = local_permanent_search(query_vector, session_id, fetch, with_vectors=mmr)
+        if results is None:
+            # Results are fetched lazily; materialize them so the request is timed here
+            results = list(search_index_for_context(prompt, query_vector, session_id, index_name, fetch, with_vectors=mmr))
+    if mmr:
+        with stage("mmr"):
+            results = diversify(query_vector, results, top_k)
+
+    # Construct Context: stitch overlapping neighbours, drop repeats, fit the token budget
+    with stage("context"):
+        packed = pack_context(results, config.CONTEXT_TOKEN_BUDGET)
+
+    return {
+        "context": packed["context"],
+        "citations": packed["citations"],
+        "query_vector": query_vector,
+        "permanent_only": packed["permanent_only"]
+    }
+
+def build_chat_messages(prompt, context, history=None):
+    """System prompt with context, then any conversation history, then the prompt"""
+    system_message = SYSTEM_PROMPT
+    if context:
+        system_message += f"\n\nUse the following context to answer the user's question:\n\n{context}"
+    return [
+        {"role": "system", "content": system_message},
+        *(history or []),
+        {"role": "user", "content": prompt}
+    ]
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import threading
+
+from clients import get_search_index_client
+
+# Index state cached for the lifetime of the worker: index name -> fingerprint of
+# the schema that was verified (or created). Mismatches are recorded once here
+# instead of being re-probed on every /embed call.
+_lock = threading.Lock()
+_verified = {}
+_mismatches = {}
+
+def odata_quote(value):
+    """Quote a string literal for an OData filter"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+def build_index_fields(spec=None):
+    from index_versions import LEGACY_SPEC
+    from azure.search.documents.indexes.models import (
+        SimpleField,
+        SearchField,
+        SearchFieldDataType
+    )
+    return [
+        # Filterable and sortable so large result sets can be paged by key range (see bulk_delete.py)
+        SimpleField(name="id", type=SearchFieldDataType.String, key=True, filterable=True, sortable=True),
+        SimpleField(name="filename", type=SearchFieldDataType.String, filterable=True),
+        SearchField(name="content", type=SearchFieldDataType.String, searchable=True),
+        # SHA-256 of the chunk text, used to skip re-embedding unchanged chunks
+        SimpleField(name="contentHash", type=SearchFieldDataType.String),
+        SearchField(
+            name="contentVector",
+            type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
+            searchable=True,
+            vector_search_dimensions=(spec or LEGACY_SPEC)["dimensions"],
+            vector_search_profile_name="my-vector-profile"
+        ),
+        # Session-based isolation fields
+        SimpleField(name="sessionId", type=SearchFieldDataType.String, filterable=True),
+        SimpleField(name="documentType", type=SearchFieldDataType.String, filterable=True),
+        SimpleField(name="uploadTimestamp", type=SearchFieldDataType.String, filterable=True)
+    ]
+
+def build_vector_search(spec):
+    """HNSW settings and optional quantization for the contentVector profile"""
+    from azure.search.documents.indexes.models import (
+        BinaryQuantizationCompression,
+        HnswAlgorithmConfiguration,
+        HnswParameters,
+        RescoringOptions,
+        ScalarQuantizationCompression,
+        ScalarQuantizationParameters,
+        VectorSearch,
+        VectorSearchProfile
+    )
+    algorithm = HnswAlgorithmConfiguration(
+        name="my-hnsw",
+        parameters=HnswParameters(
+            m=spec["m"],
+            ef_construction=spec["efConstruction"],
+            ef_search=spec["efSearch"],
+            metric=spec["metric"]
+        )
+    )
+    compressions = []
+    if spec["compression"] != "none":
+        # Quantized vectors are searched first, then the top candidates are
+        # re-scored against the full-precision originals
+        rescoring = RescoringOptions(enable_rescoring=True, default_oversampling=spec["oversampling"])
+        if spec["compression"] == "scalar":
+            compressions.append(ScalarQuantizationCompression(
+                compression_name="my-compression",
+                parameters=ScalarQuantizationParameters(quantized_data_type="int8"),
+                rescoring_options=rescoring
+            ))
+        else:
+            compressions.append(BinaryQuantizationCompression(compression_name="my-compression", rescoring_options=rescoring))
+    profile = VectorSearchProfile(
+        name="my-vector-profile",
+        algorithm_configuration_name="my-hnsw",
+        compression_name="my-compression" if compressions else None
+    )
+    return VectorSearch(algorithms=[algorithm], profiles=[profile], compressions=compressions or None)
+
+def build_index(index_name, spec=None):
+    from index_versions import LEGACY_SPEC
+    from azure.search.documents.indexes.models import SearchIndex
+    spec = spec or LEGACY_SPEC
+    return SearchIndex(name=index_name, fields=build_index_fields(spec), vector_search=build_vector_search(spec))
+
+def _field_signature(field):
+    return (
+        field.name,
+        str(field.type),
+        bool(field.key),
+        bool(field.filterable),
+        field.vector_search_dimensions
+    )
+
+def schema_fingerprint(fields):
+    """Stable short hash of the parts of a schema the ingest and query code rely on"""
+    signature = sorted(_field_signature(f) for f in fields)
+    return hashlib.sha256(repr(signature).encode("utf-8")).hexdigest()[:16]
+
+def diff_schema(expected_fields, live_fields):
+    """List human-readable differences between the expected fields and a live index"""
+    live = {f.name: f for f in live_fields}
+    problems = []
+    for field in expected_fields:
+        actual = live.get(field.name)
+        if actual is None:
+            problems.append(f"missing field '{field.name}'")
+            continue
+        if str(actual.type) != str(field.type):
+            problems.append(f"field '{field.name}' has type {actual.type}, expected {field.type}")
+        if field.key and not actual.key:
+            problems.append(f"field '{field.name}' is not the key")
+        # Indexes created before the key was filterable still work; paging falls back to $skip
+        if field.filterable and not actual.filterable and not field.key:
+            problems.append(f"field '{field.name}' is not filterable")
+        if field.vector_search_dimensions and actual.vector_search_dimensions != field.vector_search_dimensions:
+            problems.append(
+                f"field '{field.name}' has {actual.vector_search_dimensions} dimensions, "
+                f"expected {field.vector_search_dimensions}"
+            )
+    return problems
+
+def _add_missing_fields(client, live_index, expected_fields):
+    """Add non-key fields the live index lacks; adding fields is a non-breaking index update"""
+    live_names = {f.name for f in live_index.fields}
+    missing = [f for f in expected_fields if f.name not in live_names and not f.key]
+    if not missing:
+        return live_index
+    live_index.fields.extend(missing)
+    names = ", ".join(f.name for f in missing)
+    logging.info(f"Adding fields to index '{live_index.name}': {names}")
+    return client.create_or_update_index(live_index)
+
+def create_index_if_not_exists(index_name=None, spec=None):
+    """Create or verify the index once per process; later calls are a dictionary lookup.
+
+    Defaults to the active index version (see index_versions.py) and its spec.
+    """
+    if index_name is None:
+        from index_versions import get_active_index
+        active = get_active_index()
+        index_name, spec = active["name"], active["spec"]
+    expected = build_index_fields(spec)
+    fingerprint = schema_fingerprint(expected)
+    if _verified.get(index_name) == fingerprint:
+        return
+
+    from azure.core.exceptions import ResourceNotFoundError
+
+    with _lock:
+        if _verified.get(index_name) == fingerprint:
+            return
+        try:
+            client = get_search_index_client()
+            try:
+                live_index = client.get_index(index_name)
+            except ResourceNotFoundError:
+                live_index = None
+
+            if live_index is None:
+                logging.info(f"Creating index '{index_name}'...")
+                client.create_index(build_index(index_name, spec))
+                logging.info(f"✓ Created search index '{index_name}' with session isolation support")
+            else:
+                live_index = _add_missing_fields(client, live_index, expected)
+                problems = diff_schema(expected, live_index.fields)
+                if problems:
+                    _mismatches[index_name] = problems
+                    logging.error(f"Index '{index_name}' does not match the expected schema: {'; '.join(problems)}")
+                else:
+                    _mismatches.pop(index_name, None)
+                    logging.info(f"Index '{index_name}' already exists (schema {fingerprint})")
+
+            _verified[index_name] = fingerprint
+        except Exception as e:
+            logging.error(f"Failed to create index: {str(e)}")
+            logging.error(f"Error type: {type(e).__name__}")
+            import traceback
+            logging.error(f"Traceback: {traceback.format_exc()}")
+            raise  # Re-raise to let caller handle it
+
+def get_index_status():
+    """Cached verification state per index, for diagnostics"""
+    return {
+        name: {"schema": fingerprint, "mismatches": _mismatches.get(name, [])}
+        for name, fingerprint in _verified.items()
+    }
+
+def reset_index_cache(index_name=None):
+    """Forget cached state so the next call re-checks the live index"""
+    with _lock:
+        if index_name is None:
+            _verified.clear()
+            _mismatches.clear()
+        else:
+            _verified.pop(index_name, None)
+            _mismatches.pop(index_name, None)
@@ -0,0 +1,106 @@
+import threading
+import time
+
+import numpy as np
+
+from config import config
+
+class SemanticCache:
+    """Answers keyed by query vector; a lookup hits when cosine similarity clears the threshold.
+
+    Entries belong to one corpus version. Seeing a different version empties the
+    cache, so a reindex of the CV invalidates every stored answer at once. An
+    entry may also carry a scope (e.g. a hash of the conversation so far), and
+    only lookups with the same scope can hit it.
+    Storage is a fixed-size ring buffer, so the oldest answer is replaced first.
+    """
+
+    def __init__(self, max_entries, threshold, ttl_seconds):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._payloads = [None] * max_entries
+        self._scopes = np.full(max_entries, None, dtype=object)
+        self._stored_at = np.zeros(max_entries)
+        self._count = 0
+        self._next = 0
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _sync_version(self, version):
+        if version != self._version:
+            if self._count:
+                self.invalidations += 1
+            self._matrix = None
+            self._payloads = [None] * self.max_entries
+            self._scopes[:] = None
+            self._count = 0
+            self._next = 0
+            self._version = version
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector, version, scope=None):
+        """Return (payload, similarity) for the closest live entry in scope above threshold, else None"""
+        query = self._normalize(vector)
+        with self._lock:
+            self._sync_version(version)
+            if not self._count or self._matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            scores = self._matrix[:self._count] @ query
+            live = self._stored_at[:self._count] > time.monotonic() - self.ttl_seconds
+            live &= self._scopes[:self._count] == scope
+            scores = np.where(live, scores, -1.0)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._payloads[best], float(scores[best])
+
+    def store(self, vector, version, payload, scope=None):
+        if self.max_entries <= 0:
+            return
+        row = self._normalize(vector)
+        with self._lock:
+            self._sync_version(version)
+            if self._matrix is None or self._matrix.shape[1] != row.shape[0]:
+                self._matrix = np.zeros((self.max_entries, row.shape[0]), dtype=np.float32)
+                self._count = 0
+                self._next = 0
+            self._matrix[self._next] = row
+            self._payloads[self._next] = payload
+            self._scopes[self._next] = scope
+            self._stored_at[self._next] = time.monotonic()
+            self._next = (self._next + 1) % self.max_entries
+            self._count = min(self._count + 1, self.max_entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._count,
+                "maxEntries": self.max_entries,
+                "threshold": self.threshold,
+                "corpusVersion": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+# Answers to permanent-only (CV) questions, shared by every request on this worker
+answer_cache = SemanticCache(
+    max_entries=config.ANSWER_CACHE_SIZE,
+    threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS
+)
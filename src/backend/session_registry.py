@@ -0,0 +1,208 @@
+import json
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+from caches import TTLCache
+from config import config
+
+# Per-session manifest of indexed chunk ids, so cleanup deletes by key instead
+# of searching. Manifests also have a time-ordered marker (one per session,
+# named by its last upload time) so expired sessions can be listed in order
+# without a filter over uploadTimestamp.
+#
+# Manifest shape:
+#   {"sessionId": "...", "lastUpload": "<iso>", "files": {"<filename>": ["<chunk id>", ...]}}
+
+TIME_FORMAT = "%Y%m%d%H%M%S%f"
+
+def _marker_time(iso_timestamp):
+    return datetime.fromisoformat(iso_timestamp).strftime(TIME_FORMAT)
+
+def _merge(manifest, session_id, filename, chunk_ids, uploaded_at):
+    manifest = manifest or {"sessionId": session_id, "files": {}}
+    manifest["files"][filename] = list(chunk_ids)
+    manifest["lastUpload"] = max(manifest.get("lastUpload") or uploaded_at, uploaded_at)
+    return manifest
+
+def manifest_chunk_ids(manifest):
+    return [doc_id for ids in manifest["files"].values() for doc_id in ids]
+
+class InMemorySessionRegistry:
+    """Process-local registry for tests and local runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._manifests = {}
+
+    def record(self, session_id, filename, chunk_ids, uploaded_at):
+        with self._lock:
+            self._manifests[session_id] = _merge(self._manifests.get(session_id), session_id, filename, chunk_ids, uploaded_at)
+
+    def get(self, session_id):
+        with self._lock:
+            manifest = self._manifests.get(session_id)
+            return json.loads(json.dumps(manifest)) if manifest else None
+
+    def expired_sessions(self, cutoff):
+        """(session id, marker) for sessions whose last upload is older than cutoff, oldest first"""
+        with self._lock:
+            ordered = sorted(self._manifests.values(), key=lambda m: m["lastUpload"])
+        return [(m["sessionId"], m["lastUpload"]) for m in ordered if datetime.fromisoformat(m["lastUpload"]) < cutoff]
+
+    def remove_marker(self, marker):
+        """Markers here are the manifests themselves, so there is nothing left over to delete"""
+
+    def remove(self, session_id):
+        with self._lock:
+            self._manifests.pop(session_id, None)
+
+class BlobSessionRegistry:
+    """Manifests as JSON blobs in the meta container, updated with ETag concurrency control.
+
+    sessions/<session>.json          - the manifest
+    sessions-by-time/<time>/<session> - empty marker named by last upload time
+    """
+
+    MANIFEST_PREFIX = "sessions/"
+    MARKER_PREFIX = "sessions-by-time/"
+
+    def _container(self):
+        from clients import get_blob_service_client
+        return get_blob_service_client().get_container_client(config.AZURE_STORAGE_META_CONTAINER_NAME)
+
+    def _manifest_name(self, session_id):
+        return f"{self.MANIFEST_PREFIX}{quote(session_id, safe='')}.json"
+
+    def _marker_name(self, session_id, uploaded_at):
+        return f"{self.MARKER_PREFIX}{_marker_time(uploaded_at)}/{quote(session_id, safe='')}"
+
+    def _read(self, session_id):
+        from azure.core.exceptions import ResourceNotFoundError
+        blob_client = self._container().get_blob_client(self._manifest_name(session_id))
+        try:
+            downloader = blob_client.download_blob()
+        except ResourceNotFoundError:
+            return None, None
+        return json.loads(downloader.readall()), downloader.properties.etag
+
+    def record(self, session_id, filename, chunk_ids, uploaded_at, max_attempts=5):
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+        container = self._container()
+        blob_client = container.get_blob_client(self._manifest_name(session_id))
+        for _ in range(max_attempts):
+            current, etag = self._read(session_id)
+            previous = current.get("lastUpload") if current else None
+            manifest = _merge(current, session_id, filename, chunk_ids, uploaded_at)
+            data = json.dumps(manifest).encode("utf-8")
+            try:
+                if etag:
+                    blob_client.upload_blob(data, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified)
+                else:
+                    blob_client.upload_blob(data, overwrite=False)
+            except (ResourceModifiedError, ResourceExistsError):
+                # Another upload for this session won the race; merge again on top of it
+                continue
+            except ResourceNotFoundError:
+                container.create_container()
+                continue
+
+            if previous != manifest["lastUpload"]:
+                container.upload_blob(self._marker_name(session_id, manifest["lastUpload"]), b"", overwrite=True)
+                if previous:
+                    self._delete_quietly(container, self._marker_name(session_id, previous))
+            return
+        raise RuntimeError(f"Could not update session manifest for {session_id}")
+
+    def get(self, session_id):
+        manifest, _ = self._read(session_id)
+        return manifest
+
+    def expired_sessions(self, cutoff):
+        """(session id, marker name) for markers older than cutoff, oldest first (stops at the first newer marker).
+
+        A marker can be stale: record() deletes the previous one quietly, so a
+        failed delete leaves it behind. Callers drop those with remove_marker.
+        """
+        from azure.core.exceptions import ResourceNotFoundError
+        cutoff_key = cutoff.strftime(TIME_FORMAT)
+        expired = []
+        try:
+            for blob in self._container().list_blobs(name_starts_with=self.MARKER_PREFIX):
+                marker_time, _, encoded_session = blob.name[len(self.MARKER_PREFIX):].partition("/")
+                if marker_time >= cutoff_key:
+                    break
+                expired.append((unquote(encoded_session), blob.name))
+        except ResourceNotFoundError:
+            return []
+        return expired
+
+    def remove_marker(self, marker):
+        """Delete one stale marker returned by expired_sessions"""
+        self._delete_quietly(self._container(), marker)
+
+    def remove(self, session_id):
+        manifest, _ = self._read(session_id)
+        container = self._container()
+        if manifest and manifest.get("lastUpload"):
+            self._delete_quietly(container, self._marker_name(session_id, manifest["lastUpload"]))
+        self._delete_quietly(container, self._manifest_name(session_id))
+
+    @staticmethod
+    def _delete_quietly(container, name):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            container.delete_blob(name)
+        except ResourceNotFoundError:
+            pass
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_session_registry():
+    """Registry selected by SESSION_REGISTRY_BACKEND ("blob" or "memory"), shared per process"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                if config.SESSION_REGISTRY_BACKEND == "memory":
+                    _registry = InMemorySessionRegistry()
+                else:
+                    _registry = BlobSessionRegistry()
+    return _registry
+
+# Sessions known to have temporary uploads, cached briefly so their chat
+# requests skip the registry read. Only "yes" is cached: the upload may be
+# handled by another worker, so a cached "no" could hide a session's documents
+# from it, while a stale "yes" (after cleanup) only means using the search
+# service instead of the local permanent-corpus engine.
+_session_lookup_cache = TTLCache(max_entries=4096, ttl_seconds=config.SESSION_LOOKUP_CACHE_TTL_SECONDS)
+
+def session_has_documents(session_id):
+    """True if the registry holds temporary uploads for session_id (raises if it can't be read)"""
+    if _session_lookup_cache.get(session_id):
+        return True
+    manifest = get_session_registry().get(session_id)
+    has_documents = bool(manifest and manifest.get("files"))
+    if has_documents:
+        _session_lookup_cache.put(session_id, True)
+    return has_documents
+
+def record_ingest(session_id, document_type, filename, chunk_ids, uploaded_at):
+    """Record a temporary upload's chunk ids; permanent (CV) documents never expire and are not tracked.
+
+    Raises if the manifest can't be written: callers record before uploading,
+    so chunks are never indexed without session cleanup and chat routing
+    knowing about them.
+    """
+    if document_type != 'temporary':
+        return
+    try:
+        get_session_registry().record(session_id, filename, chunk_ids, uploaded_at)
+    except Exception as e:
+        logging.error(f"Failed to record session manifest for {session_id}: {e}")
+        raise
+    _session_lookup_cache.put(session_id, True)
@@ -0,0 +1,107 @@
+import azure.functions as func
+import logging
+import json
+
+# /generate/stream runs as its own Function App (PYTHON_SCRIPT_FILE_NAME=stream_app.py,
+# see infra/simple-main.bicep) from the same package as function_app.py. Importing
+# the FastAPI extension switches the whole worker to HTTP streams, where every
+# route has to take Request and return Response; keeping it here leaves the
+# other routes on func.HttpRequest/HttpResponse and keeps the extension's
+# import cost off the main app's cold start.
+from azurefunctions.extensions.http.fastapi import (
+    Request,
+    Response,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse
+)
+
+app = func.FunctionApp()
+
+from clients import get_openai_client
+
+@app.route(route="generate/stream", methods=["POST"], auth_level=func.AuthLevel.ANONYMOUS)
+async def generate_response_stream(req: Request) -> Response:
+    """Server-Sent Events variant of /generate: citations first, then tokens as they arrive"""
+    import asyncio
+    from config import config
+    from conversation import history_key, history_messages, previous_retrieval, record_turn_later
+    from generation import load_conversation_for, lookup_cached_answer, retrieve_for_prompt
+    from retrieval import build_chat_messages
+    from semantic_cache import answer_cache
+
+    try:
+        req_body = await req.json()
+    except ValueError:
+        req_body = {}
+    prompt = req_body.get('prompt')
+    enable_rag = req_body.get('enableRag', True)
+    session_id = req_body.get('sessionId', 'global')  # User's session ID
+
+    if not prompt:
+        return PlainTextResponse("Prompt required", status_code=400)
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    try:
+        openai_client = get_openai_client()
+        # Retrieval uses the blocking SDK clients, so keep it off the event loop
+        conversation = await asyncio.to_thread(load_conversation_for, req_body, session_id)
+        history = history_messages(conversation) if conversation else []
+        previous = previous_retrieval(conversation) if conversation else None
+        retrieved = await asyncio.to_thread(retrieve_for_prompt, openai_client, prompt, session_id, enable_rag, previous)
+        scope = history_key(history)
+        corpus_version, cached = await asyncio.to_thread(lookup_cached_answer, retrieved, session_id, scope)
+    except Exception as e:
+        logging.error(f"Chat stream error: {e}")
+        return JSONResponse({"error": str(e), "success": False}, status_code=500)
+
+    citations = list(set(retrieved["citations"]))
+
+    def event_stream():
+        # Starlette drains sync iterators in a worker thread, so the pooled
+        # (blocking) OpenAI client can be used directly here
+        yield sse("citations", {"citations": citations})
+        if cached:
+            yield sse("token", {"content": cached["response"]})
+            yield sse("done", {**cached, "cached": True})
+            if conversation is not None:
+                record_turn_later(openai_client, session_id, prompt, cached["response"], retrieved)
+            return
+        try:
+            stream = openai_client.chat.completions.create(
+                model=config.OPENAI_CHAT_MODEL,
+                messages=build_chat_messages(prompt, retrieved["context"], history),
+                stream=True
+            )
+            parts = []
+            for chunk in stream:
+                # Azure sends a leading chunk with prompt filter results and no choices
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield sse("token", {"content": delta})
+
+            payload = {
+                "response": "".join(parts),
+                "citations": citations,
+                "success": True
+            }
+            if corpus_version is not None:
+                answer_cache.store(retrieved["query_vector"], corpus_version, payload, scope)
+            yield sse("done", payload)
+            # In the background, so a summarization doesn't hold the stream open
+            if conversation is not None:
+                record_turn_later(openai_client, session_id, prompt, payload["response"], retrieved)
+        except Exception as e:
+            logging.error(f"Chat stream error: {e}")
+            yield sse("error", {"error": str(e), "success": False})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+from azure.core.exceptions import HttpResponseError
+
+import bulk_delete
+from benchmarks.fakes import FakeSearchClient, Latency
+
+class RecordingSearchClient(FakeSearchClient):
+    """Fake index that logs each search and delete call in order"""
+
+    def __init__(self, sortable=True, undeletable=()):
+        super().__init__(Latency.zero())
+        self.sortable = sortable
+        self.undeletable = set(undeletable)
+        self.log = []
+
+    def search(self, order_by=None, **kwargs):
+        if order_by and not self.sortable:
+            error = HttpResponseError(message="id is not sortable")
+            error.status_code = 400
+            raise error
+        self.log.append("search")
+        return super().search(order_by=order_by, **kwargs)
+
+    def delete_documents(self, documents):
+        self.log.append("delete")
+        results = super().delete_documents([d for d in documents if d["id"] not in self.undeletable])
+        return results + [SimpleNamespace(key=d["id"], succeeded=False, status_code=503) for d in documents if d["id"] in self.undeletable]
+
+def index_with(count, session="s1", **kwargs):
+    client = RecordingSearchClient(**kwargs)
+    for i in range(count):
+        client.documents[f"{session}-doc-{i:05d}"] = {"id": f"{session}-doc-{i:05d}", "sessionId": session}
+    client.documents["other-doc"] = {"id": "other-doc", "sessionId": "other"}
+    return client
+
+def run(client, **kwargs):
+    return bulk_delete.bulk_delete(client, "sessionId eq 's1'", batch_size=100, max_concurrency=2, max_attempts=1, **kwargs)
+
+def test_key_range_paging_deletes_each_page_as_it_is_read():
+    client = index_with(2500)
+    totals = run(client)
+    assert totals == {"matched": 2500, "deleted": 2500, "failed": 0, "passes": 1, "complete": True}
+    assert list(client.documents) == ["other-doc"]
+    # The first page is gone before the second is requested
+    assert client.log.index("delete") < client.log.index("search", 1)
+
+def test_skip_paging_lists_everything_before_deleting():
+    client = index_with(2500, sortable=False)
+    totals = run(client)
+    assert totals == {"matched": 2500, "deleted": 2500, "failed": 0, "passes": 1, "complete": True}
+    assert list(client.documents) == ["other-doc"]
+    assert "search" not in client.log[client.log.index("delete"):]
+
+def test_skip_limit_runs_another_pass(monkeypatch):
+    monkeypatch.setattr(bulk_delete, "MAX_SKIP", 1000)
+    client = index_with(2500, sortable=False)
+    totals = run(client, max_passes=5)
+    assert totals["deleted"] == 2500
+    assert totals["passes"] == 2
+    assert totals["complete"] is True
+    assert list(client.documents) == ["other-doc"]
+
+def test_skip_limit_on_the_last_pass_is_incomplete(monkeypatch):
+    monkeypatch.setattr(bulk_delete, "MAX_SKIP", 1000)
+    client = index_with(2500, sortable=False)
+    totals = run(client, max_passes=1)
+    assert totals["complete"] is False
+    assert totals["deleted"] == 2000
+    assert len(client.documents) == 501
+
+def test_failed_deletes_are_counted_once():
+    client = index_with(10, undeletable={"s1-doc-00003"})
+    totals = run(client)
+    assert (totals["deleted"], totals["failed"]) == (9, 1)
+    assert sorted(client.documents) == ["other-doc", "s1-doc-00003"]
+
+def test_delete_ids_reports_failed_keys():
+    client = index_with(5, undeletable={"s1-doc-00001"})
+    totals = bulk_delete.delete_ids(client, [f"s1-doc-{i:05d}" for i in range(5)], batch_size=2, max_concurrency=2, max_attempts=1)
+    assert totals == {"deleted": 4, "failed": 1, "failedIds": ["s1-doc-00001"]}
+
+def test_key_range_filter_bounds_the_next_page():
+    assert bulk_delete.key_range_filter("sessionId eq 's1'", None) == "sessionId eq 's1'"
+    assert bulk_delete.key_range_filter("sessionId eq 's1'", "a'b") == "(sessionId eq 's1') and id gt 'a''b'"
+    assert bulk_delete.key_range_filter(None, "x") == "id gt 'x'"
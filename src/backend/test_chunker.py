@@ -0,0 +1,46 @@
+from chunker import iter_token_chunks
+from tokens import estimate_tokens
+
+def sentences(count, prefix="Sentence"):
+    return " ".join(f"{prefix} number {i} says something short." for i in range(count))
+
+def test_short_text_is_one_chunk():
+    assert list(iter_token_chunks(["Hello world.\n\nSecond   paragraph."], max_tokens=100, overlap_tokens=0)) == [
+        "Hello world.\n\nSecond paragraph."
+    ]
+
+def test_chunks_stay_within_max_tokens():
+    text = "\n\n".join(sentences(30, prefix=f"Paragraph {p}") for p in range(10))
+    chunks = list(iter_token_chunks([text], max_tokens=64, overlap_tokens=16))
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 64 for chunk in chunks)
+
+def test_cuts_fall_between_sentences():
+    chunks = list(iter_token_chunks([sentences(40)], max_tokens=50, overlap_tokens=0))
+    assert len(chunks) > 1
+    assert all(chunk.endswith(".") for chunk in chunks)
+
+def test_consecutive_chunks_overlap():
+    chunks = list(iter_token_chunks([sentences(40)], max_tokens=50, overlap_tokens=12))
+    for first, second in zip(chunks, chunks[1:]):
+        first_sentence_of_second = second.split(". ")[0] + "."
+        assert first_sentence_of_second in first
+
+def test_no_overlap_keeps_every_sentence_once():
+    text = sentences(40)
+    chunks = list(iter_token_chunks([text], max_tokens=50, overlap_tokens=0))
+    assert " ".join(chunks) == text
+
+def test_line_aligned_pieces_chunk_like_the_whole_text():
+    lines = [f"Line {i} of a page that keeps going." for i in range(60)]
+    whole = list(iter_token_chunks(["\n".join(lines)], max_tokens=40, overlap_tokens=8))
+    pieces = ["\n".join(lines[i:i + 7]) for i in range(0, len(lines), 7)]
+    assert list(iter_token_chunks(pieces, max_tokens=40, overlap_tokens=8)) == whole
+
+def test_oversized_word_is_split():
+    chunks = list(iter_token_chunks(["x" * 1000], max_tokens=10, overlap_tokens=0))
+    assert "".join(chunks) == "x" * 1000
+    assert all(estimate_tokens(chunk) <= 10 for chunk in chunks)
+
+def test_empty_input():
+    assert list(iter_token_chunks(["", "  \n\n  "], max_tokens=10, overlap_tokens=0)) == []
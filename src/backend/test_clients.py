@@ -0,0 +1,28 @@
+import pytest
+
+import clients
+from config import config
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    clients.reset_clients()
+    yield
+    clients.reset_clients()
+
+def test_clients_are_built_once_and_reused():
+    built = []
+    first = clients._get_or_create("thing", lambda: built.append(object()) or built[-1])
+    assert clients._get_or_create("thing", lambda: built.append(object()) or built[-1]) is first
+    assert len(built) == 1
+
+def test_config_change_rebuilds_the_pool(monkeypatch):
+    first = clients._get_or_create("thing", object)
+    monkeypatch.setattr(config, "CLIENT_POOL_SIZE", config.CLIENT_POOL_SIZE + 1)
+    assert clients._get_or_create("thing", object) is not first
+
+def test_reset_clients_drops_installed_stand_ins():
+    fake = object()
+    clients.install_clients({"thing": fake})
+    assert clients._get_or_create("thing", object) is fake
+    clients.reset_clients()
+    assert clients._get_or_create("thing", object) is not fake
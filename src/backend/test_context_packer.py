@@ -0,0 +1,67 @@
+from context_packer import format_passage, merge_adjacent, pack_context, split_chunk_id, stitch
+from tokens import estimate_tokens
+
+def result(doc_id, content, filename="cv.pdf", document_type="permanent"):
+    return {"id": doc_id, "content": content, "filename": filename, "documentType": document_type}
+
+def test_split_chunk_id():
+    assert split_chunk_id("global-cv_pdf-12") == ("global-cv_pdf", 12)
+    assert split_chunk_id("no_index") == ("no_index", None)
+    assert split_chunk_id("trailing-") == ("trailing-", None)
+    assert split_chunk_id(None) == (None, None)
+
+def test_stitch_drops_the_repeated_overlap():
+    first = "The first chunk ends with a sentence that carries over."
+    second = "a sentence that carries over. The second chunk goes on."
+    assert stitch(first, second) == "The first chunk ends with a sentence that carries over. The second chunk goes on."
+
+def test_stitch_without_overlap_joins_with_a_newline():
+    assert stitch("first part", "second part") == "first part\nsecond part"
+
+def test_merge_adjacent_stitches_consecutive_chunks_in_document_order():
+    overlap = "a shared overlap of enough length."
+    results = [
+        result("doc-1", overlap + " End of the document."),
+        result("other-0", "unrelated", filename="other.pdf"),
+        result("doc-0", "Start of the document, " + overlap),
+    ]
+    passages = merge_adjacent(results)
+    assert [p["filename"] for p in passages] == ["cv.pdf", "other.pdf"]
+    assert passages[0]["content"] == "Start of the document, " + overlap + " End of the document."
+    assert passages[0]["rank"] == 0
+
+def test_merge_adjacent_keeps_gaps_apart():
+    passages = merge_adjacent([result("doc-0", "zero"), result("doc-2", "two")])
+    assert [p["content"] for p in passages] == ["zero", "two"]
+
+def test_pack_context_drops_near_duplicates():
+    text = "Led the migration of the billing platform to event sourcing over two years"
+    packed = pack_context([
+        result("a-0", text, filename="a.pdf"),
+        result("b-0", text + " with a small team", filename="b.pdf"),
+        result("c-0", "Speaks French and German", filename="c.pdf")
+    ], token_budget=1000)
+    assert packed["citations"] == ["a.pdf", "c.pdf"]
+    assert packed["permanent_only"] is True
+
+def test_pack_context_skips_passages_over_budget_but_keeps_smaller_ones():
+    long_passage = result("a-0", "word " * 400, filename="long.pdf")
+    short_passage = result("b-0", "a short passage", filename="short.pdf")
+    packed = pack_context([long_passage, short_passage], token_budget=50)
+    assert packed["citations"] == ["short.pdf"]
+    assert packed["tokens"] <= 50
+
+def test_pack_context_truncates_when_nothing_fits():
+    packed = pack_context([result("a-0", "x" * 4000)], token_budget=100)
+    assert packed["citations"] == ["cv.pdf"]
+    assert estimate_tokens(packed["context"]) <= 100
+
+def test_pack_context_reports_temporary_passages():
+    packed = pack_context([result("s-0", "uploaded text", document_type="temporary")], token_budget=100)
+    assert packed["permanent_only"] is False
+    assert packed["context"] == format_passage({"filename": "cv.pdf", "content": "uploaded text"})
+
+def test_pack_context_with_nothing_retrieved_is_not_permanent_only():
+    packed = pack_context([], token_budget=100)
+    assert packed["permanent_only"] is False
+    assert (packed["context"], packed["citations"], packed["tokens"]) == ("", [], 0)
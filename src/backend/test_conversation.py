@@ -0,0 +1,68 @@
+from conversation import (
+    InMemoryConversationStore,
+    history_key,
+    history_messages,
+    new_state,
+    record_turn,
+    record_turn_later
+)
+
+RETRIEVED = {"context": "", "citations": [], "query_vector": None, "permanent_only": False}
+
+def test_history_messages_carry_the_summary_then_the_turns():
+    state = {**new_state("s"), "summary": "Asked about Azure.", "turns": [{"user": "Q", "assistant": "A"}]}
+    assert history_messages(state) == [
+        {"role": "system", "content": "Summary of the conversation so far:\nAsked about Azure."},
+        {"role": "user", "content": "Q"},
+        {"role": "assistant", "content": "A"}
+    ]
+
+def test_history_key_is_none_without_history_and_changes_with_it():
+    assert history_key([]) is None
+    first = history_key([{"role": "user", "content": "Q"}])
+    assert first == history_key([{"role": "user", "content": "Q"}])
+    assert first != history_key([{"role": "user", "content": "Q2"}])
+
+def test_store_rejects_a_save_from_a_stale_load():
+    store = InMemoryConversationStore()
+    assert store.save("s", new_state("s"), None)
+    state, token = store.load("s")
+    assert store.save("s", state, token)
+    assert not store.save("s", state, token)
+
+def test_older_turns_are_folded_into_the_summary(services, monkeypatch):
+    from clients import get_openai_client
+    from config import config
+    monkeypatch.setattr(config, "CONVERSATION_RECENT_TURNS", 2)
+    for i in range(5):
+        record_turn(get_openai_client(), "s", f"question {i}", f"answer {i}", RETRIEVED)
+    from conversation import get_conversation_store
+    state, _ = get_conversation_store().load("s")
+    assert [turn["user"] for turn in state["turns"]] == ["question 3", "question 4"]
+    assert state["summary"]
+
+def test_record_turn_retries_after_a_conflicting_save(services):
+    from clients import get_openai_client
+    from conversation import get_conversation_store
+    store = get_conversation_store()
+    original_save = store.save
+    conflicts = [True]
+
+    def save_once_conflicting(session_id, state, token):
+        if conflicts.pop() if conflicts else False:
+            # Another request records its turn in between
+            other, other_token = store.load(session_id)
+            original_save(session_id, {**(other or new_state(session_id)), "turns": [{"user": "other", "assistant": "x"}]}, other_token)
+            return False
+        return original_save(session_id, state, token)
+
+    store.save = save_once_conflicting
+    record_turn(get_openai_client(), "s", "mine", "y", RETRIEVED)
+    state, _ = store.load("s")
+    assert [turn["user"] for turn in state["turns"]] == ["other", "mine"]
+
+def test_loading_waits_for_a_turn_being_recorded(services):
+    from clients import get_openai_client
+    from conversation import load_conversation
+    record_turn_later(get_openai_client(), "s", "Q", "A", RETRIEVED)
+    assert load_conversation("s")["turns"] == [{"user": "Q", "assistant": "A"}]
@@ -5,3 +5,42 @@ app = func.FunctionApp()
 @app.route(route="test", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
 def test_function(req: func.HttpRequest) -> func.HttpResponse:
     return func.HttpResponse("Test works!", status_code=200)
+
+# Handler tests: function_app's routes against the fakes (see conftest.py)
+
+def _conversation(session_id):
+    from conversation import get_conversation_store, _wait_for_recording
+    _wait_for_recording(session_id)
+    state, _ = get_conversation_store().load(session_id)
+    return state
+
+def test_generate_requires_a_prompt(call):
+    status, _ = call("generate_response", "generate", {"sessionId": "visitor"})
+    assert status == 400
+
+def test_generate_answers_and_remembers_the_turn(call):
+    status, body = call("generate_response", "generate", {"prompt": "Where did Sam work?", "sessionId": "visitor"})
+    assert status == 200 and body["success"]
+    state = _conversation("visitor")
+    assert state["turns"] == [{"user": "Where did Sam work?", "assistant": body["response"]}]
+
+def test_global_session_has_no_conversation_memory(call):
+    for prompt in ("Where did Sam work?", "And before that?"):
+        status, _ = call("generate_response", "generate", {"prompt": prompt, "sessionId": "global"})
+        assert status == 200
+    assert _conversation("global") is None
+
+def test_global_session_repeats_are_served_from_the_answer_cache(call, services):
+    from benchmarks.run import synthetic_document, upload_text
+    upload_text(services, "cv.txt", synthetic_document(4096, seed="cv"))
+    status, _ = call("embed_document", "embed", {"fileName": "cv.txt", "sessionId": "global", "documentType": "permanent"})
+    assert status == 200
+
+    _, first = call("generate_response", "generate", {"prompt": "What does Sam know about Azure?", "sessionId": "global"})
+    _, second = call("generate_response", "generate", {"prompt": "What does Sam know about Azure?", "sessionId": "global"})
+    assert "cached" not in first
+    assert second["cached"] is True
+
+def test_use_memory_false_is_stateless(call):
+    call("generate_response", "generate", {"prompt": "Hi", "sessionId": "visitor", "useMemory": False})
+    assert _conversation("visitor") is None
@@ -0,0 +1,28 @@
+import pytest
+from azure.core.exceptions import HttpResponseError
+
+import index_versions
+
+def unavailable():
+    raise HttpResponseError(message="Server busy")
+
+def test_without_a_pointer_the_original_index_is_active(services):
+    assert index_versions.get_active_index() == index_versions.legacy_entry()
+
+def test_pointer_names_the_active_version(services, monkeypatch):
+    entry = index_versions.activation_entry("documents-v2", 2, index_versions.LEGACY_SPEC)
+    index_versions.write_pointer({"active": entry, "history": []}, None)
+    monkeypatch.setattr(index_versions, "_cached_active", None)
+    assert index_versions.get_active_index() == entry
+
+def test_unreadable_pointer_with_nothing_cached_raises(services, monkeypatch):
+    monkeypatch.setattr(index_versions, "read_pointer", unavailable)
+    with pytest.raises(HttpResponseError):
+        index_versions.get_active_index()
+
+def test_unreadable_pointer_keeps_the_last_known_version(services, monkeypatch):
+    entry = index_versions.activation_entry("documents-v2", 2, index_versions.LEGACY_SPEC)
+    monkeypatch.setattr(index_versions, "_cached_active", entry)
+    monkeypatch.setattr(index_versions, "_cached_at", 0.0)
+    monkeypatch.setattr(index_versions, "read_pointer", unavailable)
+    assert index_versions.get_active_index() == entry
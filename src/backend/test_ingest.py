@@ -0,0 +1,38 @@
+from ingest import chunk_id, content_hash, plan_incremental_update
+
+def plan(new_texts, indexed_texts):
+    ids = [f"doc-{i}" for i in range(len(new_texts))]
+    hashes = [content_hash(text) for text in new_texts]
+    indexed = {f"doc-{i}": content_hash(text) for i, text in enumerate(indexed_texts)}
+    return plan_incremental_update(ids, hashes, indexed)
+
+def test_first_ingest_embeds_everything():
+    assert plan(["a", "b"], []) == ([0, 1], [], {}, [])
+
+def test_unchanged_document_embeds_nothing():
+    assert plan(["a", "b"], ["a", "b"]) == ([], ["doc-0", "doc-1"], {}, [])
+
+def test_edited_chunk_is_embedded_again():
+    assert plan(["a", "B"], ["a", "b"]) == ([1], ["doc-0"], {}, [])
+
+def test_insert_at_the_top_reuses_moved_chunks():
+    to_embed, unchanged, reusable, stale = plan(["new", "a", "b", "c"], ["a", "b", "c"])
+    assert to_embed == [0]
+    assert unchanged == []
+    assert reusable == {1: "doc-0", 2: "doc-1", 3: "doc-2"}
+    assert stale == []
+
+def test_shorter_document_deletes_trailing_ids():
+    to_embed, unchanged, reusable, stale = plan(["b", "c"], ["a", "b", "c"])
+    assert to_embed == []
+    assert reusable == {0: "doc-1", 1: "doc-2"}
+    assert stale == ["doc-2"]
+
+def test_chunks_without_a_stored_hash_are_never_reused():
+    ids = ["doc-0", "doc-1"]
+    hashes = [content_hash("a"), content_hash("b")]
+    assert plan_incremental_update(ids, hashes, {"doc-0": None, "doc-1": None}) == ([0, 1], [], {}, [])
+
+def test_chunk_id_is_a_valid_search_key():
+    assert chunk_id("session 1", "My CV (final) [v2].pdf", 3) == "session_1-My_CV_final_v2_pdf-3"
+    assert chunk_id("s", "dir/file.txt", 0) == "s-dir_file_txt-0"
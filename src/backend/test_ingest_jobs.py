@@ -0,0 +1,89 @@
+import json
+import logging
+import time
+
+import azure.functions as func
+import pytest
+
+import ingest_jobs
+from benchmarks.run import synthetic_document, upload_text
+
+REQUEST = {"fileName": "notes.txt", "sessionId": "visitor", "documentType": "temporary", "incremental": True, "pipeline": "sync"}
+
+@pytest.fixture
+def uploaded(services):
+    """The documents container with notes.txt in it"""
+    upload_text(services, "notes.txt", synthetic_document(4096, seed="notes"))
+    return services
+
+def job_status(job_id):
+    from benchmarks.run import handler
+    request = func.HttpRequest(method="GET", url=f"/api/embed/status/{job_id}", body=b"", route_params={"jobId": job_id})
+    response = handler("embed_status")(request)
+    return response.status_code, json.loads(response.get_body()) if response.status_code == 200 else None
+
+def wait_until_finished(job_id, timeout_seconds=10):
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        job = ingest_jobs.get_job_store().get(job_id)
+        if job["status"] in ingest_jobs.FINISHED:
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+def timing_records(caplog):
+    return [json.loads(r.getMessage()) for r in caplog.records if r.getMessage().startswith('{"event": "request_timing"')]
+
+def test_job_mode_answers_202_and_the_status_endpoint_serves_the_result(call, uploaded):
+    status, body = call("embed_document", "embed", {"fileName": "notes.txt", "sessionId": "visitor", "documentType": "temporary", "mode": "job"})
+    assert status == 202
+    assert body["statusUrl"] == f"/api/embed/status/{body['jobId']}"
+
+    wait_until_finished(body["jobId"])
+    status, job = job_status(body["jobId"])
+    assert status == 200
+    assert job["status"] == "succeeded"
+    assert job["result"]["chunks"] == job["progress"]["chunks"] > 0
+
+def test_job_for_a_missing_file_is_not_queued(call, uploaded):
+    status, _ = call("embed_document", "embed", {"fileName": "missing.txt", "mode": "job"})
+    assert status == 404
+
+def test_unknown_or_malformed_job_ids_are_404(services):
+    assert job_status("0" * 32)[0] == 404
+    assert job_status("../etc")[0] == 404
+
+def test_run_job_records_success_and_logs_an_http_style_status(uploaded, caplog):
+    job = ingest_jobs.create_job(REQUEST)
+    with caplog.at_level(logging.INFO):
+        finished = ingest_jobs.run_job(job["jobId"], attempt=1)
+    assert finished["status"] == "succeeded"
+    assert finished["finishedAt"] is not None
+    record = timing_records(caplog)[-1]
+    assert (record["route"], record["status"], record["jobStatus"]) == ("ingest_job", 200, "succeeded")
+
+def test_missing_file_fails_the_job_without_a_retry(uploaded, caplog):
+    job = ingest_jobs.create_job({**REQUEST, "fileName": "missing.txt"})
+    with caplog.at_level(logging.INFO):
+        finished = ingest_jobs.run_job(job["jobId"], attempt=1)
+    assert (finished["status"], finished["error"]) == ("failed", "File not found")
+    assert timing_records(caplog)[-1]["status"] == 404
+
+def test_failed_attempts_are_retried_until_the_last(services, monkeypatch):
+    import ingest
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("search unavailable")
+    monkeypatch.setattr(ingest, "ingest_document", broken)
+    job = ingest_jobs.create_job(REQUEST)
+    with pytest.raises(RuntimeError):
+        ingest_jobs.run_job(job["jobId"], attempt=1, max_attempts=2)
+    assert ingest_jobs.get_job_store().get(job["jobId"])["status"] == "retrying"
+
+    finished = ingest_jobs.run_job(job["jobId"], attempt=2, max_attempts=2)
+    assert (finished["status"], finished["error"], finished["attempts"]) == ("failed", "search unavailable", 2)
+
+def test_duplicate_delivery_of_a_finished_job_does_nothing(uploaded):
+    job = ingest_jobs.create_job({**REQUEST, "fileName": "missing.txt"})
+    first = ingest_jobs.run_job(job["jobId"], attempt=1)
+    assert ingest_jobs.run_job(job["jobId"], attempt=2) == first
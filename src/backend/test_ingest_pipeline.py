@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+from azure.core.exceptions import ResourceNotFoundError
+
+import ingest_pipeline
+from benchmarks.fakes import deterministic_vector
+from ingest import chunk_id, content_hash
+
+class AsyncIndex:
+    """Search index stand-in whose reads take a moment, so uploads can race them"""
+
+    def __init__(self, documents=None):
+        self.documents = dict(documents or {})
+
+    async def get_document(self, key, selected_fields=None):
+        await asyncio.sleep(0.01)
+        if key not in self.documents:
+            raise ResourceNotFoundError(f"Document {key} not found")
+        return {k: self.documents[key].get(k) for k in selected_fields}
+
+    async def upload_documents(self, documents):
+        for doc in documents:
+            self.documents[doc["id"]] = doc
+
+class AsyncEmbeddings:
+    """Embeddings stand-in that answers only once released"""
+
+    def __init__(self):
+        self.embeddings = self
+        self.released = asyncio.Event()
+
+    async def create(self, input, model, **kwargs):
+        await self.released.wait()
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=deterministic_vector(text)) for i, text in enumerate(input)])
+
+def indexed_copy(texts):
+    return {
+        chunk_id("s1", "doc.txt", position): {"id": chunk_id("s1", "doc.txt", position), "content": text, "contentHash": content_hash(text), "contentVector": deterministic_vector(text)}
+        for position, text in enumerate(texts)
+    }
+
+async def reingest(index, texts, openai_client, indexed=None):
+    chunk_queue = asyncio.Queue()
+    doc_queue = asyncio.Queue()
+    for text in texts + [ingest_pipeline._DONE]:
+        chunk_queue.put_nowait(text)
+
+    async def indexed_hashes():
+        return indexed if indexed is not None else {doc_id: doc["contentHash"] for doc_id, doc in index.documents.items()}
+
+    result = {"ids": [], "unchanged": [], "embedded": 0, "reused": 0, "uploaded": 0, "uploadTimestamp": "now"}
+    uploads = [asyncio.create_task(ingest_pipeline._upload(index, doc_queue, result)) for _ in range(2)]
+    await ingest_pipeline._embed(openai_client, index, chunk_queue, doc_queue, "s1", "doc.txt", "permanent", asyncio.ensure_future(indexed_hashes()), result)
+    await asyncio.gather(*uploads)
+    return result
+
+def test_insert_at_the_top_copies_every_moved_vector():
+    texts = [f"paragraph {i}" for i in range(20)]
+    index = AsyncIndex(indexed_copy(texts))
+
+    async def scenario():
+        openai_client = AsyncEmbeddings()
+        openai_client.released.set()
+        return await reingest(index, ["a new opening"] + texts, openai_client)
+
+    result = asyncio.run(scenario())
+    assert (result["embedded"], result["reused"]) == (1, 20)
+    assert all(doc["contentVector"] == deterministic_vector(doc["content"]) for doc in index.documents.values())
+
+def test_copied_vectors_upload_while_embedding_is_still_running():
+    texts = [f"paragraph {i}" for i in range(20)]
+    index = AsyncIndex(indexed_copy(texts))
+
+    async def scenario():
+        openai_client = AsyncEmbeddings()
+        task = asyncio.create_task(reingest(index, ["a new opening"] + texts, openai_client))
+        await asyncio.sleep(0.2)
+        uploaded_before_release = sum(index.documents.get(chunk_id("s1", "doc.txt", position + 1), {}).get("content") == text for position, text in enumerate(texts))
+        openai_client.released.set()
+        await task
+        return uploaded_before_release
+
+    # Nothing waits on the one embedding request except the chunk it embeds
+    assert asyncio.run(scenario()) == 20
+    assert all(doc["contentVector"] == deterministic_vector(doc["content"]) for doc in index.documents.values())
+
+def test_vector_replaced_before_it_was_read_is_embedded_again():
+    index = AsyncIndex(indexed_copy(["a", "b"]))
+    replaced = {**index.documents[chunk_id("s1", "doc.txt", 0)], "content": "z", "contentHash": content_hash("z"), "contentVector": deterministic_vector("z")}
+
+    async def scenario():
+        openai_client = AsyncEmbeddings()
+        openai_client.released.set()
+        # Someone else rewrites doc-0 after the hashes were listed
+        indexed = {doc_id: doc["contentHash"] for doc_id, doc in index.documents.items()}
+        index.documents[replaced["id"]] = replaced
+        return await reingest(index, ["b", "a"], openai_client, indexed)
+
+    result = asyncio.run(scenario())
+    assert (result["embedded"], result["reused"]) == (1, 1)
+    assert all(doc["contentVector"] == deterministic_vector(doc["content"]) for doc in index.documents.values())
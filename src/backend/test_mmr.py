@@ -0,0 +1,32 @@
+import numpy as np
+
+from mmr import mmr_select
+
+def test_lambda_one_is_relevance_order():
+    query = [1.0, 0.0]
+    candidates = [[0.2, 1.0], [1.0, 0.1], [1.0, 0.5]]
+    assert mmr_select(query, candidates, 3, 1.0) == [1, 2, 0]
+
+def test_prefers_a_different_result_over_a_near_duplicate():
+    query = [1.0, 1.0, 0.0]
+    candidates = [
+        [1.0, 0.9, 0.0],
+        [1.0, 0.91, 0.0],  # near-duplicate of the first
+        [0.2, 1.0, 0.0]
+    ]
+    selected = mmr_select(query, candidates, 2, 0.5)
+    assert selected[0] in (0, 1)
+    assert selected[1] == 2
+
+def test_k_larger_than_candidates_returns_each_once():
+    rng = np.random.default_rng(0)
+    candidates = rng.standard_normal((4, 8))
+    selected = mmr_select(rng.standard_normal(8), candidates, 10, 0.7)
+    assert sorted(selected) == [0, 1, 2, 3]
+
+def test_empty_inputs():
+    assert mmr_select([1.0, 0.0], np.zeros((0, 2)), 5, 0.7) == []
+    assert mmr_select([1.0, 0.0], [[1.0, 0.0]], 0, 0.7) == []
+
+def test_zero_vectors_do_not_fail():
+    assert mmr_select([0.0, 0.0], [[0.0, 0.0], [1.0, 0.0]], 2, 0.7) in ([0, 1], [1, 0])
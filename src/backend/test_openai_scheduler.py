@@ -0,0 +1,60 @@
+import pytest
+
+from openai_scheduler import TokenBucket, retry_after_seconds
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+class FakeError(Exception):
+    def __init__(self, headers=None):
+        super().__init__("rate limited")
+        self.response = FakeResponse(headers) if headers is not None else None
+
+def test_bucket_starts_full():
+    bucket = TokenBucket(rate_per_minute=600, burst_seconds=10)
+    assert bucket.capacity == 100
+    assert bucket.seconds_until(100, now=bucket.updated) == 0.0
+
+def test_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate_per_minute=600, burst_seconds=10)
+    start = bucket.updated
+    bucket.take(100)
+    assert bucket.seconds_until(50, now=start) == pytest.approx(5.0)
+    assert bucket.seconds_until(50, now=start + 5.0) == pytest.approx(0.0)
+
+def test_bucket_never_refills_past_capacity():
+    bucket = TokenBucket(rate_per_minute=600, burst_seconds=10)
+    bucket.seconds_until(1, now=bucket.updated + 3600)
+    assert bucket.level == bucket.capacity
+
+def test_reserve_holds_back_part_of_the_bucket():
+    bucket = TokenBucket(rate_per_minute=600, burst_seconds=10)
+    start = bucket.updated
+    bucket.take(80)
+    # 20 left; 10 more plus a 20% reserve (20) needs 10 more tokens, one second at 10/s
+    assert bucket.seconds_until(10, now=start, reserve=0.2) == pytest.approx(1.0)
+    assert bucket.seconds_until(10, now=start) == 0.0
+
+def test_oversized_take_waits_for_a_full_bucket_and_goes_into_debt():
+    bucket = TokenBucket(rate_per_minute=600, burst_seconds=10)
+    start = bucket.updated
+    assert bucket.seconds_until(500, now=start) == 0.0
+    bucket.take(500)
+    assert bucket.level == -400
+    assert bucket.seconds_until(500, now=start) == pytest.approx(50.0)
+
+def test_retry_after_prefers_milliseconds():
+    assert retry_after_seconds(FakeError({"retry-after-ms": "1500", "retry-after": "9"})) == pytest.approx(1.5)
+
+def test_retry_after_seconds_header():
+    assert retry_after_seconds(FakeError({"retry-after": "7"})) == 7.0
+
+def test_retry_after_ignores_http_dates_and_missing_headers():
+    assert retry_after_seconds(FakeError({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) is None
+    assert retry_after_seconds(FakeError({})) is None
+    assert retry_after_seconds(FakeError()) is None
+    assert retry_after_seconds(ValueError("no response")) is None
+
+def test_retry_after_is_never_negative():
+    assert retry_after_seconds(FakeError({"retry-after": "-3"})) == 0.0
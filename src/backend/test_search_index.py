@@ -0,0 +1,33 @@
+from search_index import odata_quote
+
+def test_odata_quote_wraps_in_single_quotes():
+    assert odata_quote("global") == "'global'"
+
+def test_odata_quote_doubles_embedded_quotes():
+    assert odata_quote("O'Brien's CV.pdf") == "'O''Brien''s CV.pdf'"
+
+def test_odata_quote_keeps_an_injection_inside_the_literal():
+    quoted = odata_quote("x' or sessionId ne 'y")
+    assert quoted == "'x'' or sessionId ne ''y'"
+    assert quoted[1:-1].replace("''", "").count("'") == 0
+
+def test_odata_quote_converts_non_strings():
+    assert odata_quote(42) == "'42'"
+
+def test_index_status_reports_verified_indexes(services):
+    from search_index import create_index_if_not_exists, get_index_status
+    create_index_if_not_exists("documents")
+    status = get_index_status()
+    assert list(status) == ["documents"]
+    assert status["documents"]["mismatches"] == []
+
+def test_traffic_moving_to_another_version_rechecks_it(services, monkeypatch):
+    import index_versions
+    import search_index
+    search_index.create_index_if_not_exists("documents-v2", index_versions.LEGACY_SPEC)
+    index_versions.write_pointer({"active": index_versions.activation_entry("documents-v2", 2, index_versions.LEGACY_SPEC), "history": []}, None)
+    # This worker still has the original index cached, and its poll is due
+    monkeypatch.setattr(index_versions, "_cached_active", index_versions.legacy_entry())
+    monkeypatch.setattr(index_versions, "_cached_at", 0.0)
+    assert index_versions.get_active_index()["name"] == "documents-v2"
+    assert "documents-v2" not in search_index.get_index_status()
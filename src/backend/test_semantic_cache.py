@@ -0,0 +1,62 @@
+import time
+
+from semantic_cache import SemanticCache
+
+def cache(**kwargs):
+    settings = {"max_entries": 3, "threshold": 0.95, "ttl_seconds": 60}
+    settings.update(kwargs)
+    return SemanticCache(**settings)
+
+def test_hit_above_threshold():
+    answers = cache()
+    answers.store([1.0, 0.0], "v1", {"response": "yes"})
+    payload, similarity = answers.lookup([1.0, 0.01], "v1")
+    assert payload == {"response": "yes"}
+    assert similarity > 0.99
+
+def test_miss_below_threshold():
+    answers = cache()
+    answers.store([1.0, 0.0], "v1", {"response": "yes"})
+    assert answers.lookup([1.0, 1.0], "v1") is None
+    assert answers.stats()["misses"] == 1
+
+def test_new_corpus_version_empties_the_cache():
+    answers = cache()
+    answers.store([1.0, 0.0], "v1", {"response": "old"})
+    assert answers.lookup([1.0, 0.0], "v2") is None
+    assert answers.stats()["size"] == 0
+    assert answers.stats()["invalidations"] == 1
+
+def test_oldest_entry_is_replaced_first():
+    answers = cache(max_entries=2)
+    answers.store([1.0, 0.0, 0.0], "v1", "first")
+    answers.store([0.0, 1.0, 0.0], "v1", "second")
+    answers.store([0.0, 0.0, 1.0], "v1", "third")
+    assert answers.lookup([1.0, 0.0, 0.0], "v1") is None
+    assert answers.lookup([0.0, 1.0, 0.0], "v1")[0] == "second"
+    assert answers.lookup([0.0, 0.0, 1.0], "v1")[0] == "third"
+
+def test_expired_entries_miss(monkeypatch):
+    answers = cache(ttl_seconds=10)
+    answers.store([1.0, 0.0], "v1", "answer")
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert answers.lookup([1.0, 0.0], "v1") is None
+
+def test_dimension_change_misses_instead_of_failing():
+    answers = cache()
+    answers.store([1.0, 0.0], "v1", "answer")
+    assert answers.lookup([1.0, 0.0, 0.0], "v1") is None
+
+def test_disabled_cache_stores_nothing():
+    answers = cache(max_entries=0)
+    answers.store([1.0, 0.0], "v1", "answer")
+    assert answers.lookup([1.0, 0.0], "v1") is None
+
+def test_scoped_entries_only_hit_the_same_scope():
+    answers = cache()
+    answers.store([1.0, 0.0], "v1", "first turn answer")
+    answers.store([1.0, 0.0], "v1", "answer after history", scope="history-a")
+    assert answers.lookup([1.0, 0.0], "v1")[0] == "first turn answer"
+    assert answers.lookup([1.0, 0.0], "v1", scope="history-a")[0] == "answer after history"
+    assert answers.lookup([1.0, 0.0], "v1", scope="history-b") is None
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from session_registry import BlobSessionRegistry, InMemorySessionRegistry
+
+LONG_AGO = (datetime.utcnow() - timedelta(hours=5)).isoformat()
+EARLIER = (datetime.utcnow() - timedelta(hours=4)).isoformat()
+RECENT = datetime.utcnow().isoformat()
+
+@pytest.fixture(params=["memory", "blob"])
+def registry(request, services):
+    return InMemorySessionRegistry() if request.param == "memory" else BlobSessionRegistry()
+
+def markers(services):
+    from config import config
+    container = services.blob.get_container_client(config.AZURE_STORAGE_META_CONTAINER_NAME)
+    return [blob.name for blob in container.list_blobs(name_starts_with=BlobSessionRegistry.MARKER_PREFIX)]
+
+def run_cleanup_timer():
+    import function_app
+    function_app.cleanup_timer.build().get_user_function()(None)
+
+def test_record_merges_files_and_keeps_the_latest_upload(registry):
+    registry.record("s", "a.pdf", ["s-a-0", "s-a-1"], LONG_AGO)
+    registry.record("s", "b.pdf", ["s-b-0"], RECENT)
+    registry.record("s", "a.pdf", ["s-a-0"], EARLIER)
+    manifest = registry.get("s")
+    assert manifest["files"] == {"a.pdf": ["s-a-0"], "b.pdf": ["s-b-0"]}
+    assert manifest["lastUpload"] == RECENT
+
+def test_expired_sessions_are_listed_oldest_first(registry):
+    registry.record("new", "f", ["new-f-0"], RECENT)
+    registry.record("older", "f", ["older-f-0"], EARLIER)
+    registry.record("oldest", "f", ["oldest-f-0"], LONG_AGO)
+    cutoff = datetime.utcnow() - timedelta(hours=2)
+    assert [session_id for session_id, _ in registry.expired_sessions(cutoff)] == ["oldest", "older"]
+
+def test_remove_forgets_the_session(registry):
+    registry.record("s", "f", ["s-f-0"], LONG_AGO)
+    registry.remove("s")
+    assert registry.get("s") is None
+    assert registry.expired_sessions(datetime.utcnow()) == []
+
+def test_blob_registry_moves_the_marker_on_a_new_upload(services):
+    registry = BlobSessionRegistry()
+    registry.record("s", "f", ["s-f-0"], LONG_AGO)
+    registry.record("s", "g", ["s-g-0"], RECENT)
+    assert markers(services) == [registry._marker_name("s", RECENT)]
+
+def test_cleanup_timer_deletes_expired_sessions_by_key(services, monkeypatch):
+    import session_registry
+    registry = BlobSessionRegistry()
+    monkeypatch.setattr(session_registry, "_registry", registry)
+    services.search.upload_documents([{"id": "old-f-0"}, {"id": "new-f-0"}])
+    registry.record("old", "f", ["old-f-0"], LONG_AGO)
+    registry.record("new", "f", ["new-f-0"], RECENT)
+
+    run_cleanup_timer()
+
+    assert set(services.search.documents) == {"new-f-0"}
+    assert registry.get("old") is None
+    assert markers(services) == [registry._marker_name("new", RECENT)]
+
+def test_cleanup_timer_drops_stale_markers(services, monkeypatch):
+    import session_registry
+    registry = BlobSessionRegistry()
+    monkeypatch.setattr(session_registry, "_registry", registry)
+    registry.record("s", "f", ["s-f-0"], RECENT)
+    container = registry._container()
+    # Left behind by a failed delete in record(), or by a session removed since
+    container.upload_blob(registry._marker_name("s", LONG_AGO), b"")
+    container.upload_blob(registry._marker_name("gone", EARLIER), b"")
+
+    run_cleanup_timer()
+
+    assert markers(services) == [registry._marker_name("s", RECENT)]
+    assert registry.get("s") is not None
+    assert registry.expired_sessions(datetime.utcnow() - timedelta(hours=2)) == []
+
+def test_session_lookup_only_caches_sessions_with_uploads(services):
+    from session_registry import get_session_registry, record_ingest, session_has_documents
+    assert not session_has_documents("s")
+    # Recorded on another worker: nothing cached here may hide it
+    get_session_registry().record("s", "f", ["s-f-0"], RECENT)
+    assert session_has_documents("s")
+    record_ingest("t", "temporary", "f", ["t-f-0"], RECENT)
+    assert session_has_documents("t")
+
+def test_record_ingest_raises_when_the_manifest_cannot_be_written(services, monkeypatch):
+    from session_registry import get_session_registry, record_ingest
+    registry = get_session_registry()
+
+    def fail(*args):
+        raise RuntimeError("storage unavailable")
+
+    monkeypatch.setattr(registry, "record", fail)
+    with pytest.raises(RuntimeError):
+        record_ingest("s", "temporary", "f", ["s-f-0"], RECENT)
@@ -0,0 +1,106 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Per-request stage timings. A handler starts a StageTimer; code further down
+# (retrieval, ingest) records stages through the module-level stage() helper,
+# which is a no-op when no request is being timed. Timings are exclusive: time
+# spent in a nested stage is not also counted in the enclosing one. Threads
+# started by a stage (e.g. embedding batches) are not traced individually; the
+# stage that waits on them covers their wall time.
+
+_current = contextvars.ContextVar("stage_timer", default=None)
+
+class StageTimer:
+    def __init__(self, request_id=None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name):
+        stack = self._stack()
+        frame = [time.perf_counter(), 0.0]  # start, seconds spent in nested stages
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if stack:
+                stack[-1][1] += elapsed
+            with self._lock:
+                self.durations[name] = self.durations.get(name, 0.0) + (elapsed - frame[1]) * 1000
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """Server-Timing header value, stages in the order they first ran, then the total"""
+        with self._lock:
+            entries = [f"{name};dur={ms:.1f}" for name, ms in self.durations.items()]
+        entries.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(entries)
+
+    def headers(self):
+        return {"Server-Timing": self.server_timing(), "X-Request-Id": self.request_id}
+
+    def log(self, route, status_code, **fields):
+        """Emit one structured log record with every stage timing for this request"""
+        with self._lock:
+            stages = {name: {"ms": round(ms, 2), "count": self.counts[name]} for name, ms in self.durations.items()}
+        record = {
+            "event": "request_timing",
+            "requestId": self.request_id,
+            "route": route,
+            "status": status_code,
+            "totalMs": round(self.total_ms(), 2),
+            "stages": stages,
+            **fields
+        }
+        logging.info(json.dumps(record))
+
+def start_request(request_id=None):
+    """Begin timing the current request; returns (timer, token) - pass the token to end_request"""
+    timer = StageTimer(request_id)
+    return timer, _current.set(timer)
+
+def end_request(token):
+    _current.reset(token)
+
+def current_timer():
+    return _current.get()
+
+@contextmanager
+def stage(name):
+    """Time a block as `name` on the current request's timer, if there is one"""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+def timed_iter(name, iterable):
+    """Yield from iterable, counting the time spent producing each item as stage `name`"""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
@@ -0,0 +1,14 @@
+import math
+
+# Rough characters-per-token ratio for English text with cl100k-style tokenizers.
+# Token counts throughout the backend (chunk sizes, the context budget, quota
+# charges) are this estimate rather than tokenizer output: it costs nothing on
+# cold start and is close for English prose, but undercounts code, numbers and
+# most other languages, sometimes by half or more.
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Cheap token estimate used for request sizing (no tokenizer dependency)"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
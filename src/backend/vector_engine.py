@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from config import config
+
+# The permanent (CV) corpus is a few hundred chunks, so exact cosine search over
+# an in-process float32 matrix is faster than a round trip to Azure AI Search.
+# Each corpus version is written once to a snapshot on local disk
+# (<dir>/<index>.<version>.npy + .json) and memory-mapped, so every worker
+# process on a host shares the same pages and a restart does not need the
+# search service. Snapshots are per index version as well, since versions can
+# store vectors of different dimensions.
+
+# Azure AI Search is near-real-time: documents written just before a version
+# bump may not be searchable yet, so a snapshot is only built once the version
+# is this old (until then requests fall back to the search service).
+INDEX_SETTLE_SECONDS = 10
+
+_lock = threading.Lock()
+_engine = None
+_building = None  # version a thread is loading or building right now
+
+class PermanentCorpusEngine:
+    """Exact top-k cosine search over L2-normalised float32 rows"""
+
+    def __init__(self, version, vectors, documents):
+        self.version = version
+        self.vectors = vectors
+        self.documents = documents
+
+    def search(self, query_vector, k=5, with_vectors=False):
+        """Return up to k documents as dicts with id, filename, content, documentType and score
+        (and contentVector, normalised, if with_vectors)"""
+        if not len(self.documents):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        scores = self.vectors @ (query / norm)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = [{**self.documents[i], "documentType": "permanent", "score": float(scores[i])} for i in top]
+        if with_vectors:
+            for result, i in zip(results, top):
+                result["contentVector"] = self.vectors[i]
+        return results
+
+def snapshot_dir():
+    return config.LOCAL_VECTOR_SNAPSHOT_DIR or os.path.join(tempfile.gettempdir(), "cv-permanent-corpus")
+
+def _snapshot_paths(version):
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", version)
+    base = os.path.join(snapshot_dir(), safe)
+    return base + ".npy", base + ".json"
+
+def write_snapshot(version, vectors, documents):
+    """Write a snapshot atomically (temp file + rename) so concurrent workers never see a partial one"""
+    vectors_path, documents_path = _snapshot_paths(version)
+    os.makedirs(os.path.dirname(vectors_path), exist_ok=True)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(vectors_path + suffix, "wb") as f:
+        np.save(f, vectors)
+    with open(documents_path + suffix, "w", encoding="utf-8") as f:
+        json.dump(documents, f)
+    # Documents first: a loader only trusts the .npy once it exists
+    os.replace(documents_path + suffix, documents_path)
+    os.replace(vectors_path + suffix, vectors_path)
+
+def load_snapshot(version):
+    """Memory-map a snapshot for version, or return None if there isn't one"""
+    vectors_path, documents_path = _snapshot_paths(version)
+    if not os.path.exists(vectors_path):
+        return None
+    vectors = np.load(vectors_path, mmap_mode="r")
+    with open(documents_path, encoding="utf-8") as f:
+        documents = json.load(f)
+    if len(documents) != vectors.shape[0]:
+        logging.warning(f"Ignoring inconsistent corpus snapshot {vectors_path}")
+        return None
+    return PermanentCorpusEngine(version, vectors, documents)
+
+def fetch_permanent_corpus(search_client):
+    """Page every permanent chunk out of the index as (normalised vectors, documents)"""
+    from bulk_delete import iter_matching
+
+    rows = []
+    documents = []
+    for result in iter_matching(search_client, "documentType eq 'permanent'", ["id", "filename", "content", "contentVector"]):
+        if not result.get("contentVector"):
+            continue
+        rows.append(result["contentVector"])
+        documents.append({"id": result["id"], "filename": result["filename"], "content": result["content"]})
+
+    if not rows:
+        return np.zeros((0, 0), dtype=np.float32), documents
+    vectors = np.asarray(rows, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms, documents
+
+def build_snapshot(version, index_name=None):
+    from clients import get_search_client
+    vectors, documents = fetch_permanent_corpus(get_search_client(index_name))
+    write_snapshot(version, vectors, documents)
+    logging.info(f"Built permanent corpus snapshot {version} ({len(documents)} chunks)")
+    return load_snapshot(version)
+
+def _version_age(version):
+    # Versions are "<unix time>-<random>" (see corpus.bump_permanent_corpus_version); "0" means never bumped
+    try:
+        return time.time() - int(version.split("-", 1)[0])
+    except ValueError:
+        return float("inf")
+
+def get_permanent_engine():
+    """Engine for the current permanent corpus version, loading or building its snapshot on change.
+
+    One thread loads or builds the new snapshot outside the lock and swaps it
+    in; requests arriving meanwhile get None (and use the search service)
+    rather than waiting for it. If the new version can't be built (e.g. search
+    is unavailable) the previous engine keeps serving; None means no engine is
+    available at all.
+    """
+    global _engine, _building
+    from corpus import get_permanent_corpus_version
+    from index_versions import active_index_name
+
+    corpus_version = get_permanent_corpus_version()
+    index_name = active_index_name()
+    version = f"{index_name}.{corpus_version}"
+    engine = _engine
+    if engine is not None and engine.version == version:
+        return engine
+
+    with _lock:
+        if _engine is not None and _engine.version == version:
+            return _engine
+        if _building == version:
+            return None
+        _building = version
+    try:
+        engine = load_snapshot(version)
+        if engine is None:
+            if _version_age(corpus_version) < INDEX_SETTLE_SECONDS:
+                return None
+            engine = build_snapshot(version, index_name)
+        with _lock:
+            _engine = engine
+    except Exception as e:
+        logging.warning(f"Could not refresh permanent corpus snapshot {version}: {e}")
+    finally:
+        with _lock:
+            if _building == version:
+                _building = None
+    return _engine
+
+def reset_engine():
+    global _engine
+    with _lock:
+        _engine = None
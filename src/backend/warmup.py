@@ -0,0 +1,73 @@
+import importlib
+import logging
+import time
+
+from config import config
+
+# Modules that are deliberately not imported when function_app loads (handlers
+# import them on first use). Warm-up imports them ahead of traffic, and
+# benchmarks/import_budget.py checks none of them creep into the startup path.
+HEAVY_MODULES = (
+    "openai",
+    "httpx",
+    "requests",
+    "azure.storage.blob",
+    "azure.search.documents",
+    "azure.search.documents.indexes",
+    "azure.search.documents.models",
+    "pypdf",
+    "numpy",
+    "ingest",
+    "retrieval",
+    "semantic_cache",
+    "vector_engine",
+)
+
+def _timed(timings, name, action):
+    start = time.perf_counter()
+    try:
+        action()
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+    except Exception as e:
+        # Warm-up is best effort; the first real request retries whatever failed here
+        timings[name] = None
+        logging.warning(f"Warm-up step '{name}' failed: {e}")
+
+def preload_modules(modules=HEAVY_MODULES):
+    """Import the deferred dependencies; returns {module: ms} (None if the import failed)"""
+    timings = {}
+    for module in modules:
+        _timed(timings, f"import:{module}", lambda module=module: importlib.import_module(module))
+    return timings
+
+def open_connections():
+    """Build the pooled clients and make one cheap call on each, so TLS handshakes are done"""
+    from clients import get_blob_service_client, get_openai_client, get_search_client
+
+    timings = {}
+    _timed(timings, "blob", lambda: get_blob_service_client().get_container_client(config.AZURE_STORAGE_CONTAINER_NAME).exists())
+    _timed(timings, "search", lambda: get_search_client().get_document_count())
+    _timed(timings, "openai", lambda: get_openai_client().models.list())
+    return timings
+
+def prime_caches():
+    """Fill the per-worker caches the first /embed and /generate would otherwise fill"""
+    from corpus import get_permanent_corpus_version
+    from search_index import create_index_if_not_exists
+    from vector_engine import get_permanent_engine
+
+    timings = {}
+    _timed(timings, "index_schema", create_index_if_not_exists)
+    _timed(timings, "corpus_version", get_permanent_corpus_version)
+    if config.LOCAL_VECTOR_ENGINE:
+        _timed(timings, "permanent_corpus_snapshot", get_permanent_engine)
+    return timings
+
+def warm_up():
+    """Run every warm-up step and log what each cost"""
+    start = time.perf_counter()
+    timings = {**preload_modules(), **open_connections(), **prime_caches()}
+    total = (time.perf_counter() - start) * 1000
+    failed = [name for name, ms in timings.items() if ms is None]
+    logging.info(f"Warm-up finished in {total:.0f} ms ({len(timings) - len(failed)} steps ok, failed: {failed or 'none'}): {timings}")
+    return timings